@@ -1,20 +1,132 @@
 import argparse
-from calculator.tax_calculator import calculate_all
+from datetime import timedelta
+
+from calculator.csv.read_csv import ReadCsv
+from calculator.incremental import calculate_incremental
+from calculator.server import serve
+from calculator.tax_calculator import calculate_all, compare_methods
+from calculator.trade_processor.lots import LotMethod
 
 
 def main():
   args = parse_command_line()
-  calculate_all(args.path, args.basis, args.fills, args.track_wash)
+  if args.serve is not None:
+    serve(args.path, args.basis, args.fills, args.track_wash, args.serve,
+          load_state=args.load_state)
+  elif args.incremental:
+    interval = None
+    if args.checkpoint_days is not None:
+      interval = timedelta(days=args.checkpoint_days)
+    calculate_incremental(args.path, args.basis, args.fills, args.track_wash,
+                          checkpoint_trades=args.checkpoint_trades,
+                          checkpoint_interval=interval)
+  else:
+    lot_ids = None
+    if args.lot_ids is not None:
+      lot_ids = ReadCsv.read_lot_ids(args.path + args.lot_ids)
+    if args.compare is not None:
+      compare_methods(args.path, args.basis, args.fills, args.track_wash,
+                      args.compare, workers=args.workers,
+                      load_state=args.load_state, lot_ids=lot_ids)
+      return
+    calculate_all(args.path, args.basis, args.fills, args.track_wash,
+                  workers=args.workers, load_state=args.load_state,
+                  save_state=args.save_state, method=args.method,
+                  lot_ids=lot_ids, write_unwashed=args.unwashed,
+                  single_pass=args.single_pass)
 
 
 def parse_command_line():
   parser = argparse.ArgumentParser()
   parser.add_argument("path", help="Path to files")
-  parser.add_argument("basis", help="Name of basis csv in path")
+  parser.add_argument(
+    "basis", help="Name of basis csv, or state file with --load-state, in path")
   parser.add_argument("fills", help="Name of fills csv in path")
   parser.add_argument(
     "--track-wash", help="Add to track wash trades", action="store_true")
-  return parser.parse_args()
+  parser.add_argument(
+    "--unwashed", action="store_true",
+    help="With --track-wash, also write the results without tracking wash "
+         "trades to output/unwashed from the same pass")
+  parser.add_argument(
+    "--method", type=LotMethod, choices=list(LotMethod),
+    default=LotMethod.FIFO,
+    help="How the basis lots sold by each sale are chosen")
+  parser.add_argument(
+    "--lot-ids", metavar="NAME",
+    help="With --method specific-id, csv in path of the basis products and "
+         "trade ids sold by each sale, sales without ids sell first in first "
+         "out")
+  parser.add_argument(
+    "--compare", metavar="METHOD", nargs="+", type=LotMethod,
+    choices=list(LotMethod),
+    help="Only write the totals of each asset for each METHOD side by side, "
+         "reading the csvs once")
+  parser.add_argument(
+    "--workers", help="Number of processes to process assets in", type=int,
+    default=1)
+  parser.add_argument(
+    "--single-pass", action="store_true",
+    help="With one worker, process all assets in one pass over the trades, "
+         "each trade is read once for both assets of a pair such as ETH-BTC")
+  parser.add_argument(
+    "--load-state", action="store_true",
+    help="Start from a state file saved by --save-state instead of a basis csv")
+  parser.add_argument(
+    "--save-state", metavar="NAME",
+    help="Save the state after the last trade to NAME in path")
+  parser.add_argument(
+    "--incremental", action="store_true",
+    help="Only process fills not processed by the last incremental run and "
+         "append to its output")
+  parser.add_argument(
+    "--checkpoint-trades", metavar="N", type=int, default=1000,
+    help="With --incremental, checkpoint each asset every N trades to replay "
+         "from when an earlier fill arrives late")
+  parser.add_argument(
+    "--checkpoint-days", metavar="N", type=int,
+    help="With --incremental, also checkpoint each asset every N days of "
+         "trades")
+  parser.add_argument(
+    "--serve", metavar="PORT", type=int,
+    help="Keep processed trades in memory and serve queries and new fills "
+         "over http on PORT")
+  args = parser.parse_args()
+  # incremental runs keep their own state and process one asset after
+  # another first in first out, a server processes in one worker and the
+  # comparison only writes the totals of each method
+  for flag, is_set, others in (
+    ("--incremental", args.incremental, (
+      ("--workers", args.workers != 1),
+      ("--load-state", args.load_state),
+      ("--save-state", args.save_state is not None),
+      ("--method", args.method is not LotMethod.FIFO),
+      ("--lot-ids", args.lot_ids is not None),
+      ("--unwashed", args.unwashed),
+      ("--single-pass", args.single_pass),
+      ("--compare", args.compare is not None)
+    )),
+    ("--serve", args.serve is not None, (
+      ("--method", args.method is not LotMethod.FIFO),
+      ("--workers", args.workers != 1)
+    )),
+    ("--compare", args.compare is not None, (
+      ("--save-state", args.save_state is not None),
+      ("--unwashed", args.unwashed),
+      ("--single-pass", args.single_pass)
+    )),
+    ("--single-pass", args.single_pass, (
+      ("--workers", args.workers != 1),
+    ))
+  ):
+    unsupported = [other for other, other_set in others if other_set]
+    if is_set and len(unsupported) > 0:
+      parser.error("{} not supported with {}".format(
+        ", ".join(unsupported), flag))
+  methods = [args.method] if args.compare is None else args.compare
+  if args.lot_ids is not None and LotMethod.SPECIFIC_ID not in methods:
+    parser.error("--lot-ids only used with --method specific-id")
+  return args
 
 
 if __name__ == "__main__":
@@ -0,0 +1,25 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import MutableMapping, Optional
+
+
+class PriceCache:
+  """
+  BTC-USD closes by minute, the granularity queried from the exchange api, so
+  trades in the same minute only query the api once. closes may be a managed
+  dict shared between processes, ie by the accounts of a batch.
+  """
+
+  def __init__(self, closes: MutableMapping[str, Decimal] = None):
+    self.closes: MutableMapping[str, Decimal] = \
+      closes if closes is not None else {}
+
+  def get(self, date_time: datetime) -> Optional[Decimal]:
+    return self.closes.get(self.get_key(date_time))
+
+  def set(self, date_time: datetime, close: Decimal):
+    self.closes[self.get_key(date_time)] = close
+
+  @staticmethod
+  def get_key(date_time: datetime) -> str:
+    return date_time.strftime("%Y-%m-%dT%H:%M")
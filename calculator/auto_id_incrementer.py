@@ -1,12 +1,92 @@
+import threading
+from typing import List, Optional, Tuple
+
+
 class AutoIdIncrementer:
-  id = 0
+  """
+  Allocates ids for a single run and is safe to share between threads. A range
+  of ids can be reserved for another incrementer, ie one per worker process, so
+  each allocates ids without coordinating with the others.
+  """
 
-  @classmethod
-  def get_id_and_increment(cls):
-    this_id = cls.id
-    cls.id += 1
+  def __init__(self, start: int = 0, stop: Optional[int] = None):
+    self.start: int = start
+    self.stop: Optional[int] = stop
+    self.id: int = start
+    self.lock: threading.Lock = threading.Lock()
+
+  def get_id_and_increment(self) -> int:
+    with self.lock:
+      if self.stop is not None and self.id >= self.stop:
+        raise ValueError("No ids left in range {} to {}".format(
+          self.start, self.stop))
+      this_id = self.id
+      self.id += 1
     return this_id
 
-  @classmethod
-  def reset(cls):
-    cls.id = 0
+  def reserve(self, count: int) -> "AutoIdIncrementer":
+    """
+    Incrementer for the next count ids, which this incrementer skips.
+    """
+    with self.lock:
+      start = self.id
+      self.id += count
+    return AutoIdIncrementer(start, start + count)
+
+  def skip_to(self, next_id: int):
+    with self.lock:
+      self.id = next_id
+
+  def reset(self):
+    with self.lock:
+      self.id = self.start
+
+  def __getstate__(self):
+    # locks can not be pickled, ie when returned from a worker process
+    state = self.__dict__.copy()
+    del state["lock"]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.lock = threading.Lock()
+
+
+class AssetIdIncrementer:
+  """
+  Allocates the ids of one asset from ranges of ids it was given before, ie to
+  trades processed again from a checkpoint, then from the run's incrementer.
+  Records the ranges of ids it allocates.
+  """
+
+  def __init__(self, incrementer: AutoIdIncrementer,
+               reused: List[Tuple[int, int]] = None):
+    self.incrementer: AutoIdIncrementer = incrementer
+    # start and stop of each range, in order
+    self.reused: List[List[int]] = [list(r) for r in reused or []]
+    self.allocated: List[Tuple[int, int]] = []
+    self.lock: threading.Lock = threading.Lock()
+
+  @property
+  def id(self) -> int:
+    """
+    Next id allocated.
+    """
+    if len(self.reused) > 0:
+      return self.reused[0][0]
+    return self.incrementer.id
+
+  def get_id_and_increment(self) -> int:
+    with self.lock:
+      if len(self.reused) > 0:
+        this_id = self.reused[0][0]
+        self.reused[0][0] += 1
+        if self.reused[0][0] == self.reused[0][1]:
+          self.reused.pop(0)
+      else:
+        this_id = self.incrementer.get_id_and_increment()
+      if len(self.allocated) > 0 and self.allocated[-1][1] == this_id:
+        self.allocated[-1] = (self.allocated[-1][0], this_id + 1)
+      else:
+        self.allocated.append((this_id, this_id + 1))
+    return this_id
@@ -0,0 +1,123 @@
+import argparse
+import os
+import sys
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import Manager
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from calculator.api.price_cache import PriceCache
+from calculator.csv.read_csv import ReadCsv
+from calculator.progress import ProgressReporter
+from calculator.tax_calculator import calculate_all
+
+# Manifest headers
+ACCOUNT = "account"
+PATH = "path"
+BASIS = "basis"
+FILLS = "fills"
+TRACK_WASH = "track wash"
+BATCH_LOG = "batch_log.txt"
+
+
+class Account:
+  """
+  An account in a batch manifest, its basis and fills csvs are in path and
+  outputs are written to path/output/ as for a single run.
+  """
+
+  def __init__(self, name: str, path: str, basis: str, fills: str,
+               track_wash: bool = False):
+    self.name: str = name
+    self.path: str = path
+    self.basis: str = basis
+    self.fills: str = fills
+    self.track_wash: bool = track_wash
+
+
+def read_manifest(manifest_path: str) -> List[Account]:
+  """
+  Reads a csv with account, path, basis, fills and optionally track wash
+  columns. Paths are relative to the manifest's folder.
+  """
+  df = pd.read_csv(manifest_path, dtype=str, keep_default_na=False)
+  root = os.path.dirname(os.path.abspath(manifest_path))
+  accounts = []
+  for row in df.to_dict("records"):
+    path = os.path.join(root, row[PATH], "")
+    track_wash = row.get(TRACK_WASH, "").strip().lower() in ("true", "yes", "1")
+    accounts.append(
+      Account(row[ACCOUNT], path, row[BASIS], row[FILLS], track_wash))
+  return accounts
+
+
+def run_batch(accounts: List[Account], workers: int = 1
+              ) -> Dict[str, Optional[str]]:
+  """
+  Calculates each account in a pool of workers processes, or in this process
+  with one worker, sharing a cache of BTC-USD closes. Returns the error for
+  each account, None if it succeeded, a failed account does not stop others.
+  """
+  if workers <= 1:
+    price_cache = PriceCache()
+    return {
+      account.name: run_account(account, price_cache) for account in accounts
+    }
+  with Manager() as manager:
+    price_cache = PriceCache(manager.dict())
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      futures = [
+        executor.submit(run_account, account, price_cache)
+        for account in accounts
+      ]
+      return {
+        account.name: future.result()
+        for account, future in zip(accounts, futures)
+      }
+
+
+def run_account(account: Account, price_cache: PriceCache) -> Optional[str]:
+  """
+  Calculates an account as a separate run would, warnings are logged again,
+  with its output logged to path/output/.
+  """
+  ReadCsv.log_negative = True
+  output_path = account.path + "output/"
+  try:
+    if not os.path.isdir(output_path):
+      os.mkdir(output_path)
+    with open(output_path + BATCH_LOG, "w") as log, redirect_stdout(log):
+      calculate_all(
+        account.path, account.basis, account.fills, account.track_wash,
+        progress=ProgressReporter(silent=True), price_cache=price_cache)
+  except Exception:
+    return traceback.format_exc()
+  return None
+
+
+def main():
+  parser = argparse.ArgumentParser(
+    description="Calculate each account in a manifest csv")
+  parser.add_argument(
+    "manifest", help="csv with account, path, basis, fills and optionally "
+                     "track wash columns")
+  parser.add_argument(
+    "--workers", help="Number of processes to calculate accounts in",
+    type=int, default=1)
+  args = parser.parse_args()
+  accounts = read_manifest(args.manifest)
+  errors = run_batch(accounts, args.workers)
+  failed = [name for name, error in errors.items() if error is not None]
+  for name in failed:
+    print("Account {} failed:\n{}".format(name, errors[name]))
+  print("Calculated {} of {} accounts".format(
+    len(accounts) - len(failed), len(accounts)))
+  if len(failed) > 0:
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,210 @@
+import pickle
+from collections import deque
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Dict, List, Optional, Tuple
+
+from calculator.csv.write_output import WriteOutput
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.profit_and_loss import Entry
+from calculator.trade_processor.trade_processor import TradeProcessor
+
+# a loss is washed by trades less than 30 days before or after it
+WASH_DAYS = 30
+
+
+def is_settled(entry: Entry, time: datetime) -> bool:
+  """
+  Whether wash checks of trades after time can no longer change entry.
+  """
+  return (time - entry.proceeds.time).days >= WASH_DAYS
+
+
+class Checkpoint:
+  """
+  Snapshot of a processor between two trades with different times. Entries
+  settled by then are only kept as the totals of the rows written for them,
+  the snapshot holds the entries that could still be changed by wash checks.
+  """
+
+  def __init__(self, time: Optional[datetime], trade_count: int,
+               written: Optional[Dict[str, Any]], state: bytes, next_id: int):
+    # time of the last trade processed, None if before any trades
+    self.time: Optional[datetime] = time
+    self.trade_count: int = trade_count
+    # rows and totals of the entries settled by the checkpoint
+    self.written: Optional[Dict[str, Any]] = written
+    self.state: bytes = state
+    # next profit and loss id of the asset
+    self.next_id: int = next_id
+
+  def get_state(self) -> Dict[str, Any]:
+    return pickle.loads(self.state)
+
+
+class AssetCheckpoints:
+  """
+  Takes checkpoints of an asset's processor every trades trades, or once the
+  time since the last checkpoint reaches interval. A trade arriving with a time
+  before trades already processed is handled by rolling back to the latest
+  checkpoint before it and replaying the trades after the checkpoint.
+  """
+
+  def __init__(self, trades: int = 1000, interval: timedelta = None):
+    self.trades: int = trades
+    self.interval: Optional[timedelta] = interval
+    self.checkpoints: List[Checkpoint] = []
+    self.trade_count: int = 0
+    self.since_last: int = 0
+    self.last_time: Optional[datetime] = None
+    # time the interval is measured from
+    self.interval_start: Optional[datetime] = None
+    # rows and totals written for the asset, or settled to be written, up to
+    # the last checkpoint
+    self.written: Optional[Dict[str, Any]] = None
+    # leading entries of the processor settled by the last checkpoint
+    self.settled: int = 0
+    # start and stop of each range of ids allocated for the asset, in order
+    self.id_ranges: List[Tuple[int, int]] = []
+
+  def start(self, written: Optional[Dict[str, Any]]):
+    """
+    Starts processing from a processor whose entries follow the written rows.
+    """
+    self.written = written
+    self.settled = 0
+
+  def before_trade(self, processor: TradeProcessor, trade: Fill):
+    time = trade.time
+    # only between trades with different times, so a checkpoint has processed
+    # every trade up to its time and none after.
+    if self.last_time is None or time > self.last_time:
+      if self.is_due(time):
+        self.add(processor)
+    if self.interval_start is None:
+      self.interval_start = time
+    self.trade_count += 1
+    self.since_last += 1
+    self.last_time = time
+
+  def is_due(self, time: datetime) -> bool:
+    if len(self.checkpoints) == 0:
+      return True
+    if self.since_last >= self.trades:
+      return True
+    return (self.interval is not None and self.interval_start is not None and
+            time - self.interval_start >= self.interval)
+
+  def add(self, processor: TradeProcessor):
+    # only entries after those settled by the last checkpoint are visited
+    entries = processor.entries
+    new = list(islice(reversed(entries), len(entries) - self.settled))
+    new.reverse()
+    settled = 0
+    if not processor.track_wash:
+      settled = len(new)
+    elif self.last_time is not None:
+      while settled < len(new) and is_settled(new[settled], self.last_time):
+        settled += 1
+    self.add_written(processor, new[:settled])
+    self.settled += settled
+    state = processor.get_state(include_entries=True)
+    state["entries"] = deque(new[settled:])
+    if processor.track_wash:
+      pending = set(id(e) for e in state["entries"])
+      state["entries_by_basis_id"] = {
+        basis_id: entry
+        for basis_id, entry in processor.entries_by_basis_id.items()
+        if id(entry) in pending
+      }
+    self.checkpoints.append(Checkpoint(
+      self.last_time, self.trade_count, self.written,
+      pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL),
+      processor.id_incrementer.id))
+    self.since_last = 0
+    self.interval_start = self.last_time
+
+  def add_written(self, processor: TradeProcessor, entries: List[Entry]):
+    if len(entries) == 0:
+      return
+    totals = WriteOutput.get_summary(processor.asset, [], entries)
+    written = self.written
+    if written is None:
+      written = {
+        "rows": 0, "costs": Decimal(0), "proceeds": Decimal(0),
+        "profit and loss": Decimal(0)
+      }
+    self.written = {
+      "rows": written["rows"] + len(entries),
+      "costs": written["costs"] + totals["costs"],
+      "proceeds": written["proceeds"] + totals["proceeds"],
+      "profit and loss": written["profit and loss"] + totals["profit and loss"]
+    }
+
+  def is_late(self, time: datetime) -> bool:
+    return self.last_time is not None and time <= self.last_time
+
+  def rollback(self, time: datetime) -> Checkpoint:
+    """
+    Drops checkpoints at or after time and returns the latest one before it,
+    trades after the returned checkpoint are to be processed again. Raises a
+    ValueError if time is not after the oldest checkpoint kept.
+    """
+    oldest = self.checkpoints[0].time
+    if oldest is not None and oldest >= time:
+      raise ValueError(
+        "Trade at {} is before the oldest checkpoint kept at {}, rows written "
+        "before it are settled.".format(time, oldest))
+    while self.checkpoints[-1].time is not None and \
+          self.checkpoints[-1].time >= time:
+      self.checkpoints.pop()
+    checkpoint = self.checkpoints[-1]
+    self.trade_count = checkpoint.trade_count
+    self.since_last = 0
+    self.last_time = checkpoint.time
+    self.interval_start = checkpoint.time
+    return checkpoint
+
+  def take_ids(self, next_id: int) -> List[Tuple[int, int]]:
+    """
+    Removes and returns the ranges of ids allocated for the asset from
+    next_id, ie the ids of entries made after a checkpoint rolled back to.
+    """
+    kept = []
+    taken = []
+    for start, stop in self.id_ranges:
+      if start < next_id:
+        kept.append((start, min(stop, next_id)))
+      if stop > next_id:
+        taken.append((max(start, next_id), stop))
+    self.id_ranges = kept
+    return taken
+
+  def add_ids(self, ranges: List[Tuple[int, int]]):
+    for start, stop in ranges:
+      if len(self.id_ranges) > 0 and self.id_ranges[-1][1] == start:
+        self.id_ranges[-1] = (self.id_ranges[-1][0], stop)
+      else:
+        self.id_ranges.append((start, stop))
+
+  def drop_settled(self, watermark: datetime):
+    """
+    Drops checkpoints before the latest one at least the wash window before
+    watermark, the entries of each were written once settled by watermark.
+    Trades can then only be late up to the oldest checkpoint kept.
+    """
+    cutoff = watermark - timedelta(days=WASH_DAYS)
+    keep = 0
+    for i, checkpoint in enumerate(self.checkpoints):
+      if checkpoint.time is not None and checkpoint.time > cutoff:
+        break
+      keep = i
+    del self.checkpoints[:keep]
+    if len(self.checkpoints) > 0:
+      # ids before the oldest checkpoint are not allocated again
+      next_id = self.checkpoints[0].next_id
+      self.id_ranges = [
+        (max(start, next_id), stop) for start, stop in self.id_ranges
+        if stop > next_id
+      ]
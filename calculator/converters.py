@@ -28,3 +28,6 @@ CONVERTERS = {
   SIZE_UNIT: SIZE_UNIT_CONVERTER,
   P_F_T_UNIT: SIZE_UNIT_CONVERTER
 }
+# converters when reading a csv, times are parsed a column at a time after
+# rather than with strptime for each row
+CSV_CONVERTERS = {c: v for c, v in CONVERTERS.items() if c != TIME}
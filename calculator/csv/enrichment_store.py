@@ -0,0 +1,42 @@
+import os
+from decimal import Decimal
+from typing import Dict, Tuple
+
+import pandas as pd
+from pandas import DataFrame
+
+from calculator.converters import USD_CONVERTER, PAIR_CONVERTER
+from calculator.format import ID, PAIR, USD_PER_BTC, ENRICHMENT_SFX
+from calculator.trade_types import Pair
+
+
+class EnrichmentStore:
+  """
+  Stores the BTC-USD close found for each non USD quote trade next to the
+  source csv, keyed by product and trade id as trade ids are only unique for a
+  product, so the source file is never rewritten and the exchange api is only
+  queried once per trade.
+  """
+
+  def __init__(self, source_path: str):
+    root, _ = os.path.splitext(source_path)
+    self.path: str = "{}_{}".format(root, ENRICHMENT_SFX)
+
+  def load(self) -> Dict[Tuple[Pair, int], Decimal]:
+    if not os.path.isfile(self.path):
+      return {}
+    df: DataFrame = pd.read_csv(
+      self.path,
+      converters={PAIR: PAIR_CONVERTER, USD_PER_BTC: USD_CONVERTER})
+    return dict(zip(zip(df[PAIR], df[ID]), df[USD_PER_BTC]))
+
+  def append(self, usd_per_btc: Dict[Tuple[Pair, int], Decimal]):
+    if len(usd_per_btc) == 0:
+      return
+    exists = os.path.isfile(self.path)
+    df = DataFrame({
+      PAIR: [pair for pair, _ in usd_per_btc.keys()],
+      ID: [trade_id for _, trade_id in usd_per_btc.keys()],
+      USD_PER_BTC: list(usd_per_btc.values())
+    })
+    df.to_csv(self.path, mode="a", header=not exists, index=False)
@@ -1,14 +1,21 @@
 import time
 from decimal import Decimal
+from itertools import chain
+from typing import Dict, Union, Iterable, Any, List, Tuple
 
 import pandas as pd
 from pandas import DataFrame
 
 from calculator.api.exchange_api import ExchangeApi
-from calculator.converters import CONVERTERS, USD_ROUNDER
-from calculator.format import USD_PER_BTC, VALUE_IN_USD, PAIR, TOTAL, TIME, \
-  TIME_STRING_FORMAT
-from calculator.trade_types import Asset
+from calculator.api.price_cache import PriceCache
+from calculator.converters import CONVERTERS, CSV_CONVERTERS, USD_ROUNDER, \
+  PAIR_CONVERTER
+from calculator.csv.enrichment_store import EnrichmentStore
+from calculator.format import USD_PER_BTC, VALUE_IN_USD, PAIR, TOTAL, TIME, ID, \
+  BASIS_ID, BASIS_PAIR, TIME_STRING_FORMAT
+from calculator.progress import ProgressReporter
+from calculator.trade_processor.fill import TRADE_COLUMNS
+from calculator.trade_types import Asset, Pair
 
 exchange_api = ExchangeApi()
 
@@ -17,49 +24,120 @@ class ReadCsv:
   log_negative = True
 
   @classmethod
-  def read(cls, path) -> DataFrame:
-    df: DataFrame = pd.read_csv(path, converters=CONVERTERS)
+  def read(cls, path, progress: ProgressReporter = None,
+           price_cache: PriceCache = None) -> DataFrame:
+    if progress is None:
+      progress = ProgressReporter()
+    df: DataFrame = pd.read_csv(path, converters=CSV_CONVERTERS)
+    df[TIME] = pd.to_datetime(df[TIME], format=TIME_STRING_FORMAT)
     kvs = df.keys().values
     name = path.split("/")[-1]
     if USD_PER_BTC in kvs and VALUE_IN_USD in kvs:
-      print("STEP 1: loaded all needed data for {}.".format(name))
+      progress.log("STEP 1: loaded all needed data for {}.".format(name))
       df[VALUE_IN_USD] = df[VALUE_IN_USD] \
-        .apply(lambda x: ReadCsv.abs_value_in_usd(x))
+        .apply(lambda x: ReadCsv.abs_value_in_usd(x, progress))
       return df
 
-    print(
+    progress.log(
       "STEP 1: Finding BTC-USD for non USD Quote trades in {}. API limits 3 "
       "requests per second so this will take over one minute per 90 non USD "
-      "quote trades.".format(name)
+      "quote trades not found in prior runs.".format(name)
     )
-    df = cls.update_df_with_usd_per_btc(df)
-    # write csv with usd per btc and total in usd.
-    df.to_csv(path, index=False, date_format=TIME_STRING_FORMAT)
+    # usd per btc is kept in a separate store keyed by product and trade id so
+    # the source csv is left untouched.
+    store = EnrichmentStore(path)
+    stored = store.load()
+    usd_per_btc = dict(stored)
+    df = cls.update_df_with_usd_per_btc(
+      df, usd_per_btc, progress, price_cache)
+    store.append(
+      {k: v for k, v in usd_per_btc.items() if k not in stored})
     return df
 
+  @classmethod
+  def from_records(cls, trades: Union[DataFrame, Iterable[Dict[str, Any]]],
+                   usd_per_btc: Dict[Tuple[Pair, int], Decimal] = None,
+                   progress: ProgressReporter = None) -> DataFrame:
+    """
+    Trades from a DataFrame or records with the csv headers, without reading
+    or writing files. Values, including trade ids, may be csv strings or
+    already converted. Without
+    usd per btc and value in usd columns they are set as for a csv, only
+    querying the exchange api for trades without their product and id in
+    usd_per_btc.
+    """
+    if isinstance(trades, DataFrame):
+      df = trades.copy()
+    else:
+      # object columns so pandas does not parse csv strings itself
+      df = DataFrame(list(trades), dtype=object)
+    if len(df.columns) == 0:
+      df = cls.empty_trades()
+    for column, converter in chain(CONVERTERS.items(), [(ID, int)]):
+      if column in df:
+        df[column] = df[column].apply(
+          lambda x, c=converter: c(x) if isinstance(x, str) else x)
+    df = df.infer_objects()
+    kvs = df.keys().values
+    if USD_PER_BTC in kvs and VALUE_IN_USD in kvs:
+      df[VALUE_IN_USD] = df[VALUE_IN_USD] \
+        .apply(lambda x: ReadCsv.abs_value_in_usd(x, progress))
+      return df
+    return cls.update_df_with_usd_per_btc(df, usd_per_btc, progress)
+
   @staticmethod
-  def update_df_with_usd_per_btc(df) -> DataFrame:
+  def empty_trades() -> DataFrame:
+    """
+    No trades, with the columns and types of a csv with only its headers.
+    """
+    df = DataFrame(columns=TRADE_COLUMNS, dtype=object)
+    df[ID] = df[ID].astype("int64")
+    df[TIME] = pd.to_datetime(df[TIME], format=TIME_STRING_FORMAT)
+    return df
+
+  @staticmethod
+  def update_df_with_usd_per_btc(
+      df, usd_per_btc: Dict[Tuple[Pair, int], Decimal] = None,
+      progress: ProgressReporter = None,
+      price_cache: PriceCache = None) -> DataFrame:
+    """
+    Sets usd per btc and value in usd, only querying the exchange api for
+    non USD quote trades without their product and trade id in usd_per_btc, as
+    trade ids are only unique for a product. Queried values are added to
+    usd_per_btc.
+    :param price_cache: closes by minute checked before querying the api
+    """
+    if usd_per_btc is None:
+      usd_per_btc = {}
+    if progress is None:
+      progress = ProgressReporter()
     usd_not_base_mask = df[PAIR].apply(
       lambda x: x.get_quote_asset() != Asset.USD)
-    usd_per_btc = []
-    trade_count = usd_not_base_mask.value_counts()[True]
-    progress_len = 50
-    count = 0
-    print("\nQuerying exchange API for {} trades\n".format(trade_count))
-    start = time.time()
-    for i, row in df.loc[usd_not_base_mask].iterrows():
-      usd_per_btc.append(exchange_api.get_close(row[TIME]))
-      time.sleep(0.4)
-      count += 1
-      chunk = progress_len * count // trade_count
-      print("[{}{}]".format("*" * chunk, " " * (progress_len - chunk)),
-            end="\r")
-    end = time.time()
-    lapsed = end - start
-    print("\n\nQueried trades in {} seconds {} per trade".format(
-      lapsed, lapsed / trade_count))
+    keys = pd.Series(list(zip(df[PAIR], df[ID])), index=df.index,
+                     dtype=object)
+    query_mask = usd_not_base_mask & ~keys.apply(lambda k: k in usd_per_btc)
+    trade_count = query_mask.sum()
+    if trade_count > 0:
+      progress.log(
+        "\nQuerying exchange API for {} trades\n".format(trade_count))
+      progress.start(trade_count)
+      for i, row in df.loc[query_mask].iterrows():
+        close = None
+        if price_cache is not None:
+          close = price_cache.get(row[TIME])
+        if close is None:
+          close = exchange_api.get_close(row[TIME])
+          time.sleep(0.4)
+          if price_cache is not None:
+            price_cache.set(row[TIME], close)
+        usd_per_btc[(row[PAIR], row[ID])] = close
+        progress.update()
+      lapsed = progress.finish()
+      progress.log("\nQueried trades in {} seconds {} per trade".format(
+        lapsed, lapsed / trade_count))
     df[USD_PER_BTC] = Decimal("NaN")
-    df.loc[usd_not_base_mask, USD_PER_BTC] = usd_per_btc
+    df.loc[usd_not_base_mask, USD_PER_BTC] = \
+      keys[usd_not_base_mask].map(usd_per_btc.get)
     df.loc[usd_not_base_mask, VALUE_IN_USD] = abs(
       df.loc[usd_not_base_mask, TOTAL] * df.loc[usd_not_base_mask, USD_PER_BTC]
     )
@@ -68,11 +146,31 @@ class ReadCsv:
     df[VALUE_IN_USD] = df[VALUE_IN_USD].apply(USD_ROUNDER)
     return df
 
+  @staticmethod
+  def read_lot_ids(path) -> Dict[Tuple[Pair, int], List[Tuple[Pair, int]]]:
+    """
+    Basis products and trade ids to sell by product and trade id of the sale,
+    in the order of the rows for each sale.
+    """
+    df: DataFrame = pd.read_csv(
+      path, usecols=[PAIR, ID, BASIS_PAIR, BASIS_ID],
+      converters={PAIR: PAIR_CONVERTER, BASIS_PAIR: PAIR_CONVERTER})
+    lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = {}
+    rows = zip(df[PAIR], df[ID].tolist(), df[BASIS_PAIR], df[BASIS_ID].tolist())
+    for sale_pair, sale_id, basis_pair, basis_id in rows:
+      lot_ids.setdefault((sale_pair, sale_id), []).append(
+        (basis_pair, basis_id))
+    return lot_ids
+
   @classmethod
-  def abs_value_in_usd(cls, x):
+  def abs_value_in_usd(cls, x, progress: ProgressReporter = None):
     if x < 0:
       if cls.log_negative:
         cls.log_negative = False
-        print("Warning: Found negative value in USD")
+        message = "Warning: Found negative value in USD"
+        if progress is None:
+          print(message)
+        else:
+          progress.log(message)
       return -x
     return x
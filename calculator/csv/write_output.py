@@ -1,90 +1,223 @@
+import os
 from collections import OrderedDict
 from decimal import Decimal
-from typing import Deque, List, Union
+from typing import Any, Deque, Dict, Iterable, List, Union
 
 import pandas as pd
-from pandas import DataFrame, Series
+from pandas import DataFrame
 
-from calculator.format import ADJUSTED_VALUE, TIME_STRING_FORMAT, BASIS_SFX, \
-  COSTS_SFX, PROCEEDS_SFX, PROFIT_AND_LOSS_SFX, SUMMARY, COMBINED_BASIS, \
-  VALUE_IN_USD
-from calculator.trade_processor.profit_and_loss import Entry
+from calculator.format import TIME_STRING_FORMAT, BASIS_SFX, COSTS_SFX, \
+  PROCEEDS_SFX, PROFIT_AND_LOSS_SFX, SUMMARY, COMBINED_BASIS, COMPARISON
+from calculator.trade_processor.entry_store import EntryStore
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.profit_and_loss import Entry, ProfitAndLoss
 from calculator.trade_types import Asset
 
+SUMMARY_COLUMNS = [
+  "asset", "costs", "proceeds", "profit and loss", "remaining basis"
+]
+# summary columns that depend on the lot selection method
+METHOD_COLUMNS = ["costs", "profit and loss", "remaining basis"]
+# summary columns totaled over entries
+ENTRY_COLUMNS = ["costs", "proceeds", "profit and loss"]
+
 
 class WriteOutput:
 
-  def __init__(self, path: str):
+  def __init__(self, path: str, washed: bool = True):
+    """
+    :param washed: False to write the results of tracking wash trades as if
+    they were not tracked, unadjusted for wash loss
+    """
+    self.washed: bool = washed
     self.asset: Union[Asset, None] = None
     self.path_form: str = "{}{}_{}".format(path, "{}", "{}")
     self.summary_path: str = "{}{}".format(path, SUMMARY)
     self.combined_path: str = "{}{}".format(path, COMBINED_BASIS)
+    self.comparison_path: str = "{}{}".format(path, COMPARISON)
     self.summary: OrderedDict[str, Union[List[Asset], List[Decimal]]] = \
-      OrderedDict()
-    self.summary["asset"] = []
-    self.summary["costs"] = []
-    self.summary["proceeds"] = []
-    self.summary["profit and loss"] = []
-    self.summary["remaining basis"] = []
+      OrderedDict((column, []) for column in SUMMARY_COLUMNS)
     self.combined_basis = []
-
-  def write(self, asset: Asset, basis_queue: Deque[Series],
-            entries: Deque[Entry]):
-    def update_summary(pl_df, b_df, summary, combined_basis):
-      self.summary["asset"].append(asset)
-      has_values = len(pl_df) > 0
-      costs = pl_df["costs"].sum() if has_values else Decimal(0)
-      proceeds = pl_df["proceeds"].sum() if has_values else Decimal(0)
-      pl = pl_df["adjusted for wash loss"].sum() if has_values else Decimal(0)
-      summary["costs"].append(costs)
-      summary["proceeds"].append(proceeds)
-      summary["profit and loss"].append(pl)
-      if ADJUSTED_VALUE in b_df:
-        # TODO: this case should be tested.
-        summary["remaining basis"].append(b_df[ADJUSTED_VALUE].sum())
-      else:
-        summary["remaining basis"].append(b_df[VALUE_IN_USD].sum())
+    # totals of the entries written for each asset, without pending entries
+    self.written_totals: Dict[Asset, Dict[str, Decimal]] = {}
+
+  def write(self, asset: Asset, basis_queue: Deque[Fill],
+            entries: Union[EntryStore, Iterable[Entry]],
+            prior: Dict[str, Any] = None,
+            pending: Union[EntryStore, Iterable[Entry]] = None):
+    """
+    Entries in an EntryStore are written from its columns.
+    :param prior: the rows and summary totals already written for asset by a
+    prior run, entries are appended to the costs, proceeds and profit and loss
+    csvs and added to the totals.
+    :param pending: entries not written yet as they can still change, only
+    added to the summary so it has the totals of all entries so far. They are
+    left out of the totals given by get_totals.
+    """
+    def update_summary(b_df, summary, combined_basis):
+      row = self.get_summary(asset, basis_queue, entries, self.washed)
+      if prior is not None:
+        for column in ENTRY_COLUMNS:
+          row[column] += prior[column]
+      self.written_totals[asset] = {c: row[c] for c in ENTRY_COLUMNS}
+      if pending is not None:
+        pending_row = self.get_summary(asset, (), pending, self.washed)
+        for column in ENTRY_COLUMNS:
+          row[column] += pending_row[column]
+      for column, value in row.items():
+        summary[column].append(value)
       combined_basis.append(b_df)
 
     self.asset = asset
-    basis_df = DataFrame(basis_queue)
-    costs_df = DataFrame(e.costs for e in entries)
-    proceeds_df = DataFrame(e.proceeds for e in entries)
-    profit_and_loss_df = DataFrame(
-      e.profit_and_loss.get_series() for e in entries)
-
-    update_summary(profit_and_loss_df, basis_df, self.summary,
-                   self.combined_basis)
-    self._write_for_asset(basis_df, costs_df, proceeds_df, profit_and_loss_df)
+    washed = self.washed
+    basis_df = Fill.to_df(basis_queue, washed)
+    if isinstance(entries, EntryStore):
+      costs_df = entries.fills_df("costs", washed)
+      proceeds_df = entries.fills_df("proceeds", washed)
+      profit_and_loss_df = entries.profit_and_loss_df(washed)
+    else:
+      costs_df = Fill.to_df((e.costs for e in entries), washed)
+      proceeds_df = Fill.to_df((e.proceeds for e in entries), washed)
+      profit_and_loss_df = ProfitAndLoss.to_df(
+        (e.profit_and_loss for e in entries), washed)
+
+    update_summary(basis_df, self.summary, self.combined_basis)
+    if prior is None:
+      self._write_for_asset(
+        basis_df, costs_df, proceeds_df, profit_and_loss_df)
+    else:
+      self._write_for_asset(
+        basis_df, costs_df, proceeds_df, profit_and_loss_df, prior["rows"])
     self.asset = None
 
+  @staticmethod
+  def get_summary(asset: Asset, basis_queue: Deque[Fill],
+                  entries: Union[EntryStore, Iterable[Entry]],
+                  washed: bool = True) -> Dict[str, Any]:
+    """
+    Summary row for asset, the totals of entries and of the remaining basis.
+    :param washed: False for the totals unadjusted for wash loss
+    """
+    def total(values):
+      return sum(values, Decimal(0))
+
+    def p_l_total(field):
+      if isinstance(entries, EntryStore):
+        return total(entries.column("profit_and_loss", field))
+      return total(getattr(e.profit_and_loss, field) for e in entries)
+
+    if not washed:
+      return {
+        "asset": asset,
+        "costs": p_l_total("basis"),
+        "proceeds": p_l_total("proceeds"),
+        "profit and loss": p_l_total("profit_and_loss"),
+        "remaining basis": total(t.value_in_usd for t in basis_queue)
+      }
+
+    return {
+      "asset": asset,
+      "costs": p_l_total("basis"),
+      "proceeds": p_l_total("proceeds"),
+      "profit and loss": p_l_total("taxed_profit_and_loss"),
+      "remaining basis": total(
+        t.adjusted_value if t.adjusted_value is not None else t.value_in_usd
+        for t in basis_queue)
+    }
+
+  @staticmethod
+  def get_comparison(methods: List[Any],
+                     summaries: List[List[Dict[str, Any]]]) -> DataFrame:
+    """
+    Summary rows of each method side by side, a row for each asset with its
+    proceeds and the columns that depend on the method for each method.
+    :param summaries: summary rows for each method, assets in the same order
+    """
+    rows = []
+    for asset_rows in zip(*summaries):
+      row = OrderedDict([
+        ("asset", asset_rows[0]["asset"]),
+        ("proceeds", asset_rows[0]["proceeds"])
+      ])
+      for method, summary in zip(methods, asset_rows):
+        for column in METHOD_COLUMNS:
+          row["{} {}".format(method, column)] = summary[column]
+      rows.append(row)
+    return DataFrame(rows)
+
+  def get_totals(self, asset: Asset, rows: int) -> Dict[str, Any]:
+    """
+    Rows and summary totals written for asset, to be passed as prior to a later
+    write appending to them.
+    """
+    return dict(rows=rows, **self.written_totals[asset])
+
+  def truncate(self, asset: Asset, rows: int):
+    """
+    Removes the rows after the first rows of the costs, proceeds and profit and
+    loss csvs for asset, so they can be written again from a checkpoint.
+    """
+    for sfx in (COSTS_SFX, PROCEEDS_SFX, PROFIT_AND_LOSS_SFX):
+      path = self.path_form.format(asset, sfx)
+      if not os.path.isfile(path):
+        continue
+      with open(path, "rb+") as f:
+        # header then rows, a quoted list of ids never spans lines
+        for _ in range(rows + 1):
+          if not f.readline():
+            break
+        f.truncate(f.tell())
+
   def write_basis(self, df: DataFrame, asset: Asset):
     self._to_csv(df, self.path_form.format(asset, BASIS_SFX), False)
 
-  def write_costs(self, df: DataFrame, asset: Asset):
-    self._to_csv(df, self.path_form.format(asset, COSTS_SFX), True)
+  def write_costs(self, df: DataFrame, asset: Asset, first_row: int = None):
+    self._to_csv(
+      df, self.path_form.format(asset, COSTS_SFX), True, first_row)
 
-  def write_proceeds(self, df: DataFrame, asset: Asset):
-    self._to_csv(df, self.path_form.format(asset, PROCEEDS_SFX), True)
+  def write_proceeds(self, df: DataFrame, asset: Asset,
+                     first_row: int = None):
+    self._to_csv(
+      df, self.path_form.format(asset, PROCEEDS_SFX), True, first_row)
 
-  def write_profit_and_loss(self, df: DataFrame, asset: Asset):
-    self._to_csv(df, self.path_form.format(asset, PROFIT_AND_LOSS_SFX), False)
+  def write_profit_and_loss(self, df: DataFrame, asset: Asset,
+                            first_row: int = None):
+    self._to_csv(
+      df, self.path_form.format(asset, PROFIT_AND_LOSS_SFX), False, first_row)
 
   def write_summary(self):
     df = DataFrame(self.summary)
     self._to_csv(df, self.summary_path, False)
     self._to_csv(pd.concat(self.combined_basis), self.combined_path, False)
 
+  def write_comparison(self, df: DataFrame):
+    self._to_csv(df, self.comparison_path, False)
+
   def _write_for_asset(self, basis_df, costs_df, proceeds_df,
-                       profit_and_loss_df):
+                       profit_and_loss_df, first_row: int = None):
     self.write_basis(basis_df, self.asset)
-    self.write_costs(costs_df, self.asset)
-    self.write_proceeds(proceeds_df, self.asset)
-    self.write_profit_and_loss(profit_and_loss_df, self.asset)
+    if first_row is None:
+      self.write_costs(costs_df, self.asset)
+      self.write_proceeds(proceeds_df, self.asset)
+      self.write_profit_and_loss(profit_and_loss_df, self.asset)
+    else:
+      self.write_costs(costs_df, self.asset, first_row)
+      self.write_proceeds(proceeds_df, self.asset, first_row)
+      self.write_profit_and_loss(profit_and_loss_df, self.asset, first_row)
 
   @staticmethod
-  def _to_csv(df: DataFrame, path: str, add_index):
+  def _to_csv(df: DataFrame, path: str, add_index, first_row: int = None):
+    """
+    :param first_row: rows already written to path by a prior run, rows of df
+    are appended after them.
+    """
     if add_index:
       df = df.reset_index(drop=True)
 
-    df.to_csv(path, index=add_index, date_format=TIME_STRING_FORMAT)
+    if not first_row:
+      df.to_csv(path, index=add_index, date_format=TIME_STRING_FORMAT)
+    elif len(df) > 0:
+      if add_index:
+        df.index += first_row
+      df.to_csv(path, mode="a", header=False, index=add_index,
+                date_format=TIME_STRING_FORMAT)
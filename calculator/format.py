@@ -15,6 +15,9 @@ VALUE_IN_USD = "value in usd"
 ADJUSTED_VALUE = "adjusted value"
 ADJUSTED_SIZE = "adjusted size"
 WASH_P_L_IDS = "wash p and l ids"
+# Default headers for lot ids csv, the basis trade ids sold by each sale
+BASIS_PAIR = "basis product"
+BASIS_ID = "basis trade id"
 # Other defaults
 DELIMINATOR = "-"
 BUY = "BUY"
@@ -35,4 +38,7 @@ COSTS_SFX = "costs.csv"
 PROCEEDS_SFX = "proceeds.csv"
 PROFIT_AND_LOSS_SFX = "profit_and_loss.csv"
 SUMMARY = "summary.csv"
+COMPARISON = "comparison.csv"
 COMBINED_BASIS = "combined_basis.csv"
+ENRICHMENT_SFX = "usd_per_btc.csv"
+INCREMENTAL_STATE = "incremental.state"
@@ -0,0 +1,206 @@
+import os
+from collections import deque
+from datetime import datetime, timedelta
+
+from pandas import DataFrame
+
+from calculator.auto_id_incrementer import AutoIdIncrementer, \
+  AssetIdIncrementer
+from calculator.checkpoints import AssetCheckpoints, is_settled
+from calculator.csv.read_csv import ReadCsv
+from calculator.csv.write_output import WriteOutput
+from calculator.format import TIME, ID, PAIR, INCREMENTAL_STATE
+from calculator.partition import AssetPartition
+from calculator.progress import ProgressReporter
+from calculator.state_store import StateStore
+from calculator.tax_calculator import calculate_tax_profit_and_loss, \
+  get_assets
+from calculator.trade_processor.entry_store import EntryStore
+from calculator.trade_types import Asset
+
+
+def calculate_incremental(path, cb_name, trade_name, track_wash,
+                          progress: ProgressReporter = None,
+                          checkpoint_trades: int = 1000,
+                          checkpoint_interval: timedelta = None):
+  """
+  Processes only the fills not processed by a prior incremental run,
+  continuing from the processor state it saved in the output folder and
+  appending to its outputs. Without a saved state all fills are processed
+  starting from the basis csv.
+
+  When tracking wash trades, entries sold less than 30 days before the
+  watermark can still be changed by later fills, they are kept in the state and
+  written once settled. The summary totals include them as they are so far.
+
+  Checkpoints of each asset are saved every checkpoint_trades trades or
+  checkpoint_interval. A fill arriving with a time before fills already
+  processed for its asset rolls the asset back to the latest checkpoint before
+  it, the fills csv must still contain the fills after the checkpoint. Only the
+  rows written after the checkpoint are written again, entries made again are
+  given the ids they had. Checkpoints of an asset are kept back to the latest
+  one at least 30 days before the watermark, fills can be late up to it.
+
+  Fills are told apart by product and trade id, trade ids are only unique for
+  a product.
+  """
+  if progress is None:
+    progress = ProgressReporter()
+  output_path = path + "output/"
+  if not os.path.isdir(output_path):
+    os.mkdir(output_path)
+  store = StateStore(output_path + INCREMENTAL_STATE)
+  all_trades_df = ReadCsv.read("{}{}".format(path, trade_name), progress)
+  if store.exists():
+    saved = store.load()
+    if saved.track_wash != track_wash:
+      raise ValueError(
+        "Tracking wash trades must match the prior incremental run.")
+    id_incrementer = AutoIdIncrementer(saved.next_id)
+    watermark = saved.extra["watermark"]
+    processed_ids = saved.extra["processed ids"]
+    written = saved.extra["written"]
+    checkpoints = saved.extra["checkpoints"]
+    trades_df = all_trades_df.loc[[
+      key not in processed_ids
+      for key in zip(all_trades_df[PAIR], all_trades_df[ID])
+    ]]
+    states = saved.assets
+    basis_partition = None
+    assets = get_assets(None, trades_df)
+    assets.update(states.keys())
+  else:
+    basis_df = ReadCsv.read("{}{}".format(path, cb_name), progress)
+    trades_df = all_trades_df
+    watermark = None
+    processed_ids = set()
+    written = {}
+    checkpoints = {}
+    states = {}
+    id_incrementer = AutoIdIncrementer()
+    basis_partition = AssetPartition(basis_df, basis=True)
+    assets = get_assets(basis_df, trades_df)
+  assets = sorted(assets, key=lambda a: a.value)
+  progress.log(
+    "STEP 2: Analyzing {} new trades for the following products\n{}".format(
+      len(trades_df), assets))
+
+  if len(trades_df) > 0:
+    last_time = trades_df[TIME].max()
+    if watermark is None or last_time > watermark:
+      watermark = last_time
+    processed_ids.update(zip(trades_df[PAIR], trades_df[ID]))
+
+  write_output = WriteOutput(output_path)
+  trades_partition = AssetPartition(trades_df)
+  all_trades_partition = None
+  processors = {}
+  for asset in assets:
+    trades_for_asset_df = trades_partition.for_asset(asset)
+    asset_checkpoints = checkpoints.setdefault(asset, AssetCheckpoints())
+    asset_checkpoints.trades = checkpoint_trades
+    asset_checkpoints.interval = checkpoint_interval
+    prior = written.get(asset)
+    if basis_partition is not None:
+      asset_ids = AssetIdIncrementer(id_incrementer)
+      asset_checkpoints.start(prior)
+      processor = calculate_tax_profit_and_loss(
+        asset, basis_partition.for_asset(asset), trades_for_asset_df,
+        track_wash, progress, checkpoints=asset_checkpoints,
+        id_incrementer=asset_ids)
+    else:
+      reused_ids = None
+      state = states.get(asset, {"basis_queue": deque()})
+      if len(trades_for_asset_df) > 0:
+        first_time = trades_for_asset_df[TIME].min()
+        if asset_checkpoints.is_late(first_time):
+          if all_trades_partition is None:
+            all_trades_partition = AssetPartition(all_trades_df)
+          trades_for_asset_df = replay_from_checkpoint(
+            asset, asset_checkpoints, first_time, len(trades_for_asset_df),
+            all_trades_partition.for_asset(asset), progress)
+          checkpoint = asset_checkpoints.checkpoints[-1]
+          state = checkpoint.get_state()
+          prior = checkpoint.written
+          write_output.truncate(asset, prior["rows"] if prior else 0)
+          # ids of the entries after the checkpoint are given out again
+          reused_ids = asset_checkpoints.take_ids(checkpoint.next_id)
+      asset_ids = AssetIdIncrementer(id_incrementer, reused_ids)
+      asset_checkpoints.start(prior)
+      processor = calculate_tax_profit_and_loss(
+        asset, None, trades_for_asset_df, track_wash, progress, state,
+        asset_checkpoints, asset_ids)
+    asset_checkpoints.add_ids(asset_ids.allocated)
+
+    settled = processor.entries.take(
+      count_settled(processor.entries, watermark, track_wash))
+    progress.log("Finished processing {}, appending {} entries".format(
+      asset, len(settled)))
+    write_output.write(
+      asset, processor.basis_queue, settled, prior, processor.entries)
+    rows = len(settled) if prior is None else prior["rows"] + len(settled)
+    written[asset] = write_output.get_totals(asset, rows)
+    if watermark is not None:
+      asset_checkpoints.drop_settled(watermark)
+    if track_wash:
+      # only entries not yet written can be changed by later wash checks
+      pending = set(id(e) for e in processor.entries)
+      processor.entries_by_basis_id = {
+        basis_id: entry
+        for basis_id, entry in processor.entries_by_basis_id.items()
+        if id(entry) in pending
+      }
+    processors[asset] = processor
+
+  write_output.write_summary()
+  store.save(
+    processors, track_wash, id_incrementer.id,
+    extra={
+      "watermark": watermark,
+      "processed ids": processed_ids,
+      "written": written,
+      "checkpoints": checkpoints
+    },
+    include_entries=True
+  )
+
+
+def replay_from_checkpoint(asset: Asset, asset_checkpoints: AssetCheckpoints,
+                           first_time: datetime, new_count: int,
+                           all_trades_df: DataFrame,
+                           progress: ProgressReporter = None) -> DataFrame:
+  """
+  Rolls back to the latest checkpoint before first_time and returns the trades
+  for asset to process from it, the trades processed since the checkpoint and
+  the new trades.
+  """
+  processed_count = asset_checkpoints.trade_count
+  checkpoint = asset_checkpoints.rollback(first_time)
+  if progress is None:
+    progress = ProgressReporter()
+  progress.log("Trades for {} arrived before trades already processed, "
+               "replaying from {}".format(asset, checkpoint.time))
+  if checkpoint.time is None:
+    replay_df = all_trades_df
+  else:
+    replay_df = all_trades_df.loc[all_trades_df[TIME] > checkpoint.time]
+  if len(replay_df) != processed_count - checkpoint.trade_count + new_count:
+    raise ValueError(
+      "Fills csv is missing {} trades processed after {}, they are needed to "
+      "replay from the checkpoint.".format(asset, checkpoint.time))
+  return replay_df
+
+
+def count_settled(entries: EntryStore, watermark: datetime,
+                  track_wash: bool) -> int:
+  """
+  Number of leading entries that fills after the watermark can not change.
+  """
+  if not track_wash:
+    return len(entries)
+  count = 0
+  for entry in entries:
+    if not is_settled(entry, watermark):
+      break
+    count += 1
+  return count
@@ -0,0 +1,38 @@
+from collections import defaultdict
+from typing import Dict, List
+
+from pandas import DataFrame
+
+from calculator.format import PAIR, SIDE, TIME
+from calculator.trade_types import Asset, Side
+
+
+class AssetPartition:
+  """
+  Sorts trades by time once and indexes the row positions for each asset in a
+  single pass, so the trades for an asset are a lookup rather than a filter
+  over the full DataFrame.
+
+  Basis partitions only index a trade for the asset it adds to, the base asset
+  for a buy or the quote asset for a sell. Otherwise a trade such as ETH-BTC is
+  indexed for both the base and the quote asset.
+  """
+
+  def __init__(self, df: DataFrame, basis: bool = False):
+    # stable sort keeps the file order for trades with the same time
+    self.df: DataFrame = df.sort_values(TIME, kind="mergesort")
+    self.positions: Dict[Asset, List[int]] = defaultdict(list)
+    pairs_and_sides = zip(self.df[PAIR], self.df[SIDE])
+    for position, (pair, side) in enumerate(pairs_and_sides):
+      base = pair.get_base_asset()
+      quote = pair.get_quote_asset()
+      if not basis:
+        self.positions[base].append(position)
+        self.positions[quote].append(position)
+      elif side == Side.BUY:
+        self.positions[base].append(position)
+      else:
+        self.positions[quote].append(position)
+
+  def for_asset(self, asset: Asset) -> DataFrame:
+    return self.df.iloc[self.positions.get(asset, [])]
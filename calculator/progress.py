@@ -0,0 +1,89 @@
+import sys
+import time
+from typing import Callable, Optional, TextIO
+
+# called with the completed count, the total and the seconds since start
+ProgressCallback = Callable[[int, int, float], None]
+
+
+class ProgressReporter:
+  """
+  Reports progress through a number of steps, ie trades processed or api
+  requests made. Reports are throttled to one every interval seconds, and the
+  last step is always reported.
+
+  A progress bar with throughput and estimated time remaining is written to
+  the stream unless silent, by default silent when the stream is not a
+  terminal so logs of batch jobs are not flooded. A callback allows embedding
+  hosts to receive progress when silent. Messages about the steps being run
+  are also written to the stream, unless silent is passed as True.
+  """
+
+  def __init__(self, interval: float = 0.5, silent: Optional[bool] = None,
+               callback: Optional[ProgressCallback] = None,
+               stream: Optional[TextIO] = None, bar_len: int = 50,
+               clock: Callable[[], float] = time.monotonic):
+    self.stream: TextIO = stream if stream is not None else sys.stdout
+    # only silenced on request, the bar is also silenced when not a terminal
+    self.quiet: bool = silent is True
+    if silent is None:
+      silent = not (hasattr(self.stream, "isatty") and self.stream.isatty())
+    self.silent: bool = silent
+    self.interval: float = interval
+    self.callback: Optional[ProgressCallback] = callback
+    self.bar_len: int = bar_len
+    self.clock: Callable[[], float] = clock
+    self.total: int = 0
+    self.count: int = 0
+    self.start_time: float = 0
+    self.last_report: Optional[float] = None
+
+  def start(self, total: int):
+    self.total = total
+    self.count = 0
+    self.start_time = self.clock()
+    self.last_report = None
+
+  def update(self, steps: int = 1):
+    self.count += steps
+    now = self.clock()
+    if (self.count >= self.total or self.last_report is None or
+          now - self.last_report >= self.interval):
+      self.last_report = now
+      self.report(now - self.start_time)
+
+  def finish(self) -> float:
+    """
+    Ends the progress bar and returns seconds since start.
+    """
+    elapsed = self.clock() - self.start_time
+    if not self.silent and self.last_report is not None:
+      self.stream.write("\n")
+      self.stream.flush()
+    return elapsed
+
+  def log(self, message: str):
+    """
+    Writes a message about the steps being run, ie the asset being processed.
+    """
+    if not self.quiet:
+      self.stream.write(message + "\n")
+      self.stream.flush()
+
+  def report(self, elapsed: float):
+    if self.callback is not None:
+      self.callback(self.count, self.total, elapsed)
+    if not self.silent:
+      self.stream.write(self.format_bar(elapsed) + "\r")
+      self.stream.flush()
+
+  def format_bar(self, elapsed: float) -> str:
+    chunk = self.bar_len * self.count // self.total if self.total > 0 else 0
+    rate = self.count / elapsed if elapsed > 0 else 0
+    if rate > 0:
+      eta = "{:.0f}s".format((self.total - self.count) / rate)
+    else:
+      eta = "?"
+    return "[{}{}] {}/{} {:.1f}/s ETA {}".format(
+      "*" * chunk, " " * (self.bar_len - chunk), self.count, self.total, rate,
+      eta)
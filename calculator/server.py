@@ -0,0 +1,163 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+from http import HTTPStatus
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+from calculator.auto_id_incrementer import AutoIdIncrementer
+from calculator.csv.read_csv import ReadCsv
+from calculator.format import TIME_STRING_FORMAT
+from calculator.progress import ProgressReporter
+from calculator.tax_calculator import Calculation, calculate_processors, \
+  read_inputs
+from calculator.trade_types import Asset, Pair
+
+
+class CalculationServer(HTTPServer):
+  """
+  Keeps the processor of each asset in memory between requests, so queries
+  are answered without reading or processing trades again and new fills are
+  processed as they arrive. Requests are handled one at a time.
+
+  GET /summary              totals for each asset, as in the summary csv
+  GET /basis/ASSET          remaining basis lots of ASSET
+  GET /entries/ASSET?start= profit and loss of ASSET from entry start
+  GET /sale/ASSET?size=     cost of the basis a sale of size of ASSET would
+                            sell next, without selling it
+  POST /fills               json list of fills with the csv headers, fills
+                            already processed are rejected
+  """
+
+  def __init__(self, address: Tuple[str, int], calculation: Calculation,
+               usd_per_btc: Dict[Tuple[Pair, int], Decimal] = None):
+    super().__init__(address, CalculationRequestHandler)
+    self.calculation: Calculation = calculation
+    self.usd_per_btc: Dict[Tuple[Pair, int], Decimal] = \
+      usd_per_btc if usd_per_btc is not None else {}
+    self.summary: Optional[List[Dict[str, Any]]] = None
+
+  def get_summary(self) -> List[Dict[str, Any]]:
+    # cached until more fills are processed
+    if self.summary is None:
+      self.summary = self.calculation.summary().to_dict("records")
+    return self.summary
+
+  def add_fills(self, records: List[Dict[str, Any]]) -> List[Asset]:
+    trades_df = ReadCsv.from_records(
+      records, self.usd_per_btc, ProgressReporter(silent=True))
+    assets = self.calculation.add_trades(trades_df)
+    self.summary = None
+    return assets
+
+
+class CalculationRequestHandler(BaseHTTPRequestHandler):
+  server: CalculationServer
+
+  def do_GET(self):
+    url = urlparse(self.path)
+    parts = url.path.strip("/").split("/")
+    if parts == ["summary"]:
+      self.send_json(self.server.get_summary())
+      return
+    if len(parts) != 2 or parts[0] not in ("basis", "entries", "sale"):
+      self.send_error(HTTPStatus.NOT_FOUND)
+      return
+    asset = self.get_asset(parts[1])
+    if asset is None:
+      return
+    calculation = self.server.calculation
+    if parts[0] == "basis":
+      self.send_json([t.to_dict() for t in calculation.basis(asset)])
+      return
+    if parts[0] == "sale":
+      self.send_sale_cost(asset, parse_qs(url.query).get("size", [""])[0])
+      return
+    try:
+      start = int(parse_qs(url.query).get("start", ["0"])[0])
+      if start < 0:
+        raise ValueError("start must not be negative")
+    except ValueError as e:
+      self.send_error(HTTPStatus.BAD_REQUEST, str(e).splitlines()[0])
+      return
+    entries = calculation.entries(asset)
+    self.send_json([
+      e.profit_and_loss.get_series().to_dict()
+      for e in (entries[i] for i in range(start, len(entries)))
+    ])
+
+  def do_POST(self):
+    if urlparse(self.path).path.strip("/") != "fills":
+      self.send_error(HTTPStatus.NOT_FOUND)
+      return
+    length = int(self.headers.get("Content-Length", 0))
+    try:
+      records = json.loads(self.rfile.read(length))
+      if not isinstance(records, list):
+        raise TypeError("Fills must be a json list")
+      assets = self.server.add_fills(records)
+    except (ValueError, KeyError, TypeError) as e:
+      self.send_error(HTTPStatus.BAD_REQUEST, str(e).splitlines()[0])
+      return
+    self.send_json({"fills": len(records), "assets": assets})
+
+  def send_sale_cost(self, asset: Asset, size: str):
+    try:
+      size = Decimal(size)
+      cost = self.server.calculation.sale_cost(asset, size)
+    except (ArithmeticError, ValueError) as e:
+      self.send_error(HTTPStatus.BAD_REQUEST, str(e).splitlines()[0])
+      return
+    self.send_json({"asset": asset, "size": size, "cost": cost})
+
+  def get_asset(self, name: str) -> Optional[Asset]:
+    try:
+      asset = Asset(name.upper())
+    except ValueError:
+      asset = None
+    if asset not in self.server.calculation.processors:
+      self.send_error(HTTPStatus.NOT_FOUND, "No trades for {}".format(name))
+      return None
+    return asset
+
+  def send_json(self, value: Any):
+    body = json.dumps(value, default=to_json).encode()
+    self.send_response(HTTPStatus.OK)
+    self.send_header("Content-Type", "application/json")
+    self.send_header("Content-Length", str(len(body)))
+    self.end_headers()
+    self.wfile.write(body)
+
+  def log_message(self, format, *args):
+    pass
+
+
+def to_json(value: Any) -> Any:
+  if isinstance(value, datetime):
+    return value.strftime(TIME_STRING_FORMAT)
+  return str(value)
+
+
+def serve(path, cb_name, trade_name, track_wash, port, host="127.0.0.1",
+          load_state=False):
+  """
+  Processes the basis and trades csvs once then serves queries and new fills
+  until interrupted.
+  """
+  progress = ProgressReporter()
+  basis_df, trades_df, states, next_id = read_inputs(
+    path, cb_name, trade_name, track_wash, progress, load_state)
+  id_incrementer = AutoIdIncrementer(next_id)
+  calculation = Calculation(
+    dict(calculate_processors(
+      basis_df, trades_df, track_wash, 1, progress, states, id_incrementer)),
+    track_wash, id_incrementer)
+  server = CalculationServer((host, port), calculation)
+  print("Serving on http://{}:{}/".format(*server.server_address))
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
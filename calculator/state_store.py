@@ -0,0 +1,69 @@
+import gzip
+import os
+import pickle
+from typing import Any, Dict, Deque
+
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Asset
+
+STATE_VERSION = 3
+
+
+class SavedState:
+  """
+  State loaded from a StateStore.
+  """
+
+  def __init__(self, assets: Dict[Asset, Dict[str, Any]], track_wash: bool,
+               next_id: int, extra: Dict[str, Any]):
+    self.assets: Dict[Asset, Dict[str, Any]] = assets
+    self.track_wash: bool = track_wash
+    self.next_id: int = next_id
+    self.extra: Dict[str, Any] = extra
+
+
+class StateStore:
+  """
+  Persists the state of each asset's TradeProcessor after its last trade, the
+  remaining basis including wash adjusted values and the pending wash checks,
+  as a compressed pickle. A later run can start from the saved state instead of
+  a basis csv, without reading or processing prior trades again.
+  """
+
+  def __init__(self, path: str):
+    self.path: str = path
+
+  def exists(self) -> bool:
+    return os.path.isfile(self.path)
+
+  def save(self, processors: Dict[Asset, TradeProcessor], track_wash: bool,
+           next_id: int, extra: Dict[str, Any] = None,
+           include_entries: bool = False):
+    """
+    :param next_id: next profit and loss id so ids continue in the next run
+    :param extra: additional values saved with the state
+    :param include_entries: also save the entries of each processor
+    """
+    # pickled in one dump so trades shared by the basis queue and wash checks
+    # are still shared once loaded.
+    data = {
+      "version": STATE_VERSION,
+      "track_wash": track_wash,
+      "next_id": next_id,
+      "extra": extra if extra is not None else {},
+      "assets": {
+        asset: processor.get_state(include_entries)
+        for asset, processor in processors.items()
+      }
+    }
+    with gzip.open(self.path, "wb") as f:
+      pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+  def load(self) -> SavedState:
+    with gzip.open(self.path, "rb") as f:
+      data = pickle.load(f)
+    if data.get("version") != STATE_VERSION:
+      raise ValueError("Unsupported state version {} in {}".format(
+        data.get("version"), self.path))
+    return SavedState(
+      data["assets"], data["track_wash"], data["next_id"], data["extra"])
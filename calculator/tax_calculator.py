@@ -1,98 +1,611 @@
+import copy
 import os
-import time
 from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 from decimal import Decimal
-from typing import Set
+from itertools import chain
+from typing import Set, List, Tuple, Optional, Dict, Deque, Union, \
+  Iterable, Any, Iterator
 
 import pandas as pd
 from pandas import DataFrame
 
 from calculator.api.exchange_api import ExchangeApi
-from calculator.format import (
-  PAIR, TIME, SIDE, VALUE_IN_USD, ADJUSTED_VALUE,
-  WASH_P_L_IDS, ADJUSTED_SIZE, SIZE_UNIT, P_F_T_UNIT)
+from calculator.api.price_cache import PriceCache
+from calculator.checkpoints import AssetCheckpoints
+from calculator.auto_id_incrementer import AutoIdIncrementer
+from calculator.format import SIZE_UNIT, P_F_T_UNIT, TIME, PAIR, ID
 from calculator.csv.read_csv import ReadCsv
-from calculator.csv.write_output import WriteOutput
-from calculator.trade_types import Asset, Side
+from calculator.csv.write_output import WriteOutput, SUMMARY_COLUMNS
+from calculator.partition import AssetPartition
+from calculator.progress import ProgressReporter
+from calculator.state_store import StateStore
+from calculator.trade_types import Asset, Pair
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.entry_store import EntryStore
 from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_processor.lots import LotMethod, to_lots
+from calculator.trade_processor.multi_asset import MultiAssetProcessor
 
 exchange_api = ExchangeApi()
 
 
-def calculate_all(path, cb_name, trade_name, track_wash):
-  cost_basis_df = ReadCsv.read("{}{}".format(path, cb_name))
-  trades_df = ReadCsv.read("{}{}".format(path, trade_name))
-
-  if track_wash:
-    cost_basis_df[ADJUSTED_VALUE] = cost_basis_df[VALUE_IN_USD]
-    cost_basis_df[ADJUSTED_SIZE] = Decimal(0)
-    cost_basis_df[WASH_P_L_IDS] = pd.Series([] for _ in range(len(trades_df)))
-    trades_df[ADJUSTED_VALUE] = trades_df[VALUE_IN_USD]
-    trades_df[ADJUSTED_SIZE] = Decimal(0)
-    trades_df[WASH_P_L_IDS] = pd.Series([] for _ in range(len(trades_df)))
-  assets = get_assets(cost_basis_df, trades_df)
-  print(
-    "STEP 2: Analyzing trades for the following products\n{}".format(assets)
-  )
+class Calculation:
+  """
+  Results of a calculation kept in memory, the remaining basis and entries of
+  the processor for each asset.
+  """
+
+  def __init__(self, processors: Dict[Asset, TradeProcessor],
+               track_wash: bool, id_incrementer: AutoIdIncrementer = None):
+    self.processors: Dict[Asset, TradeProcessor] = processors
+    self.id_incrementer: AutoIdIncrementer = \
+      id_incrementer if id_incrementer is not None else AutoIdIncrementer()
+    self.track_wash: bool = track_wash
+    # products and trade ids of the trades processed, made by the first
+    # add_trades
+    self.processed_ids: Optional[Set[Tuple[Pair, int]]] = None
+
+  @property
+  def assets(self) -> List[Asset]:
+    return list(self.processors.keys())
+
+  def basis(self, asset: Asset) -> Deque[Fill]:
+    return self.processors[asset].basis_queue
+
+  def entries(self, asset: Asset) -> EntryStore:
+    return self.processors[asset].entries
+
+  def summary(self) -> DataFrame:
+    """
+    Same as the summary csv, one row of totals for each asset.
+    """
+    return DataFrame([
+      WriteOutput.get_summary(asset, p.basis_queue, p.entries)
+      for asset, p in self.processors.items()
+    ], columns=SUMMARY_COLUMNS)
+
+  def sale_cost(self, asset: Asset, size: Decimal) -> Decimal:
+    """
+    Cost of the basis a sale of size of asset would sell next, see
+    TradeProcessor.sale_cost.
+    """
+    return self.processors[asset].sale_cost(size)
+
+  def last_time(self, asset: Asset) -> Optional[datetime]:
+    """
+    Time of the last trade processed for asset, each trade either adds a lot
+    to the basis or is the proceeds of the last entries.
+    """
+    processor = self.processors.get(asset)
+    if processor is None:
+      return None
+    times = []
+    if len(processor.basis_queue) > 0:
+      times.append(processor.basis_queue[-1].time)
+    if len(processor.entries) > 0:
+      times.append(processor.entries[-1].proceeds.time)
+    return max(times) if len(times) > 0 else None
+
+  def add_trades(self, trades_df: DataFrame) -> List[Asset]:
+    """
+    Processes trades following those already processed and returns their
+    assets. Raises a ValueError, before processing any, if a trade was already
+    processed, is before the last trade processed for one of its assets or
+    would sell more than the basis of one of its assets.
+    """
+    keys = list(zip(trades_df[PAIR], trades_df[ID]))
+    processed_ids = self.get_processed_ids()
+    seen = set()
+    for key in keys:
+      if key in processed_ids or key in seen:
+        raise ValueError(
+          "Trade {} of {} is already processed".format(key[1], key[0]))
+      seen.add(key)
+    assets = sorted(get_assets(None, trades_df), key=lambda a: a.value)
+    partition = AssetPartition(trades_df)
+    trades_by_asset = {}
+    for asset in assets:
+      asset_df = partition.for_asset(asset)
+      last_time = self.last_time(asset)
+      first_time = asset_df[TIME].min()
+      if last_time is not None and first_time < last_time:
+        raise ValueError(
+          "Trade for {} at {} is before the last trade processed at {}".format(
+            asset, first_time, last_time))
+      processor = self.processors.get(asset)
+      if processor is None:
+        processor = TradeProcessor(
+          asset, deque(), track_wash=self.track_wash,
+          id_incrementer=self.id_incrementer)
+      trades = Fill.from_df(asset_df, self.track_wash)
+      processor.check_basis(trades)
+      trades_by_asset[asset] = processor, trades
+    for asset, (processor, trades) in trades_by_asset.items():
+      processor.handle_trades(trades)
+      self.processors[asset] = processor
+    self.processors = dict(
+      sorted(self.processors.items(), key=lambda item: item[0].value))
+    processed_ids.update(seen)
+    return assets
+
+  def get_processed_ids(self) -> Set[Tuple[Pair, int]]:
+    """
+    Products and trade ids of the trades processed, each is either in the
+    basis or the costs or proceeds of entries.
+    """
+    if self.processed_ids is None:
+      self.processed_ids = set()
+      for processor in self.processors.values():
+        for trade in processor.basis_queue:
+          self.processed_ids.add((trade.pair, trade.id))
+        for part in ("costs", "proceeds"):
+          self.processed_ids.update(zip(
+            processor.entries.column(part, "pair"),
+            processor.entries.column(part, "id")))
+    return self.processed_ids
+
+  def write(self, output_path: str):
+    write_output = WriteOutput(output_path)
+    for asset, processor in self.processors.items():
+      write_output.write(asset, processor.basis_queue, processor.entries)
+    write_output.write_summary()
+
+
+def calculate(basis: Union[DataFrame, Iterable[Dict[str, Any]], None],
+              trades: Union[DataFrame, Iterable[Dict[str, Any]]],
+              track_wash: bool = False, workers: int = 1,
+              progress: ProgressReporter = None,
+              states: Dict[Asset, dict] = None,
+              usd_per_btc: Dict[Tuple[Pair, int], Decimal] = None,
+              next_id: int = 0,
+              method: LotMethod = LotMethod.FIFO,
+              lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None
+              ) -> Calculation:
+  """
+  Calculates profit and loss without reading or writing files.
+  :param basis: basis trades as a DataFrame or records with the csv headers,
+  values either csv strings or converted, None when starting from states
+  :param trades: trades in the same form as basis
+  :param progress: reports progress and messages, silent by default
+  :param states: state of each asset saved by a prior run to start from
+  :param usd_per_btc: known BTC-USD closes by product and trade id, the
+  exchange api is only queried for other non USD quote trades without usd per
+  btc
+  :param next_id: first profit and loss id, ie continuing a prior run
+  :param method: how the basis lots sold by each sale are chosen
+  :param lot_ids: basis products and trade ids to sell by product and trade
+  id of the sale, for specific id lots
+  """
+  if progress is None:
+    progress = ProgressReporter(silent=True)
+  if usd_per_btc is None:
+    usd_per_btc = {}
+  basis_df = None
+  if basis is not None:
+    basis_df = ReadCsv.from_records(basis, usd_per_btc, progress)
+  trades_df = ReadCsv.from_records(trades, usd_per_btc, progress)
+  id_incrementer = AutoIdIncrementer(next_id)
+  return Calculation(
+    dict(calculate_processors(
+      basis_df, trades_df, track_wash, workers, progress, states,
+      id_incrementer, method, lot_ids)),
+    track_wash, id_incrementer)
+
+
+def calculate_all(path, cb_name, trade_name, track_wash, workers=1,
+                  progress: ProgressReporter = None, load_state=False,
+                  save_state: str = None, price_cache: PriceCache = None,
+                  method: LotMethod = LotMethod.FIFO,
+                  lot_ids: Dict[Tuple[Pair, int],
+                                List[Tuple[Pair, int]]] = None,
+                  write_unwashed: bool = False, single_pass: bool = False):
+  """
+  :param load_state: cb_name is a state file saved by a prior run rather than
+  a basis csv
+  :param save_state: name of file in path to save the state of each asset
+  after the last trade
+  :param price_cache: closes checked before querying the exchange api
+  :param method: how the basis lots sold by each sale are chosen
+  :param lot_ids: basis products and trade ids to sell by product and trade
+  id of the sale, for specific id lots
+  :param write_unwashed: with track_wash, also write the results as if wash
+  trades were not tracked to the unwashed folder of the output, from the same
+  processing. Sales match the same lots either way.
+  :param single_pass: with one worker, process all assets in one pass over
+  the trades, see MultiAssetProcessor
+  """
+  if write_unwashed and not track_wash:
+    raise ValueError("Unwashed results are only written when tracking wash.")
+  if progress is None:
+    progress = ProgressReporter()
+  cost_basis_df, trades_df, states, next_id = read_inputs(
+    path, cb_name, trade_name, track_wash, progress, load_state, price_cache)
+  id_incrementer = AutoIdIncrementer(next_id)
+
   output_path = path + "output/"
   if not os.path.isdir(output_path):
     os.mkdir(output_path)
   write_output = WriteOutput(output_path)
-  for asset in assets:
-    print("Starting to process {}".format(asset))
-    base = lambda a: a.get_base_asset()
-    quote = lambda a: a.get_quote_asset()
-    basis_df = cost_basis_df.loc[
-      (
-          (
-              (cost_basis_df[PAIR].apply(base) == asset) &
-              (cost_basis_df[SIDE] == Side.BUY)
-          ) | (
-              (cost_basis_df[PAIR].apply(quote) == asset) &
-              (cost_basis_df[SIDE] == Side.SELL)
-          )
-      )
-    ].sort_values(TIME)
-
-    trades_for_asset_df = trades_df.loc[
-      (trades_df[PAIR].apply(quote) == asset) |
-      (trades_df[PAIR].apply(base) == asset)
-      ].sort_values(TIME)
-
-    processor = calculate_tax_profit_and_loss(
-      asset, basis_df, trades_for_asset_df, track_wash)
-
-    print("Finished processing {}, saving results  csv format".format(asset))
+  unwashed_output = None
+  if write_unwashed:
+    unwashed_path = output_path + "unwashed/"
+    if not os.path.isdir(unwashed_path):
+      os.mkdir(unwashed_path)
+    unwashed_output = WriteOutput(unwashed_path, washed=False)
+  end_processors = {}
+  processors = calculate_processors(
+    cost_basis_df, trades_df, track_wash, workers, progress, states,
+    id_incrementer, method, lot_ids, single_pass)
+  for asset, processor in processors:
+    progress.log(
+      "Finished processing {}, saving results  csv format".format(asset))
     write_output.write(asset, processor.basis_queue, processor.entries)
+    if unwashed_output is not None:
+      unwashed_output.write(asset, processor.basis_queue, processor.entries)
+    if save_state is not None:
+      end_processors[asset] = processor
 
   # Write summary
   write_output.write_summary()
+  if unwashed_output is not None:
+    unwashed_output.write_summary()
+  if save_state is not None:
+    StateStore("{}{}".format(path, save_state)).save(
+      end_processors, track_wash, id_incrementer.id)
+
+
+def compare_methods(path, cb_name, trade_name, track_wash,
+                    methods: List[LotMethod], workers=1,
+                    progress: ProgressReporter = None, load_state=False,
+                    price_cache: PriceCache = None,
+                    lot_ids: Dict[Tuple[Pair, int],
+                                  List[Tuple[Pair, int]]] = None
+                    ) -> DataFrame:
+  """
+  Calculates the trades with each lot selection method of methods, reading
+  and enriching the csvs once, and writes the summaries of the methods side by
+  side. Only the summaries are written. Methods are calculated in up to
+  workers processes, the assets of each method one after another.
+  :return: the comparison written, see WriteOutput.get_comparison
+  """
+  if lot_ids is not None and LotMethod.SPECIFIC_ID not in methods:
+    raise ValueError("Lot ids are only used with specific id lots.")
+  if progress is None:
+    progress = ProgressReporter()
+  cost_basis_df, trades_df, states, next_id = read_inputs(
+    path, cb_name, trade_name, track_wash, progress, load_state, price_cache)
+
+  output_path = path + "output/"
+  if not os.path.isdir(output_path):
+    os.mkdir(output_path)
+  if workers > 1:
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+      futures = [
+        executor.submit(
+          summarize_method, cost_basis_df, trades_df, track_wash, states,
+          next_id, method, lot_ids)
+        for method in methods
+      ]
+      summaries = [future.result() for future in futures]
+  else:
+    # processing changes the lots of states, each method starts from a copy
+    summaries = [
+      summarize_method(
+        cost_basis_df, trades_df, track_wash, copy.deepcopy(states), next_id,
+        method, lot_ids)
+      for method in methods
+    ]
+  comparison = WriteOutput.get_comparison(methods, summaries)
+  WriteOutput(output_path).write_comparison(comparison)
+  return comparison
+
+
+def summarize_method(basis_df: Optional[DataFrame], trades_df: DataFrame,
+                     track_wash: bool, states: Optional[Dict[Asset, dict]],
+                     next_id: int, method: LotMethod,
+                     lot_ids: Dict[Tuple[Pair, int],
+                                   List[Tuple[Pair, int]]] = None
+                     ) -> List[Dict[str, Any]]:
+  """
+  Summary row of each asset in asset order with method, each processor is
+  dropped once summarized. Lot ids are only used for specific id lots.
+  """
+  if method is not LotMethod.SPECIFIC_ID:
+    lot_ids = None
+  processors = calculate_processors(
+    basis_df, trades_df, track_wash, 1, ProgressReporter(silent=True), states,
+    AutoIdIncrementer(next_id), method, lot_ids)
+  return [
+    WriteOutput.get_summary(asset, processor.basis_queue, processor.entries)
+    for asset, processor in processors
+  ]
+
+
+def read_inputs(path, cb_name, trade_name, track_wash,
+                progress: ProgressReporter, load_state=False,
+                price_cache: PriceCache = None
+                ) -> Tuple[Optional[DataFrame], DataFrame,
+                           Optional[Dict[Asset, dict]], int]:
+  """
+  Reads the basis csv, or the states saved by a prior run when load_state,
+  and the trades csv. Also returns the next profit and loss id, continuing
+  from the saved states. Raises a ValueError if the states were saved with
+  tracking wash trades different from track_wash.
+  """
+  next_id = 0
+  if load_state:
+    cost_basis_df = None
+    saved = StateStore("{}{}".format(path, cb_name)).load()
+    if saved.track_wash != track_wash:
+      raise ValueError(
+        "Tracking wash trades must match the run that saved the state.")
+    states = saved.assets
+    next_id = saved.next_id
+  else:
+    cost_basis_df = ReadCsv.read(
+      "{}{}".format(path, cb_name), progress, price_cache)
+    states = None
+  trades_df = ReadCsv.read(
+    "{}{}".format(path, trade_name), progress, price_cache)
+  return cost_basis_df, trades_df, states, next_id
+
+
+def calculate_processors(
+      basis_df: Optional[DataFrame], trades_df: DataFrame, track_wash: bool,
+      workers: int, progress: ProgressReporter,
+      states: Optional[Dict[Asset, dict]],
+      id_incrementer: AutoIdIncrementer,
+      method: LotMethod = LotMethod.FIFO,
+      lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None,
+      single_pass: bool = False
+) -> Iterator[Tuple[Asset, TradeProcessor]]:
+  """
+  Yields the processor for each asset in asset order once its trades are
+  processed, starting from basis_df or from states when basis_df is None.
+  Profit and loss ids are allocated from id_incrementer.
+  :param single_pass: with one worker, process the trades of all assets in
+  one pass over them rather than one asset after another, see
+  MultiAssetProcessor
+  """
+  if single_pass and workers > 1:
+    raise ValueError("A single pass is only made with one worker.")
+  if lot_ids is not None and method is not LotMethod.SPECIFIC_ID:
+    raise ValueError("Lot ids are only used with specific id lots.")
+  if basis_df is None and states is None:
+    states = {}
+  assets = get_assets(basis_df, trades_df)
+  if states is not None:
+    assets.update(states.keys())
+  # sorted so output and profit and loss ids do not depend on set ordering
+  assets = sorted(assets, key=lambda a: a.value)
+  progress.log(
+    "STEP 2: Analyzing trades for the following products\n{}".format(assets))
+  trades_partition = AssetPartition(trades_df)
+  if basis_df is None:
+    asset_inputs = [
+      (asset, None, trades_partition.for_asset(asset),
+       states.get(asset, {"basis_queue": deque()}))
+      for asset in assets
+    ]
+  else:
+    basis_partition = AssetPartition(basis_df, basis=True)
+    asset_inputs = [
+      (asset, basis_partition.for_asset(asset),
+       trades_partition.for_asset(asset), None)
+      for asset in assets
+    ]
+  if workers > 1:
+    processors = calculate_in_processes(
+      asset_inputs, track_wash, workers, id_incrementer, method, lot_ids)
+  elif single_pass:
+    processors = calculate_in_one_pass(
+      asset_inputs, trades_partition.df, track_wash, progress,
+      id_incrementer, method, lot_ids)
+  else:
+    processors = (
+      calculate_tax_profit_and_loss(
+        asset, basis_df, asset_df, track_wash, progress, state,
+        id_incrementer=id_incrementer, method=method, lot_ids=lot_ids)
+      for asset, basis_df, asset_df, state in asset_inputs
+    )
+  return zip(assets, processors)
+
+
+def calculate_in_processes(
+      asset_inputs: List[Tuple[Asset, DataFrame, DataFrame, dict]],
+      track_wash: bool, workers: int,
+      id_incrementer: AutoIdIncrementer,
+      method: LotMethod = LotMethod.FIFO,
+      lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None
+) -> List[TradeProcessor]:
+  """
+  Processes each asset in a separate process. Each process allocates ids from
+  its own range, sized by the most entries its trades could make, so ids are
+  deterministic without coordinating between processes. Ids are then moved
+  together in asset order to match the ids of processing the assets one after
+  another. Progress is not reported from worker processes.
+  """
+  ranges = AutoIdIncrementer(id_incrementer.id)
+  id_ranges = [
+    ranges.reserve(get_max_entries(basis_df, asset_df, state))
+    for asset, basis_df, asset_df, state in asset_inputs
+  ]
+  with ProcessPoolExecutor(max_workers=workers) as executor:
+    futures = [
+      executor.submit(
+        _calculate_in_range, asset, basis_df, asset_df, track_wash, state,
+        id_range, method, lot_ids)
+      for (asset, basis_df, asset_df, state), id_range
+      in zip(asset_inputs, id_ranges)
+    ]
+    processors = [future.result() for future in futures]
+  move_ids_in_asset_order(processors, id_ranges, id_incrementer)
+  return processors
+
+
+def calculate_in_one_pass(
+      asset_inputs: List[Tuple[Asset, DataFrame, DataFrame, dict]],
+      trades_df: DataFrame, track_wash: bool, progress: ProgressReporter,
+      id_incrementer: AutoIdIncrementer, method: LotMethod = LotMethod.FIFO,
+      lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None
+) -> List[TradeProcessor]:
+  """
+  Processes the trades of all assets in one pass over trades_df, see
+  MultiAssetProcessor. As for processes, each asset allocates ids from its own
+  range and ids are then moved together in asset order.
+  :param trades_df: trades of all assets sorted by time
+  """
+  ranges = AutoIdIncrementer(id_incrementer.id)
+  id_ranges = []
+  processors = []
+  for asset, basis_df, asset_df, state in asset_inputs:
+    id_range = ranges.reserve(get_max_entries(basis_df, asset_df, state))
+    id_ranges.append(id_range)
+    processors.append(create_processor(
+      asset, basis_df, track_wash, state, id_range, method, lot_ids))
+  multi_asset_processor = MultiAssetProcessor(dict(
+    (asset, processor)
+    for (asset, _, _, _), processor in zip(asset_inputs, processors)))
+  trades = Fill.from_df(trades_df, track_wash)
+  progress.log("\nProcessing {} trades\n".format(len(trades)))
+  progress.start(len(trades))
+  multi_asset_processor.handle_trades(trades, progress)
+  progress.finish()
+  move_ids_in_asset_order(processors, id_ranges, id_incrementer)
+  return processors
+
+
+def move_ids_in_asset_order(processors: List[TradeProcessor],
+                            id_ranges: List[AutoIdIncrementer],
+                            id_incrementer: AutoIdIncrementer):
+  """
+  Moves the ids each processor allocated from its range to follow those of
+  the processors before it, from the next id of id_incrementer. Processors
+  then allocate ids from id_incrementer.
+  """
+  next_id = id_incrementer.id
+  for processor, id_range in zip(processors, id_ranges):
+    move_profit_and_loss_ids(processor, id_range, next_id)
+    next_id += len(processor.entries)
+    processor.id_incrementer = id_incrementer
+  id_incrementer.skip_to(next_id)
+
+
+def get_max_entries(basis_df: Optional[DataFrame], asset_df: DataFrame,
+                    state: Optional[dict]) -> int:
+  """
+  Each entry either uses up a basis trade or completes a proceeds trade, so
+  there are at most as many entries as basis and asset trades.
+  """
+  if basis_df is not None:
+    basis_count = len(basis_df)
+  else:
+    basis_count = len(state["basis_queue"])
+  return basis_count + len(asset_df)
+
+
+def _calculate_in_range(asset, basis_df, asset_df, track_wash, state,
+                        id_range: AutoIdIncrementer,
+                        method=LotMethod.FIFO, lot_ids=None):
+  return calculate_tax_profit_and_loss(
+    asset, basis_df, asset_df, track_wash, ProgressReporter(silent=True),
+    state, id_incrementer=id_range, method=method, lot_ids=lot_ids)
+
+
+def move_profit_and_loss_ids(processor: TradeProcessor,
+                             id_range: AutoIdIncrementer, first_id: int):
+  """
+  Moves the ids allocated from id_range to start from first_id, ids of prior
+  runs in the wash ids of a saved basis are left as they are.
+  """
+  offset = first_id - id_range.start
+  if offset == 0:
+    return
+  processor.entries.offset_ids(offset)
+  if not processor.track_wash:
+    return
+  # split trades share the same list of ids, only offset each list once
+  offset_lists = set()
+  id_lists = chain(
+    (t.wash_p_l_ids for t in processor.basis_queue),
+    processor.entries.column("costs", "wash_p_l_ids"),
+    processor.entries.column("proceeds", "wash_p_l_ids")
+  )
+  for ids in id_lists:
+    if id(ids) not in offset_lists:
+      offset_lists.add(id(ids))
+      ids[:] = [
+        i + offset if id_range.start <= i < id_range.stop else i for i in ids
+      ]
 
 
 def calculate_tax_profit_and_loss(
-      asset, basis_df, asset_df: pd.DataFrame, track_wash):
-  basis_queue = deque(j for i, j in basis_df.iterrows())
-  processor = TradeProcessor(asset, basis_queue, track_wash=track_wash)
-  trade_count = len(asset_df)
-  progress_len = 50
-  count = 0
-  print("\nProcessing {} trades\n".format(trade_count))
-  start = time.time()
-  for j, trade in asset_df.iterrows():
-    processor.handle_trade(trade)
-    count += 1
-    chunk = progress_len * count // trade_count
-    print("[{}{}]".format("*" * chunk, " " * (progress_len - chunk)), end="\r")
-  end = time.time()
-  lapsed = end - start
+      asset, basis_df, asset_df: pd.DataFrame, track_wash,
+      progress: ProgressReporter = None, state: dict = None,
+      checkpoints: AssetCheckpoints = None,
+      id_incrementer: AutoIdIncrementer = None,
+      method: LotMethod = LotMethod.FIFO,
+      lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None):
+  """
+  Processes trades for asset starting from either the basis trades in basis_df
+  or the state of a prior run.
+  :param checkpoints: takes checkpoints of the processor between trades
+  :param id_incrementer: allocates profit and loss ids for the run
+  :param method: how the basis lots sold by each sale are chosen, the basis
+  of a saved state is kept for it
+  :param lot_ids: basis products and trade ids to sell by product and trade
+  id of the sale, for specific id lots
+  """
+  if progress is None:
+    progress = ProgressReporter()
+  progress.log("Starting to process {}".format(asset))
+  processor = create_processor(
+    asset, basis_df, track_wash, state, id_incrementer, method, lot_ids)
+  trades = Fill.from_df(asset_df, track_wash)
+  trade_count = len(trades)
+  progress.log("\nProcessing {} trades\n".format(trade_count))
+  progress.start(trade_count)
+  if checkpoints is None:
+    processor.handle_trades(trades, progress)
+  else:
+    for trade in trades:
+      checkpoints.before_trade(processor, trade)
+      processor.handle_trade(trade)
+      progress.update()
+  lapsed = progress.finish()
   if trade_count > 0:
-    print("\n\nProcessed trades in {} seconds {} per trade\n".format(
+    progress.log("\nProcessed trades in {} seconds {} per trade\n".format(
       lapsed, lapsed / trade_count))
   return processor
 
 
-def get_assets(basis_df: DataFrame, trades_df: DataFrame) -> Set[Asset]:
-  assets: Set[Asset] = set(basis_df[SIZE_UNIT].unique())
+def create_processor(
+      asset, basis_df, track_wash, state: Optional[dict],
+      id_incrementer: AutoIdIncrementer, method: LotMethod = LotMethod.FIFO,
+      lot_ids: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None
+) -> TradeProcessor:
+  """
+  Processor for asset, starting from either the basis
+  trades in basis_df or the state of a prior run.
+  """
+  if state is not None:
+    state = dict(state, basis_queue=to_lots(
+      method, asset, state["basis_queue"], lot_ids))
+    return TradeProcessor.from_state(
+      asset, state, track_wash=track_wash, id_incrementer=id_incrementer)
+  basis_queue = to_lots(
+    method, asset, Fill.from_df(basis_df, track_wash), lot_ids)
+  return TradeProcessor(asset, basis_queue, track_wash=track_wash,
+                        id_incrementer=id_incrementer)
+
+
+def get_assets(basis_df: Optional[DataFrame], trades_df: DataFrame
+               ) -> Set[Asset]:
+  assets: Set[Asset] = set()
+  if basis_df is not None:
+    assets.update(basis_df[SIZE_UNIT].unique())
   assets.update(trades_df[SIZE_UNIT].unique())
   assets.update(trades_df[P_F_T_UNIT])
   if Asset.USD in assets:
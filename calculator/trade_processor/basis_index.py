@@ -0,0 +1,104 @@
+from bisect import bisect_left
+from decimal import Decimal
+from itertools import islice
+from typing import Deque, List
+
+from calculator.converters import USD_ROUNDER
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.time_window import COMPACT_AFTER
+from calculator.trade_types import Asset
+
+
+class BasisIndex:
+  """
+  Running totals of the size and cost of first in first out basis lots, so
+  the cost of the lots a sale of any size would sell is found by bisecting the
+  totals rather than walking the lots.
+
+  The index follows a basis queue by identity of its lots: lots appended since
+  the last sync are added to the totals and lots sold are skipped over. Only
+  the lot at the front of the queue is split in place by a sale, so its size
+  and cost are read from the lot itself. Costs are value in usd, the basis of
+  a profit and loss.
+  """
+
+  def __init__(self, asset: Asset):
+    self.asset: Asset = asset
+    self.lots: List[Fill] = []
+    # totals of the lots before each position, from the first lot kept
+    self.sizes: List[Decimal] = [Decimal(0)]
+    self.costs: List[Decimal] = [Decimal(0)]
+    # position of the lot at the front of the queue
+    self.head: int = 0
+
+  def sync(self, basis_queue: Deque[Fill]):
+    """
+    Updates the totals for the lots appended to and sold from basis_queue
+    since the last sync.
+    """
+    lots = self.lots
+    if len(basis_queue) == 0:
+      self.head = len(lots)
+    else:
+      first = basis_queue[0]
+      while self.head < len(lots) and lots[self.head] is not first:
+        self.head += 1
+    added = len(basis_queue) - (len(lots) - self.head)
+    if added > 0:
+      # the lots appended are the last ones of the queue
+      new_lots = list(islice(reversed(basis_queue), added))
+      new_lots.reverse()
+      for lot in new_lots:
+        lots.append(lot)
+        self.sizes.append(self.sizes[-1] + self.basis_size(lot))
+        self.costs.append(self.costs[-1] + lot.value_in_usd)
+    if self.head >= COMPACT_AFTER and self.head * 2 >= len(lots):
+      self.compact()
+
+  def sale_cost(self, size: Decimal) -> Decimal:
+    """
+    Cost of the lots a sale of size would sell next, rounded as the sale
+    would split the last lot it sells from.
+    """
+    if size <= 0:
+      return Decimal(0)
+    head = self.head
+    if head == len(self.lots):
+      raise ValueError("Sale of {} {} exceeds the basis of 0".format(
+        size, self.asset))
+    first = self.lots[head]
+    first_size = self.basis_size(first)
+    if size < first_size:
+      return USD_ROUNDER(first.value_in_usd * size / first_size)
+    if size == first_size:
+      return first.value_in_usd
+    # totals of the lots after the first lot, from position head + 1
+    sizes = self.sizes
+    start = sizes[head + 1]
+    rest = size - first_size
+    end = bisect_left(sizes, start + rest, head + 2)
+    if end == len(sizes):
+      raise ValueError("Sale of {} {} exceeds the basis of {}".format(
+        size, self.asset, first_size + sizes[-1] - start))
+    # lots between the first lot and the last lot sold are sold whole
+    cost = first.value_in_usd + self.costs[end - 1] - self.costs[head + 1]
+    last = self.lots[end - 1]
+    last_size = sizes[end] - sizes[end - 1]
+    last_sold = rest - (sizes[end - 1] - start)
+    if last_sold == last_size:
+      return cost + last.value_in_usd
+    return cost + USD_ROUNDER(last.value_in_usd * last_sold / last_size)
+
+  def compact(self):
+    """
+    Drops the lots sold, their totals are taken off the totals kept.
+    """
+    head = self.head
+    size, cost = self.sizes[head], self.costs[head]
+    self.lots = self.lots[head:]
+    self.sizes = [s - size for s in self.sizes[head:]]
+    self.costs = [c - cost for c in self.costs[head:]]
+    self.head = 0
+
+  def basis_size(self, lot: Fill) -> Decimal:
+    return lot.size if lot.pair.base is self.asset else lot.total
@@ -0,0 +1,502 @@
+from array import array
+from collections import OrderedDict, deque
+from decimal import Decimal
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, \
+  Tuple
+
+from pandas import DataFrame
+
+from calculator.trade_processor.fill import Fill, FIELDS, WASH_COLUMNS
+from calculator.trade_processor.profit_and_loss import Entry, \
+  ProfitAndLoss, P_L_COLUMNS, UNWASHED_P_L_COLUMNS
+from calculator.trade_processor.wash_candidates import WASH_WINDOW
+from calculator.trade_types import Asset, Pair, Side
+
+# fields of a fill that are the same for each portion of its trade, kept once
+# for the trade
+TRADE_FIELDS = (
+  "id", "pair", "side", "time", "size_unit", "price", "p_f_t_unit",
+  "usd_per_btc", "wash_p_l_ids", "micros")
+# fields of a fill keying its trade
+KEY_FIELDS = ("id", "micros", "pair", "side", "wash_p_l_ids")
+# fields of a fill that differ for each portion of its trade
+PORTION_FIELDS = (
+  "size", "fee", "total", "value_in_usd", "adjusted_value", "adjusted_size")
+# fields of a profit and loss only kept when not the value derived from the
+# costs and proceeds, in the order derived
+DERIVED_FIELDS = (
+  "size", "unwashed_size", "basis", "proceeds", "profit_and_loss",
+  "taxed_profit_and_loss")
+# exponents marking a value as None or kept as is, ie NaN
+NONE = -128
+OTHER = 127
+
+
+def _same(value: Decimal, derived: Decimal) -> bool:
+  """
+  Whether value is derived, the same number with the same exponent.
+  """
+  return value is derived or value.compare_total(derived) == 0
+
+
+def _trade_key(id_: int, micros: int, pair: Pair, side: Side,
+               wash_p_l_ids: Optional[List[int]]) -> tuple:
+  """
+  Key of a trade, fills split from a trade share their pair, side and list of
+  wash ids. Pairs and sides are keyed by identity as enums hash slowly.
+  """
+  return id_, micros, id(pair), id(side), id(wash_p_l_ids)
+
+
+def _same_trade(values: tuple, fill: Fill) -> bool:
+  """
+  Whether the values of a trade in TRADE_FIELDS order not in its key are those
+  of fill, fills split from a trade share the same objects.
+  """
+  time, size_unit, price, p_f_t_unit, usd_per_btc = values[3:8]
+  return (
+    (time is fill.time or time == fill.time) and
+    size_unit is fill.size_unit and
+    (price is fill.price or price == fill.price) and
+    p_f_t_unit is fill.p_f_t_unit and
+    (usd_per_btc is fill.usd_per_btc or usd_per_btc == fill.usd_per_btc))
+
+
+class Decimals:
+  """
+  A column of decimals as 8 byte coefficients and 1 byte exponents, so each
+  is written back the same. Values that do not fit, ie NaN, are kept by row.
+  Rows not put are None, the arrays only reach the last row put.
+  """
+
+  def __init__(self):
+    self.coefficients: array = array("q")
+    self.exponents: array = array("b")
+    self.others: Dict[int, Decimal] = {}
+    # exponent of the last value put and a decimal with it, the values of a
+    # column mostly have the same exponent
+    self.exponent: int = -2
+    self.quantum: Decimal = Decimal("0.01")
+
+  def put(self, row: int, value: Decimal):
+    """
+    Sets the value of row, a row after any put before.
+    """
+    if len(self.exponents) < row:
+      missing = row - len(self.exponents)
+      self.coefficients.frombytes(bytes(8 * missing))
+      self.exponents.extend(array("b", [NONE]) * missing)
+    if not value.same_quantum(self.quantum):
+      exponent = value.as_tuple().exponent
+      if type(exponent) is not int or not NONE < exponent < OTHER:
+        self.put_other(row, value)
+        return
+      self.exponent = exponent
+      self.quantum = Decimal((0, (1,), exponent))
+    coefficient = int(value.scaleb(-self.exponent))
+    if coefficient == 0 and value.is_signed():
+      self.put_other(row, value)
+      return
+    try:
+      self.coefficients.append(coefficient)
+    except OverflowError:
+      self.put_other(row, value)
+      return
+    self.exponents.append(self.exponent)
+
+  def put_other(self, row: int, value: Decimal):
+    self.coefficients.append(0)
+    self.exponents.append(OTHER)
+    self.others[row] = value
+
+  def get(self, row: int) -> Optional[Decimal]:
+    if row >= len(self.exponents):
+      return None
+    exponent = self.exponents[row]
+    if exponent == NONE:
+      return None
+    if exponent == OTHER:
+      return self.others[row]
+    return Decimal(self.coefficients[row]).scaleb(exponent)
+
+  def values(self, length: int) -> List[Optional[Decimal]]:
+    """
+    Values of the first length rows.
+    """
+    others = self.others
+    values = [
+      Decimal(c).scaleb(e) if NONE < e < OTHER
+      else None if e == NONE else others[row]
+      for row, (c, e) in enumerate(zip(self.coefficients, self.exponents))
+    ]
+    return values + [None] * (length - len(values))
+
+  def take(self, count: int) -> "Decimals":
+    """
+    Removes the first count rows and returns them as a column of their own.
+    """
+    taken = Decimals()
+    taken.coefficients = self.coefficients[:count]
+    taken.exponents = self.exponents[:count]
+    del self.coefficients[:count]
+    del self.exponents[:count]
+    taken.others, self.others = _split_rows(self.others, count)
+    return taken
+
+
+def _split_rows(values: Dict[int, Any], count: int
+                ) -> Tuple[Dict[int, Any], Dict[int, Any]]:
+  """
+  Values by row of the first count rows, and of the rest from row 0.
+  """
+  return (
+    {row: v for row, v in values.items() if row < count},
+    {row - count: v for row, v in values.items() if row >= count})
+
+
+class Portions:
+  """
+  The costs or the proceeds fills of entries, the trade of each by its row in
+  the trades of the store and the values of each portion as Decimals.
+  """
+
+  def __init__(self):
+    self.trades: array = array("q")
+    self.values: Dict[str, Decimals] = {f: Decimals() for f in PORTION_FIELDS}
+
+  def append(self, trade: int, fill: Fill):
+    row = len(self.trades)
+    self.trades.append(trade)
+    values = self.values
+    values["size"].put(row, fill.size)
+    values["fee"].put(row, fill.fee)
+    values["total"].put(row, fill.total)
+    values["value_in_usd"].put(row, fill.value_in_usd)
+    if fill.adjusted_value is not None:
+      values["adjusted_value"].put(row, fill.adjusted_value)
+    if fill.adjusted_size is not None:
+      values["adjusted_size"].put(row, fill.adjusted_size)
+
+  def fill(self, row: int, trades: List[tuple]) -> Fill:
+    values = dict(zip(TRADE_FIELDS, trades[self.trades[row]]))
+    for field, column in self.values.items():
+      values[field] = column.get(row)
+    return Fill(**values)
+
+  def column(self, field: str, trades: List[tuple]) -> List[Any]:
+    if field in self.values:
+      return self.values[field].values(len(self.trades))
+    i = TRADE_FIELDS.index(field)
+    return [trades[t][i] for t in self.trades]
+
+  def take(self, count: int) -> "Portions":
+    taken = Portions()
+    taken.trades = self.trades[:count]
+    del self.trades[:count]
+    taken.values = {f: c.take(count) for f, c in self.values.items()}
+    return taken
+
+
+class EntryStore:
+  """
+  Entries of an asset in the order made, kept as parallel columns of the
+  values of their costs, proceeds and profit and loss rather than as Entry
+  objects. Values the same for each portion of a trade, ie its time and
+  price, are kept once for the trade. Values of a profit and loss are only
+  kept when they are not those derived from its costs and proceeds, ie when
+  washed. Without wash trades a row takes about a hundred bytes.
+
+  When tracking wash trades an entry is kept as an Entry object until settled,
+  ie until wash checks of later trades can no longer change it. An entry read
+  from the columns is made for the read, changes to it are not kept. Frames
+  to write are made from the columns.
+  """
+
+  def __init__(self, asset: Asset, track_wash: bool = False):
+    self.asset: Asset = asset
+    self.track_wash: bool = track_wash
+    # values of each trade in TRADE_FIELDS order
+    self.trades: List[tuple] = []
+    self.trade_rows: Dict[tuple, int] = {}
+    self.costs: Portions = Portions()
+    self.proceeds: Portions = Portions()
+    self.ids: array = array("q")
+    self.profit_and_loss: Dict[str, Decimals] = {
+      f: Decimals() for f in DERIVED_FIELDS}
+    # only lists with ids are kept, by row
+    self.wash_loss_basis_ids: Dict[int, List[int]] = {}
+    # entries not yet settled, after those in the columns
+    self.pending: Deque[Entry] = deque()
+
+  def __len__(self) -> int:
+    return len(self.ids) + len(self.pending)
+
+  def __iter__(self) -> Iterator[Entry]:
+    for row in range(len(self.ids)):
+      yield self.entry(row)
+    yield from self.pending
+
+  def __reversed__(self) -> Iterator[Entry]:
+    yield from reversed(self.pending)
+    for row in reversed(range(len(self.ids))):
+      yield self.entry(row)
+
+  def __getitem__(self, index: int) -> Entry:
+    if index < 0:
+      index += len(self)
+    if not 0 <= index < len(self):
+      raise IndexError("entry index out of range")
+    if index < len(self.ids):
+      return self.entry(index)
+    return self.pending[index - len(self.ids)]
+
+  def append(self, entry: Entry):
+    if self.track_wash:
+      self.pending.append(entry)
+    else:
+      self.add(entry)
+
+  def extend(self, entries: Iterable[Entry]):
+    for entry in entries:
+      self.append(entry)
+
+  def popleft(self) -> Entry:
+    return self.take(1)[0]
+
+  def settle(self, micros: int) -> List[Entry]:
+    """
+    Moves the pending entries with proceeds at least the wash window before
+    micros to the columns, and returns them.
+    """
+    pending = self.pending
+    settled = []
+    while len(pending) > 0 and \
+        micros - pending[0].proceeds.micros >= WASH_WINDOW:
+      entry = pending.popleft()
+      self.add(entry)
+      settled.append(entry)
+    return settled
+
+  def add(self, entry: Entry):
+    costs = entry.costs
+    proceeds = entry.proceeds
+    p_l = entry.profit_and_loss
+    if p_l.asset != self.asset:
+      raise ValueError(
+        "Entry of {} added to the entries of {}".format(p_l.asset, self.asset))
+    row = len(self.ids)
+    self.costs.append(self.trade_row(costs), costs)
+    self.proceeds.append(self.trade_row(proceeds), proceeds)
+    self.ids.append(p_l.id)
+    # as derive, mostly the same objects
+    if costs.pair.get_base_asset() == self.asset:
+      size = costs.size
+    else:
+      size = costs.total
+    derived = (
+      ("size", p_l.size, size),
+      ("unwashed_size", p_l.unwashed_size, p_l.size),
+      ("basis", p_l.basis, costs.value_in_usd),
+      ("proceeds", p_l.proceeds, proceeds.value_in_usd),
+      ("profit_and_loss", p_l.profit_and_loss, p_l.proceeds - p_l.basis),
+      ("taxed_profit_and_loss", p_l.taxed_profit_and_loss,
+       p_l.profit_and_loss))
+    for field, value, derived_value in derived:
+      if not _same(value, derived_value):
+        self.profit_and_loss[field].put(row, value)
+    if len(p_l.wash_loss_basis_ids) > 0:
+      self.wash_loss_basis_ids[row] = p_l.wash_loss_basis_ids
+
+  def trade_row(self, fill: Fill) -> int:
+    key = _trade_key(
+      fill.id, fill.micros, fill.pair, fill.side, fill.wash_p_l_ids)
+    row = self.trade_rows.get(key)
+    if row is not None and _same_trade(self.trades[row], fill):
+      return row
+    row = len(self.trades)
+    self.trades.append(tuple(getattr(fill, field) for field in TRADE_FIELDS))
+    self.trade_rows[key] = row
+    return row
+
+  def derive(self, field: str, costs: Fill, proceeds: Fill,
+             p_l: ProfitAndLoss) -> Decimal:
+    """
+    Value of field of the profit and loss of costs and proceeds as first made,
+    from the values of p_l before it in DERIVED_FIELDS.
+    """
+    if field == "size":
+      if costs.pair.get_base_asset() == self.asset:
+        return costs.size
+      return costs.total
+    if field == "unwashed_size":
+      return p_l.size
+    if field == "basis":
+      return costs.value_in_usd
+    if field == "proceeds":
+      return proceeds.value_in_usd
+    if field == "profit_and_loss":
+      return p_l.proceeds - p_l.basis
+    return p_l.profit_and_loss
+
+  def entry(self, row: int) -> Entry:
+    """
+    Entry of a row of the columns.
+    """
+    entry = Entry.__new__(Entry)
+    entry.costs = costs = self.costs.fill(row, self.trades)
+    entry.proceeds = proceeds = self.proceeds.fill(row, self.trades)
+    entry.profit_and_loss = p_l = ProfitAndLoss.__new__(ProfitAndLoss)
+    p_l.id = self.ids[row]
+    p_l.asset = self.asset
+    p_l.wash_loss_basis_ids = self.wash_loss_basis_ids.get(row, [])
+    p_l.basis_id = costs.id
+    p_l.basis_pair = costs.pair
+    p_l.proceeds_id = proceeds.id
+    p_l.proceeds_pair = proceeds.pair
+    for field, column in self.profit_and_loss.items():
+      value = column.get(row)
+      if value is None:
+        value = self.derive(field, costs, proceeds, p_l)
+      setattr(p_l, field, value)
+    return entry
+
+  def column(self, part: str, field: str) -> List[Any]:
+    """
+    Values of field of the costs, proceeds or profit_and_loss of each entry.
+    """
+    pending = [getattr(getattr(e, part), field) for e in self.pending]
+    if part == "costs":
+      return self.costs.column(field, self.trades) + pending
+    if part == "proceeds":
+      return self.proceeds.column(field, self.trades) + pending
+    return self.profit_and_loss_column(field) + pending
+
+  def profit_and_loss_column(self, field: str) -> List[Any]:
+    if field == "id":
+      return self.ids.tolist()
+    if field == "asset":
+      return [self.asset] * len(self.ids)
+    if field == "wash_loss_basis_ids":
+      ids = self.wash_loss_basis_ids
+      return [ids.get(row, []) for row in range(len(self.ids))]
+    for part, prefix in ((self.costs, "basis_"), (self.proceeds, "proceeds_")):
+      if field.startswith(prefix) and field[len(prefix):] in ("id", "pair"):
+        return part.column(field[len(prefix):], self.trades)
+    values = self.profit_and_loss[field].values(len(self.ids))
+    if all(v is not None for v in values):
+      return values
+    derived = self.derive_column(field)
+    return [d if v is None else v for v, d in zip(values, derived)]
+
+  def derive_column(self, field: str) -> List[Decimal]:
+    """
+    derive of field for each row, from the columns.
+    """
+    if field == "size":
+      pairs = self.costs.column("pair", self.trades)
+      return [
+        size if pair.get_base_asset() == self.asset else total
+        for pair, size, total in zip(
+          pairs, self.costs.column("size", self.trades),
+          self.costs.column("total", self.trades))
+      ]
+    if field == "unwashed_size":
+      return self.profit_and_loss_column("size")
+    if field == "basis":
+      return self.costs.column("value_in_usd", self.trades)
+    if field == "proceeds":
+      return self.proceeds.column("value_in_usd", self.trades)
+    if field == "profit_and_loss":
+      return [
+        proceeds - basis for proceeds, basis in zip(
+          self.profit_and_loss_column("proceeds"),
+          self.profit_and_loss_column("basis"))
+      ]
+    return self.profit_and_loss_column("profit_and_loss")
+
+  def fills_df(self, part: str, washed: bool = True) -> DataFrame:
+    """
+    Same as Fill.to_df of the costs or proceeds of the entries.
+    """
+    if len(self) == 0:
+      return DataFrame()
+    columns = FIELDS
+    if not washed or all(
+        ids is None for ids in self.column(part, "wash_p_l_ids")):
+      columns = OrderedDict(
+        (c, f) for c, f in FIELDS.items() if c not in WASH_COLUMNS)
+    return DataFrame(OrderedDict(
+      (column, self.column(part, field)) for column, field in columns.items()))
+
+  def profit_and_loss_df(self, washed: bool = True) -> DataFrame:
+    """
+    Same as ProfitAndLoss.to_df of the profit and loss of the entries.
+    """
+    if len(self) == 0:
+      return DataFrame()
+    columns = P_L_COLUMNS if washed else UNWASHED_P_L_COLUMNS
+    return DataFrame(OrderedDict(
+      (column, self.column("profit_and_loss", field)
+       if field is not None else [[] for _ in range(len(self))])
+      for column, field in columns.items()))
+
+  def offset_ids(self, offset: int):
+    """
+    Adds offset to the profit and loss id of each entry.
+    """
+    self.ids = array("q", (i + offset for i in self.ids))
+    for entry in self.pending:
+      entry.profit_and_loss.id += offset
+
+  def take(self, count: int) -> "EntryStore":
+    """
+    Removes the first count entries and returns them as entries of their own.
+    """
+    taken = EntryStore(self.asset, self.track_wash)
+    rows = min(count, len(self.ids))
+    taken.costs = self.costs.take(rows)
+    taken.proceeds = self.proceeds.take(rows)
+    taken.ids = self.ids[:rows]
+    del self.ids[:rows]
+    taken.profit_and_loss = {
+      f: c.take(rows) for f, c in self.profit_and_loss.items()}
+    taken.wash_loss_basis_ids, self.wash_loss_basis_ids = _split_rows(
+      self.wash_loss_basis_ids, rows)
+    for _ in range(count - rows):
+      taken.pending.append(self.pending.popleft())
+    taken.trades = self.trades
+    taken.compact_trades()
+    self.compact_trades()
+    return taken
+
+  def compact_trades(self):
+    """
+    Drops the trades no longer in a row.
+    """
+    old = self.trades
+    rows = {}
+    self.trades = []
+    for part in (self.costs, self.proceeds):
+      for i, trade in enumerate(part.trades):
+        row = rows.get(trade)
+        if row is None:
+          row = rows[trade] = len(self.trades)
+          self.trades.append(old[trade])
+        part.trades[i] = row
+    self.index_trades()
+
+  def index_trades(self):
+    self.trade_rows = {
+      _trade_key(*(values[TRADE_FIELDS.index(f)] for f in KEY_FIELDS)): row
+      for row, values in enumerate(self.trades)
+    }
+
+  def __getstate__(self):
+    # ids of the lists of wash ids in the keys are not kept by pickling
+    state = self.__dict__.copy()
+    del state["trade_rows"]
+    return state
+
+  def __setstate__(self, state):
+    self.__dict__.update(state)
+    self.index_trades()
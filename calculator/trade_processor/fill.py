@@ -0,0 +1,191 @@
+from collections import OrderedDict
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+from pandas import DataFrame
+
+from calculator.converters import USD_ROUNDER
+from calculator.format import ID, PAIR, SIDE, TIME, SIZE, SIZE_UNIT, PRICE, \
+  FEE, TOTAL, P_F_T_UNIT, USD_PER_BTC, VALUE_IN_USD, ADJUSTED_VALUE, \
+  ADJUSTED_SIZE, WASH_P_L_IDS
+from calculator.trade_processor.time_window import epoch_micros, \
+  epoch_micros_list
+from calculator.trade_types import Asset, Pair, Side
+
+# csv column of each field, in the order written to csv
+FIELDS = OrderedDict([
+  (ID, "id"),
+  (PAIR, "pair"),
+  (SIDE, "side"),
+  (TIME, "time"),
+  (SIZE, "size"),
+  (SIZE_UNIT, "size_unit"),
+  (PRICE, "price"),
+  (FEE, "fee"),
+  (TOTAL, "total"),
+  (P_F_T_UNIT, "p_f_t_unit"),
+  (USD_PER_BTC, "usd_per_btc"),
+  (VALUE_IN_USD, "value_in_usd"),
+  (ADJUSTED_VALUE, "adjusted_value"),
+  (ADJUSTED_SIZE, "adjusted_size"),
+  (WASH_P_L_IDS, "wash_p_l_ids")
+])
+WASH_COLUMNS = [ADJUSTED_VALUE, ADJUSTED_SIZE, WASH_P_L_IDS]
+TRADE_COLUMNS = [c for c in FIELDS if c not in WASH_COLUMNS]
+
+
+class Fill:
+  """
+  A trade or basis lot as processed by TradeProcessor, with a field for each
+  csv column. Wash fields are None unless wash trades are tracked. Fills are
+  created from and converted back to DataFrames at the edges, they can also be
+  indexed by csv column. The time is also kept as integer microseconds since
+  the epoch, micros, for time windows to compare as integers. Only the
+  datetime is written.
+  """
+
+  __slots__ = tuple(FIELDS.values()) + ("micros",)
+
+  def __init__(self, id: int, pair: Pair, side: Side, time: datetime,
+               size: Decimal, size_unit: Asset, price: Decimal, fee: Decimal,
+               total: Decimal, p_f_t_unit: Asset, usd_per_btc: Decimal,
+               value_in_usd: Decimal, adjusted_value: Decimal = None,
+               adjusted_size: Decimal = None,
+               wash_p_l_ids: List[int] = None, micros: int = None):
+    """
+    :param micros: epoch_micros of time, when already known
+    """
+    self.id: int = id
+    self.pair: Pair = pair
+    self.side: Side = side
+    self.time: datetime = time
+    self.size: Decimal = size
+    self.size_unit: Asset = size_unit
+    self.price: Decimal = price
+    self.fee: Decimal = fee
+    self.total: Decimal = total
+    self.p_f_t_unit: Asset = p_f_t_unit
+    self.usd_per_btc: Decimal = usd_per_btc
+    self.value_in_usd: Decimal = value_in_usd
+    self.adjusted_value: Optional[Decimal] = adjusted_value
+    self.adjusted_size: Optional[Decimal] = adjusted_size
+    self.wash_p_l_ids: Optional[List[int]] = wash_p_l_ids
+    self.micros: int = micros if micros is not None else epoch_micros(time)
+
+  @classmethod
+  def from_dict(cls, values: Dict[str, Any], wash: bool = False) -> "Fill":
+    fill = cls(*(values[c] for c in TRADE_COLUMNS))
+    if wash:
+      fill.track_wash()
+    return fill
+
+  @classmethod
+  def from_df(cls, df: DataFrame, wash: bool = False) -> List["Fill"]:
+    """
+    A fill for each row of df, by column rather than by row so no Series is
+    made for a row.
+    """
+    columns = [df[c].tolist() for c in TRADE_COLUMNS]
+    columns.append(epoch_micros_list(df[TIME]))
+    fills = [
+      cls(*values, micros=micros) for *values, micros in zip(*columns)]
+    if wash:
+      for fill in fills:
+        fill.track_wash()
+    return fills
+
+  @staticmethod
+  def to_df(fills: Iterable["Fill"], washed: bool = True) -> DataFrame:
+    """
+    Same as a DataFrame of the dict of each fill, made a column at a time
+    rather than a row at a time.
+    :param washed: False to leave out the wash columns
+    """
+    fills = list(fills)
+    if len(fills) == 0:
+      return DataFrame()
+    columns = FIELDS
+    if not washed or all(f.wash_p_l_ids is None for f in fills):
+      columns = OrderedDict(
+        (c, f) for c, f in FIELDS.items() if c not in WASH_COLUMNS)
+    return DataFrame(OrderedDict(
+      (column, [getattr(fill, field) for fill in fills])
+      for column, field in columns.items()))
+
+  def track_wash(self):
+    """
+    Sets the wash fields, each fill gets its own list of wash ids so fills in
+    two assets, ie ETH-BTC, are not shared.
+    """
+    self.adjusted_value = self.value_in_usd
+    self.adjusted_size = Decimal(0)
+    self.wash_p_l_ids = []
+
+  def split(self, size: Decimal, total_size: Decimal) -> "Fill":
+    """
+    Takes size of total_size from this fill and returns it as a new fill, this
+    fill is left in place as the remainder. Values of the taken portion are
+    rounded and the remainder keeps the rest, so no value is lost across splits.
+    """
+    quantize = self.pair.quantize
+    portion_size = quantize(self.size * size / total_size)
+    portion_fee = quantize(self.fee * size / total_size)
+    portion_total = quantize(self.total * size / total_size)
+    portion_value = USD_ROUNDER(self.value_in_usd * size / total_size)
+    self.size -= portion_size
+    self.fee -= portion_fee
+    self.total -= portion_total
+    self.value_in_usd -= portion_value
+    if self.adjusted_value is None:
+      portion_adjusted_value = None
+    else:
+      portion_adjusted_value = USD_ROUNDER(
+        self.adjusted_value * size / total_size)
+      self.adjusted_value -= portion_adjusted_value
+    return Fill(
+      self.id, self.pair, self.side, self.time, portion_size, self.size_unit,
+      self.price, portion_fee, portion_total, self.p_f_t_unit,
+      self.usd_per_btc, portion_value, portion_adjusted_value,
+      self.adjusted_size, self.wash_p_l_ids, self.micros)
+
+  def copy(self) -> "Fill":
+    """
+    Shallow copy, the list of wash ids is shared as for a copied Series.
+    """
+    fill = Fill.__new__(Fill)
+    for field in self.__slots__:
+      setattr(fill, field, getattr(self, field))
+    return fill
+
+  def to_dict(self, washed: bool = True) -> Dict[str, Any]:
+    """
+    Values by csv column, wash columns only when wash trades are tracked.
+    :param washed: False to leave out the wash columns as if wash trades were
+    not tracked
+    """
+    values = OrderedDict(
+      (column, getattr(self, field)) for column, field in FIELDS.items())
+    if self.wash_p_l_ids is None or not washed:
+      for column in WASH_COLUMNS:
+        del values[column]
+    return values
+
+  def __getitem__(self, column: str) -> Any:
+    return getattr(self, FIELDS[column])
+
+  def __setitem__(self, column: str, value: Any):
+    setattr(self, FIELDS[column], value)
+
+  def __contains__(self, column: str) -> bool:
+    return column in FIELDS and getattr(self, FIELDS[column]) is not None
+
+  def __getstate__(self):
+    return tuple(getattr(self, field) for field in self.__slots__)
+
+  def __setstate__(self, state):
+    for field, value in zip(self.__slots__, state):
+      setattr(self, field, value)
+
+  def __repr__(self):
+    return "Fill({})".format(dict(self.to_dict()))
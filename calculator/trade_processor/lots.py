@@ -0,0 +1,231 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from decimal import Decimal
+from enum import Enum
+from heapq import heappop, heappush
+from typing import Deque, Dict, Iterable, Iterator, List, Tuple, Union
+
+from calculator.trade_processor.fill import Fill
+from calculator.trade_types import Asset, Pair
+
+
+class LotMethod(Enum):
+  FIFO = "fifo"
+  LIFO = "lifo"
+  HIFO = "hifo"
+  SPECIFIC_ID = "specific-id"
+
+  def __repr__(self):
+    return "<{}: {}>".format(self.__class__.__name__, self.value)
+
+  def __str__(self):
+    return self.value
+
+
+class Lots(ABC):
+  """
+  Basis lots of an asset kept in the order a lot selection method sells them,
+  with the deque methods TradeProcessor uses on first in first out lots:
+  lots[0] is the next lot to sell and popleft removes it, append adds a lot
+  and lots[-1] is the last lot added. A lot partly sold is split in place and
+  stays the next lot to sell. Iterating gives the lots in the order added.
+  """
+
+  @abstractmethod
+  def __len__(self) -> int:
+    pass
+
+  @abstractmethod
+  def __iter__(self) -> Iterator[Fill]:
+    pass
+
+  @abstractmethod
+  def __getitem__(self, index: int) -> Fill:
+    pass
+
+  @abstractmethod
+  def append(self, lot: Fill):
+    pass
+
+  @abstractmethod
+  def popleft(self) -> Fill:
+    pass
+
+
+class LifoLots(Lots):
+  """
+  Last in first out, a stack of the lots.
+  """
+
+  def __init__(self, lots: Iterable[Fill] = ()):
+    self.stack: List[Fill] = list(lots)
+
+  def __len__(self) -> int:
+    return len(self.stack)
+
+  def __iter__(self) -> Iterator[Fill]:
+    return iter(self.stack)
+
+  def __getitem__(self, index: int) -> Fill:
+    # the next lot to sell and the last lot added are both the top
+    if index not in (0, -1):
+      raise IndexError("only the next and last lots can be indexed")
+    return self.stack[-1]
+
+  def append(self, lot: Fill):
+    self.stack.append(lot)
+
+  def popleft(self) -> Fill:
+    return self.stack.pop()
+
+
+class HifoLots(Lots):
+  """
+  Highest cost in first out, a heap of the lots by cost per unit of the asset
+  with lots of the same cost sold in the order added.
+  """
+
+  def __init__(self, asset: Asset, lots: Iterable[Fill] = ()):
+    self.asset: Asset = asset
+    # negative unit cost, so the top of the heap is the highest cost, and the
+    # number the lot was added as
+    self.heap: List[Tuple[Decimal, int, Fill]] = []
+    self.lots: "OrderedDict[int, Fill]" = OrderedDict()
+    self.next_number: int = 0
+    for lot in lots:
+      self.append(lot)
+
+  def __len__(self) -> int:
+    return len(self.lots)
+
+  def __iter__(self) -> Iterator[Fill]:
+    return iter(self.lots.values())
+
+  def __getitem__(self, index: int) -> Fill:
+    if index == 0:
+      return self.heap[0][2]
+    if index == -1:
+      if len(self.lots) == 0:
+        raise IndexError("no lots")
+      return next(reversed(self.lots.values()))
+    raise IndexError("only the next and last lots can be indexed")
+
+  def append(self, lot: Fill):
+    number = self.next_number
+    self.next_number += 1
+    self.lots[number] = lot
+    heappush(self.heap, (- self.unit_cost(lot), number, lot))
+
+  def popleft(self) -> Fill:
+    _, number, lot = heappop(self.heap)
+    del self.lots[number]
+    return lot
+
+  def unit_cost(self, lot: Fill) -> Decimal:
+    # the cost of a lot split in place keeps about the same unit cost, so its
+    # place in the heap stays
+    size = lot.size if lot.pair.base is self.asset else lot.total
+    if size == 0:
+      return Decimal(0)
+    return lot.value_in_usd / size
+
+
+class SpecificIdLots(Lots):
+  """
+  Lots chosen for each sale by product and trade id, from the basis products
+  and trade ids selected for the product and id of the sale. A sale sells its
+  selected lots in order, then any rest of it first in first out, as does a
+  sale without selected lots. select must be called with each sale before
+  matching it.
+  """
+
+  def __init__(
+        self, lots: Iterable[Fill] = (),
+        selections: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None):
+    """
+    :param selections: basis products and trade ids to sell by product and
+    trade id of the sale
+    """
+    self.selections: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = \
+      selections if selections is not None else {}
+    self.lots: "OrderedDict[int, Fill]" = OrderedDict()
+    # numbers of the lots held for each product and trade id, in the order
+    # added, ids are only unique within a product
+    self.numbers_by_id: Dict[Tuple[Pair, int], Deque[int]] = {}
+    self.next_number: int = 0
+    # products and trade ids still to sell from for the current sale
+    self.selected: Deque[Tuple[Pair, int]] = deque()
+    for lot in lots:
+      self.append(lot)
+
+  def __len__(self) -> int:
+    return len(self.lots)
+
+  def __iter__(self) -> Iterator[Fill]:
+    return iter(self.lots.values())
+
+  def __getitem__(self, index: int) -> Fill:
+    if len(self.lots) == 0:
+      raise IndexError("no lots")
+    if index == 0:
+      return self.lots[self.next_lot_number()]
+    if index == -1:
+      return next(reversed(self.lots.values()))
+    raise IndexError("only the next and last lots can be indexed")
+
+  def select(self, sale: Fill):
+    self.selected = deque(self.selections.get((sale.pair, sale.id), ()))
+
+  def append(self, lot: Fill):
+    number = self.next_number
+    self.next_number += 1
+    self.lots[number] = lot
+    key = (lot.pair, lot.id)
+    numbers = self.numbers_by_id.get(key)
+    if numbers is None:
+      numbers = self.numbers_by_id[key] = deque()
+    numbers.append(number)
+
+  def popleft(self) -> Fill:
+    if len(self.lots) == 0:
+      raise IndexError("no lots")
+    lot = self.lots.pop(self.next_lot_number())
+    # the next lot is the first held for its id, selected or not
+    key = (lot.pair, lot.id)
+    numbers = self.numbers_by_id[key]
+    numbers.popleft()
+    if len(numbers) == 0:
+      del self.numbers_by_id[key]
+    return lot
+
+  def next_lot_number(self) -> int:
+    selected = self.selected
+    while len(selected) > 0:
+      numbers = self.numbers_by_id.get(selected[0])
+      if numbers is not None:
+        return numbers[0]
+      # the selected lots of the id are sold
+      selected.popleft()
+    return next(iter(self.lots))
+
+
+def to_lots(method: LotMethod, asset: Asset, lots: Iterable[Fill],
+            selections: Dict[Tuple[Pair, int], List[Tuple[Pair, int]]] = None
+            ) -> Union[Deque[Fill], Lots]:
+  """
+  Lots kept for method, lots already kept for it are returned as they are.
+  First in first out lots are a deque.
+  :param selections: basis products and trade ids by sale product and trade
+  id for specific id lots
+  """
+  if method is LotMethod.FIFO:
+    return lots if isinstance(lots, deque) else deque(lots)
+  if method is LotMethod.LIFO:
+    return lots if isinstance(lots, LifoLots) else LifoLots(lots)
+  if method is LotMethod.HIFO:
+    return lots if isinstance(lots, HifoLots) else HifoLots(asset, lots)
+  if isinstance(lots, SpecificIdLots):
+    if selections is not None:
+      lots.selections = selections
+    return lots
+  return SpecificIdLots(lots, selections)
@@ -0,0 +1,49 @@
+from typing import Dict, Iterable
+
+from calculator.progress import ProgressReporter
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Asset
+
+
+class MultiAssetProcessor:
+  """
+  Processes the trades of several assets in one pass over all trades in time
+  order. Each trade is made into a fill once and handled by the processor of
+  its base asset and, for a crypto quoted pair such as ETH-BTC, by the
+  processor of its quote asset. The quote asset handles a copy of the fill,
+  as matching splits fills and wash checks adjust them in place. Entries and
+  basis of each processor are the same as processing its asset's trades
+  alone.
+  """
+
+  def __init__(self, processors: Dict[Asset, TradeProcessor]):
+    self.processors: Dict[Asset, TradeProcessor] = processors
+
+  def handle_trades(self, trades: Iterable[Fill],
+                    progress: ProgressReporter = None):
+    processors = self.processors
+    for trade in trades:
+      pair = trade.pair
+      base = processors.get(pair.base)
+      quote = processors.get(pair.quote)
+      if quote is not None:
+        if base is not None:
+          # copied before the base asset can split the trade
+          quote.handle_trade(self.copy(trade))
+        else:
+          quote.handle_trade(trade)
+      if base is not None:
+        base.handle_trade(trade)
+      if progress is not None:
+        progress.update()
+
+  @staticmethod
+  def copy(trade: Fill) -> Fill:
+    """
+    Copy of trade with its own list of wash ids.
+    """
+    fill = trade.copy()
+    if fill.wash_p_l_ids is not None:
+      fill.wash_p_l_ids = list(fill.wash_p_l_ids)
+    return fill
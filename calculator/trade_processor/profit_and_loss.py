@@ -1,86 +1,143 @@
 from decimal import Decimal
 import pprint
-from typing import List
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List
 
-from pandas import Series
+from pandas import DataFrame, Series
 
 from calculator.converters import USD_ROUNDER
-from calculator.format import ID, PAIR, VALUE_IN_USD, SIZE, USD_PER_BTC, SIDE, \
-  ADJUSTED_VALUE, WASH_P_L_IDS, ADJUSTED_SIZE, TOTAL
+from calculator.format import PAIR, VALUE_IN_USD, SIZE, USD_PER_BTC, SIDE
 from calculator.trade_types import Pair, Asset, Side
 from calculator.auto_id_incrementer import AutoIdIncrementer
+from calculator.trade_processor.fill import Fill
 
 INVALID_SIZE_MESSAGE = "Sizes must be the same: {}, {}\n" \
                         "Basis:\dn{}\n" \
                         "Proceeds:\n{}"
+MATCH_COLUMNS = [PAIR, SIDE, SIZE, USD_PER_BTC, VALUE_IN_USD]
 INVALID_MATCH = lambda b, b_size, p, p_size: INVALID_SIZE_MESSAGE.format(
   b_size, p_size,
-  b[[PAIR, SIDE, SIZE, USD_PER_BTC, VALUE_IN_USD]],
-  p[[PAIR, SIDE, SIZE, USD_PER_BTC, VALUE_IN_USD]]
+  Series({c: b[c] for c in MATCH_COLUMNS}),
+  Series({c: p[c] for c in MATCH_COLUMNS})
 )
 INVALID_TRADE_MESSAGE = "Invalid basis {} trade for {}:\n{}"
 INVALID_TRADE = lambda a, b, t: INVALID_TRADE_MESSAGE.format(t, a, b)
-auto_incrementer = AutoIdIncrementer()
+# attribute of each profit and loss csv column, in the order written to csv
+P_L_COLUMNS = OrderedDict([
+  ("id", "id"),
+  ("asset", "asset"),
+  ("size", "size"),
+  ("costs id", "basis_id"),
+  ("costs pair", "basis_pair"),
+  ("costs", "basis"),
+  ("proceeds id", "proceeds_id"),
+  ("proceeds pair", "proceeds_pair"),
+  ("proceeds", "proceeds"),
+  ("profit and loss", "profit_and_loss"),
+  ("adjusted for wash loss", "taxed_profit_and_loss"),
+  ("ids for adjusted basis", "wash_loss_basis_ids")
+])
+# attribute of the wash columns as if wash trades were not tracked, ids are
+# empty
+UNWASHED_P_L_COLUMNS = OrderedDict(
+  P_L_COLUMNS, **{"adjusted for wash loss": "profit_and_loss",
+                  "ids for adjusted basis": None})
 
 
 class Entry:
   """
   Class to hold basis and proceeds trades and associated ProfitAndLoss.
   """
-  
-  def __init__(self, asset: Asset, basis: Series, proceeds: Series):
+
+  __slots__ = ("costs", "proceeds", "profit_and_loss")
+
+  def __init__(self, asset: Asset, basis: Fill, proceeds: Fill,
+               id_incrementer: AutoIdIncrementer = None):
     self.costs = basis
     self.proceeds = proceeds
-    self.profit_and_loss = ProfitAndLoss(asset, basis, proceeds)
+    self.profit_and_loss = ProfitAndLoss(
+      asset, basis, proceeds, id_incrementer)
+
+  def __getstate__(self):
+    return self.costs, self.proceeds, self.profit_and_loss
+
+  def __setstate__(self, state):
+    self.costs, self.proceeds, self.profit_and_loss = state
 
 
 class ProfitAndLoss:
   """
   Class to hold profit and loss data for a pair of basis and proceeds trades.
+  Slotted as one is kept for each entry.
   """
 
-  def __init__(self, asset: Asset, basis: Series, proceeds: Series):
+  __slots__ = (
+    "id", "asset", "size", "unwashed_size", "wash_loss_basis_ids", "basis_id",
+    "basis_pair", "basis", "proceeds_id", "proceeds_pair", "proceeds",
+    "profit_and_loss", "taxed_profit_and_loss")
+
+  def __init__(self, asset: Asset, basis: Fill, proceeds: Fill,
+               id_incrementer: AutoIdIncrementer = None):
+    """
+    :param id_incrementer: ids of the run, without it the id is 0
+    """
     b_size = self.get_basis_size(asset, basis)
     p_size = self.get_proceeds_size(asset, proceeds)
     self.validate_sizes(basis, b_size, proceeds, p_size)
-    self.id = auto_incrementer.get_id_and_increment()
+    if id_incrementer is None:
+      id_incrementer = AutoIdIncrementer()
+    self.id = id_incrementer.get_id_and_increment()
     self.asset: Asset = asset
     self.size: Decimal = b_size
     self.unwashed_size: Decimal = b_size
     self.wash_loss_basis_ids: List[int] = []
-    self.basis_id: int = basis[ID]
-    self.basis_pair: Pair = basis[PAIR]
+    self.basis_id: int = basis.id
+    self.basis_pair: Pair = basis.pair
     self.basis: Decimal = self.get_value(basis)
-    self.proceeds_id: int = proceeds[ID]
-    self.proceeds_pair: Pair = proceeds[PAIR]
+    self.proceeds_id: int = proceeds.id
+    self.proceeds_pair: Pair = proceeds.pair
     self.proceeds: Decimal = self.get_value(proceeds)
     self.profit_and_loss: Decimal = self.proceeds - self.basis
     self.taxed_profit_and_loss: Decimal = self.profit_and_loss
 
-  def get_series(self) -> Series:
-    return Series(
-      {
-        "id": self.id,
-        "asset": self.asset,
-        "size": self.size,
-        "costs id": self.basis_id,
-        "costs pair": self.basis_pair,
-        "costs": self.basis,
-        "proceeds id": self.proceeds_id,
-        "proceeds pair": self.proceeds_pair,
-        "proceeds": self.proceeds,
-        "profit and loss": self.profit_and_loss,
-        "adjusted for wash loss": self.taxed_profit_and_loss,
-        "ids for adjusted basis": self.wash_loss_basis_ids
-      }
-    )
-
-  def wash_loss(self, wash_trade: Series):
+  def get_series(self, washed: bool = True) -> Series:
+    """
+    :param washed: False for the row as if wash trades were not tracked
+    """
+    return Series(self.to_dict(washed))
+
+  def to_dict(self, washed: bool = True) -> Dict[str, Any]:
+    """
+    Values by csv column.
+    :param washed: False for the values as if wash trades were not tracked
+    """
+    columns = P_L_COLUMNS if washed else UNWASHED_P_L_COLUMNS
+    return OrderedDict(
+      (column, getattr(self, field) if field is not None else [])
+      for column, field in columns.items())
+
+  @staticmethod
+  def to_df(profit_and_losses: Iterable["ProfitAndLoss"],
+            washed: bool = True) -> DataFrame:
+    """
+    Same as a DataFrame of the series of each profit and loss, made a column
+    at a time rather than a Series per row.
+    """
+    profit_and_losses = list(profit_and_losses)
+    if len(profit_and_losses) == 0:
+      return DataFrame()
+    columns = P_L_COLUMNS if washed else UNWASHED_P_L_COLUMNS
+    return DataFrame(OrderedDict(
+      (column, [getattr(p_l, field) for p_l in profit_and_losses]
+       if field is not None else [[] for _ in profit_and_losses])
+      for column, field in columns.items()))
+
+  def wash_loss(self, wash_trade: Fill):
     self.validate_wash()
-    self.wash_loss_basis_ids.append(wash_trade[ID])
-    wash_trade[WASH_P_L_IDS].append(self.id)
+    self.wash_loss_basis_ids.append(wash_trade.id)
+    wash_trade.wash_p_l_ids.append(self.id)
     size = self.get_basis_size(self.asset, wash_trade)
-    size -= wash_trade[ADJUSTED_SIZE]
+    size -= wash_trade.adjusted_size
     if size >= self.unwashed_size:
       adj_size = self.unwashed_size
       adj_loss = self.taxed_profit_and_loss
@@ -99,11 +156,11 @@ class ProfitAndLoss:
         # adjusted loss exceeds the remaining loss,
         adj_loss = self.taxed_profit_and_loss
 
-    wash_trade[ADJUSTED_SIZE] += adj_size
+    wash_trade.adjusted_size += adj_size
     self.unwashed_size -= adj_size
     self.taxed_profit_and_loss -= adj_loss
-    if self.asset == wash_trade[PAIR].get_base_asset():
-      wash_trade[ADJUSTED_VALUE] -= adj_loss
+    if self.asset == wash_trade.pair.get_base_asset():
+      wash_trade.adjusted_value -= adj_loss
     else:
       # BTC is the asset and quote asset. for example is in terms of LTC-BTC and
       # total, total in usd and adjusted value will all be in context of LTC not
@@ -111,7 +168,7 @@ class ProfitAndLoss:
       # way. Adjusting all of those values is likely more confusing then keeping
       # them in the same context and making sure that handling of this case is
       # consistent.
-      wash_trade[ADJUSTED_VALUE] -= adj_loss
+      wash_trade.adjusted_value -= adj_loss
     return adj_loss
 
   def validate_wash(self):
@@ -123,49 +180,57 @@ class ProfitAndLoss:
         self.taxed_profit_and_loss == 0 and
         self.profit_and_loss < 0 < self.unwashed_size)
 
-  def get_value(self, trade: Series):
-    return trade[VALUE_IN_USD]
+  def get_value(self, trade: Fill):
+    return trade.value_in_usd
 
   @staticmethod
-  def get_basis_size(asset: Asset, basis: Series) -> Decimal:
-    pair = basis[PAIR]
+  def get_basis_size(asset: Asset, basis: Fill) -> Decimal:
+    pair = basis.pair
     if asset == pair.get_base_asset():
-      if Side.SELL == basis[SIDE]:
+      if Side.SELL == basis.side:
         raise ValueError(INVALID_TRADE(asset, basis, "basis"))
-      size = basis[SIZE]
+      size = basis.size
     elif asset == pair.get_quote_asset():
-      if Side.BUY == basis[SIDE]:
+      if Side.BUY == basis.side:
         raise ValueError(INVALID_TRADE(asset, basis, "basis"))
-      size = basis[TOTAL]
+      size = basis.total
     else:
       raise ValueError(INVALID_TRADE(asset, basis, "basis"))
     return size
 
   @staticmethod
-  def get_proceeds_size(asset: Asset, proceeds: Series) -> Decimal:
-    pair = proceeds[PAIR]
+  def get_proceeds_size(asset: Asset, proceeds: Fill) -> Decimal:
+    pair = proceeds.pair
     if asset == pair.get_base_asset():
-      if Side.BUY == proceeds[SIDE]:
+      if Side.BUY == proceeds.side:
         raise ValueError(INVALID_TRADE(asset, proceeds, "proceeds"))
-      size = proceeds[SIZE]
+      size = proceeds.size
     elif asset == pair.get_quote_asset():
-      if Side.SELL == proceeds[SIDE]:
+      if Side.SELL == proceeds.side:
         raise ValueError(INVALID_TRADE(asset, proceeds, "proceeds"))
       # proceeds are in context of quote not base asset, thus we are referencing
       # this is a base asset basis trade and the total will be negative.
-      size = - proceeds[TOTAL]
+      size = - proceeds.total
     else:
       raise ValueError(INVALID_TRADE(asset, proceeds, "proceeds"))
     return size
 
   @staticmethod
   def validate_sizes(
-      basis: Series, b_size: Decimal, proceeds: Series, p_size: Decimal
+      basis: Fill, b_size: Decimal, proceeds: Fill, p_size: Decimal
   ) -> None:
     if p_size != b_size:
       raise ValueError(
         INVALID_MATCH(basis, b_size, proceeds, p_size)
       )
 
+  def __getstate__(self):
+    return tuple(getattr(self, field) for field in self.__slots__)
+
+  def __setstate__(self, state):
+    for field, value in zip(self.__slots__, state):
+      setattr(self, field, value)
+
   def __repr__(self):
-    return pprint.pformat(self.__dict__)
+    return pprint.pformat(
+      {field: getattr(self, field) for field in self.__slots__})
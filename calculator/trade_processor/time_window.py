@@ -0,0 +1,143 @@
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Dict, Generic, Iterable, Iterator, List, Tuple, \
+  TypeVar
+
+from pandas import Series, Timestamp
+from pandas.api.types import is_datetime64_any_dtype
+
+EPOCH = datetime(1970, 1, 1)
+# compact the lists once this many removed items are at the front
+COMPACT_AFTER = 1024
+
+T = TypeVar("T")
+
+
+def to_micros(delta: timedelta) -> int:
+  return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def epoch_micros(time: datetime) -> int:
+  """
+  Microseconds since the epoch, times without a timezone are taken as UTC.
+  """
+  if isinstance(time, Timestamp):
+    # nanoseconds since the epoch in UTC
+    return time.value // 1000
+  if time.tzinfo is not None:
+    time = time.astimezone(timezone.utc).replace(tzinfo=None)
+  return to_micros(time - EPOCH)
+
+
+def epoch_micros_list(times: Series) -> List[int]:
+  """
+  epoch_micros of each time, a datetime column is converted as a whole.
+  """
+  if is_datetime64_any_dtype(times.dtype):
+    # datetime64 values are in UTC for a column with a timezone
+    return times.values.astype("datetime64[us]").astype("int64").tolist()
+  return [epoch_micros(time) for time in times]
+
+
+class TimeWindow(Generic[T]):
+  """
+  Items in the order they were added, each with a time as integer microseconds
+  since the epoch. Items are added in order of time, so all items too old for
+  the window at a time are found by bisecting the times and dropped at once.
+  """
+
+  def __init__(self, length: int, items: Iterable[Tuple[int, T]] = ()):
+    """
+    :param length: microseconds an item stays in the window, an item at time t
+    expires at time t + length
+    :param items: pairs of time and item
+    """
+    self.length: int = length
+    self.items: List[T] = []
+    self.times: List[int] = []
+    # index of the first item, removed items before it are None
+    self.head: int = 0
+    # key of items[0], keys stay the same when the lists are compacted
+    self.start: int = 0
+    for time, item in items:
+      self.append(item, time)
+
+  def __len__(self) -> int:
+    return len(self.items) - self.head
+
+  def __iter__(self) -> Iterator[T]:
+    return islice(self.items, self.head, None)
+
+  def __getitem__(self, key: int) -> T:
+    return self.items[key - self.start]
+
+  def __setitem__(self, key: int, item: T):
+    """
+    Replaces the item with key, at the same place and time.
+    """
+    self.items[key - self.start] = item
+
+  def first(self) -> T:
+    if self.head == len(self.items):
+      raise IndexError("first of an empty window")
+    return self.items[self.head]
+
+  def append(self, item: T, time: int) -> int:
+    """
+    Adds item at the end and returns its key. An item earlier than the last is
+    kept as long as the last, so times stay in order.
+    :param time: microseconds since the epoch
+    """
+    times = self.times
+    if len(times) > self.head and time < times[-1]:
+      time = times[-1]
+    times.append(time)
+    self.items.append(item)
+    return self.start + len(times) - 1
+
+  def popleft(self) -> T:
+    item = self.first()
+    self.items[self.head] = None
+    self.head += 1
+    self.compact()
+    return item
+
+  def expire(self, now: int) -> List[T]:
+    """
+    Drops the items too old for the window at now, ie now - time >= length.
+    :return: the items dropped, oldest first
+    """
+    head = self.head
+    end = bisect_right(self.times, now - self.length, head)
+    if end == head:
+      return []
+    expired = self.items[head:end]
+    self.items[head:end] = [None] * (end - head)
+    self.head = end
+    self.compact()
+    return expired
+
+  def compact(self):
+    head = self.head
+    if head == len(self.items):
+      self.start += head
+      self.items.clear()
+      self.times.clear()
+      self.head = 0
+    elif head >= COMPACT_AFTER and head * 2 >= len(self.items):
+      del self.items[:head]
+      del self.times[:head]
+      self.start += head
+      self.head = 0
+
+  def __getstate__(self) -> Dict[str, Any]:
+    # keys are not kept, holders of keys rebuild them once loaded
+    return {
+      "length": self.length,
+      "times": self.times[self.head:],
+      "items": self.items[self.head:]
+    }
+
+  def __setstate__(self, state: Dict[str, Any]):
+    self.__init__(state["length"], zip(state["times"], state["items"]))
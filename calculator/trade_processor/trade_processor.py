@@ -1,159 +1,272 @@
 from collections import deque
 from decimal import Decimal
-from fractions import Fraction
-from typing import Deque, Tuple
+from typing import Any, Deque, Dict, Iterable, Optional
 
-from datetime import datetime
-from pandas import Series
-
-from calculator.converters import USD_ROUNDER
-from calculator.format import SIDE, PAIR, SIZE, FEE, TOTAL, TIME,\
-  VALUE_IN_USD, ADJUSTED_VALUE, ID, ADJUSTED_SIZE
+from calculator.auto_id_incrementer import AutoIdIncrementer
+from calculator.progress import ProgressReporter
 from calculator.trade_types import Asset, Side
+from calculator.trade_processor.basis_index import BasisIndex
+from calculator.trade_processor.entry_store import EntryStore
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.lots import SpecificIdLots
 from calculator.trade_processor.profit_and_loss import Entry, ProfitAndLoss
-
-VARIABLE_COLUMNS = [SIZE, FEE, TOTAL]
+from calculator.trade_processor.time_window import TimeWindow
+from calculator.trade_processor.wash_candidates import WashCandidates, \
+  WASH_WINDOW
 
 
 class TradeProcessor:
 
   def __init__(
-    self, asset: Asset, basis_queue: Deque[Series], track_wash=False):
+    self, asset: Asset, basis_queue: Deque[Fill], track_wash=False,
+    id_incrementer: AutoIdIncrementer = None):
+    """
+    :param basis_queue: lots sold first in first out, or Lots of another lot
+    selection method
+    :param id_incrementer: allocates profit and loss ids for the run, by
+    default ids of this processor start from 0
+    """
 
     self.asset: Asset = asset
-    self.basis_queue: Deque[Series, ...] = basis_queue
-    self.entries: Deque[Entry, ...] = deque()
+    self.id_incrementer: AutoIdIncrementer = \
+      id_incrementer if id_incrementer is not None else AutoIdIncrementer()
+    self.basis_queue: Deque[Fill] = basis_queue
+    # lots are chosen by each sale, ie by specific id
+    self.selects_lots: bool = isinstance(basis_queue, SpecificIdLots)
+    self.entries: EntryStore = EntryStore(asset, track_wash)
+    # made by the first sale cost query
+    self.basis_index: Optional[BasisIndex] = None
     self.track_wash = track_wash
     if track_wash:
-      self.wash_before_loss_check: Deque[Series, ...] = basis_queue.copy()
-      self.wash_after_loss_check: Deque[Tuple[datetime, ProfitAndLoss]] = deque()
+      self.wash_before_loss_check: WashCandidates = \
+        WashCandidates(basis_queue)
+      self.wash_after_loss_check: TimeWindow[ProfitAndLoss] = \
+        TimeWindow(WASH_WINDOW)
       self.entries_by_basis_id: dict[int, Entry] = {}
-      # wash tracking adds additional columns that need to be changed.
-      self.variable_usd_columns = [VALUE_IN_USD, ADJUSTED_VALUE]
+
+  def get_state(self, include_entries=False) -> Dict[str, Any]:
+    """
+    State needed to continue processing later trades, the remaining basis and
+    when tracking wash trades the pending wash checks.
+    :param include_entries: include entries, ie if they could still be changed
+    by wash checks of later trades
+    """
+    state = {"basis_queue": self.basis_queue}
+    if self.track_wash:
+      state["wash_before_loss_check"] = self.wash_before_loss_check
+      state["wash_after_loss_check"] = self.wash_after_loss_check
+    if include_entries:
+      state["entries"] = self.entries
+      if self.track_wash:
+        state["entries_by_basis_id"] = self.entries_by_basis_id
+    return state
+
+  @classmethod
+  def from_state(cls, asset: Asset, state: Dict[str, Any],
+                 track_wash=False, id_incrementer: AutoIdIncrementer = None
+                 ) -> "TradeProcessor":
+    processor = cls(asset, state["basis_queue"], track_wash=track_wash,
+                    id_incrementer=id_incrementer)
+    if "entries" in state:
+      if isinstance(state["entries"], EntryStore):
+        processor.entries = state["entries"]
+      else:
+        processor.entries.extend(state["entries"])
+    if not track_wash:
+      return processor
+    if "wash_before_loss_check" in state:
+      processor.wash_before_loss_check = state["wash_before_loss_check"]
+      processor.wash_after_loss_check = state["wash_after_loss_check"]
+      processor.entries_by_basis_id = state.get("entries_by_basis_id", {})
     else:
-      self.variable_usd_columns = [VALUE_IN_USD]
+      # state saved without tracking wash trades
+      for trade in processor.basis_queue:
+        trade.track_wash()
+    return processor
+
+  def handle_trades(self, trades: Iterable[Fill],
+                    progress: ProgressReporter = None):
+    for trade in trades:
+      self.handle_trade(trade)
+      if progress is not None:
+        progress.update()
 
-  def handle_trade(self, trade: Series):
+  def handle_trade(self, trade: Fill):
 
+    if self.track_wash:
+      self.settle_entries(trade.micros)
     if self.is_proceed_trade(trade):
       self.handle_proceeds_trade(trade)
 
     else:
       self.handle_basis_trade(trade)
 
-  def is_proceed_trade(self, trade: Series) -> bool:
-    product = trade[PAIR]
-    side = trade[SIDE]
+  def settle_entries(self, micros: int):
+    """
+    Moves the entries wash checks from micros on can no longer change to the
+    columns of the entries, they are no longer kept by basis id.
+    """
+    for entry in self.entries.settle(micros):
+      if self.entries_by_basis_id.get(entry.costs.id) is entry:
+        del self.entries_by_basis_id[entry.costs.id]
+
+  def is_proceed_trade(self, trade: Fill) -> bool:
+    product = trade.pair
+    side = trade.side
     return (
       product.get_base_asset() == self.asset and side == Side.SELL
     ) or (
       product.get_quote_asset() == self.asset and side == Side.BUY)
 
-  def handle_proceeds_trade(self, trade: Series) -> None:
+  def handle_proceeds_trade(self, trade: Fill) -> None:
 
     trade_size = self.determine_proceeds_size(trade)
+    if self.selects_lots:
+      self.basis_queue.select(trade)
+    if self.track_wash:
+      self.wash_before_loss_check.expire(trade.micros)
     while trade_size > 0:
-      basis_trade = self.basis_queue.popleft()
+      basis_trade = self.basis_queue[0]
       # Size is conditional on type
       basis_size = self.determine_basis_size(basis_trade)
 
       if basis_size > trade_size:
-        scaled_basis, remainder = self.spit_trade_to_match(
-          basis_trade, trade_size, basis_size
-        )
-        entry = Entry(self.asset, scaled_basis, trade)
-        self.basis_queue.appendleft(remainder)
+        # the lot stays at the front of the queue with the rest of its size
+        scaled_basis = basis_trade.split(trade_size, basis_size)
+        if self.track_wash:
+          # wash checks before a loss continue with the portion sold from the
+          # lot, the rest of the lot in the basis queue is not checked.
+          self.wash_before_loss_check.replace(basis_trade, scaled_basis)
+        entry = Entry(
+          self.asset, scaled_basis, trade, self.id_incrementer)
 
       elif basis_size < trade_size:
-        scaled_trade, remainder = self.spit_trade_to_match(
-          trade, basis_size, trade_size)
-        entry = Entry(self.asset, basis_trade, scaled_trade)
-        trade = remainder
+        self.basis_queue.popleft()
+        scaled_trade = trade.split(basis_size, trade_size)
+        entry = Entry(
+          self.asset, basis_trade, scaled_trade, self.id_incrementer)
 
       else:
-        entry = Entry(self.asset, basis_trade, trade)
-      if (self.track_wash and entry.costs[ID] in
-            [b[ID] for b in self.wash_before_loss_check]):
-        self.entries_by_basis_id[entry.costs[ID]] = entry
-      if self.track_wash and entry.profit_and_loss.is_loss():
-        p_l = entry.profit_and_loss
-        size = p_l.size
-        while len(self.wash_before_loss_check) > 0 and size > 0:
-          size = self.handle_wash_before_loss(entry, size)
-        if p_l.unwashed_size > 0:
-          self.wash_after_loss_check.append((entry.proceeds[TIME], p_l))
+        self.basis_queue.popleft()
+        entry = Entry(
+          self.asset, basis_trade, trade, self.id_incrementer)
+      if self.track_wash:
+        self.handle_entry_wash(entry)
 
       self.entries.append(entry)
       trade_size -= basis_size
 
+  def handle_entry_wash(self, entry: Entry):
+    """
+    Washes the loss of a new entry with earlier basis trades, or keeps it to
+    be washed by later ones.
+    """
+    if self.wash_before_loss_check.has_id(entry.costs.id):
+      self.entries_by_basis_id[entry.costs.id] = entry
+    if entry.profit_and_loss.is_loss():
+      p_l = entry.profit_and_loss
+      size = p_l.size
+      while len(self.wash_before_loss_check) > 0 and size > 0:
+        size = self.handle_wash_before_loss(entry, size)
+      if p_l.unwashed_size > 0:
+        self.wash_after_loss_check.append(
+          p_l, entry.proceeds.micros)
+
   def handle_basis_trade(self, trade):
-    size = self.determine_basis_size(trade)
     if self.track_wash:
-      while len(self.wash_after_loss_check) > 0 and size > 0:
-        size = self.handle_wash_trade_after_loss(size, trade)
-      if size > 0:
-        self.wash_before_loss_check.append(trade)
+      self.handle_basis_wash(trade)
     self.basis_queue.append(trade)
 
-  def determine_proceeds_size(self, trade: Series) -> Decimal:
+  def handle_basis_wash(self, trade: Fill):
+    """
+    Washes earlier losses with a new basis trade, the rest of it can wash
+    later losses.
+    """
+    size = self.determine_basis_size(trade)
+    self.wash_after_loss_check.expire(trade.micros)
+    while len(self.wash_after_loss_check) > 0 and size > 0:
+      size = self.handle_wash_trade_after_loss(size, trade)
+    if size > 0:
+      self.wash_before_loss_check.append(trade)
 
-    if trade[PAIR].get_base_asset() == self.asset:
-      trade_size = trade[SIZE]
+  def check_basis(self, trades: Iterable[Fill]):
+    """
+    Raises a ValueError if trades, processed in order after those already
+    processed, would sell more than the basis. Nothing is changed, so trades
+    can be checked before processing any.
+    """
+    size = sum(
+      (self.determine_basis_size(lot) for lot in self.basis_queue), Decimal(0))
+    for trade in trades:
+      if self.is_proceed_trade(trade):
+        size -= self.determine_proceeds_size(trade)
+        if size < 0:
+          raise ValueError(
+            "Trade {} of {} sells more than the basis of {}".format(
+              trade.id, trade.pair, self.asset))
+      else:
+        size += self.determine_basis_size(trade)
+
+  def sale_cost(self, size: Decimal) -> Decimal:
+    """
+    Cost of the lots a sale of size of the asset would sell next, as the
+    basis of its profit and loss, without changing the basis. Raises a
+    ValueError if size is more than the basis or lots are not sold first in
+    first out.
+    """
+    if not isinstance(self.basis_queue, deque):
+      raise ValueError("Sale cost is only known for first in first out lots.")
+    if self.basis_index is None:
+      self.basis_index = BasisIndex(self.asset)
+    self.basis_index.sync(self.basis_queue)
+    return self.basis_index.sale_cost(size)
+
+  def determine_proceeds_size(self, trade: Fill) -> Decimal:
+
+    if trade.pair.get_base_asset() == self.asset:
+      trade_size = trade.size
     else:
       # total will be negative, proceeds trade with asset as quote pair is in
       # in the context of the asset in the base and thus proceeds are basis
       # trades for the base asset context, but proceeds context for the quote.
-      trade_size = - trade[TOTAL]
+      trade_size = - trade.total
 
     return trade_size
 
-  def determine_basis_size(self, basis_trade: Series) -> Decimal:
+  def determine_basis_size(self, basis_trade: Fill) -> Decimal:
 
-    if basis_trade[PAIR].get_base_asset() == self.asset:
-      basis_size = basis_trade[SIZE]
+    if basis_trade.pair.get_base_asset() == self.asset:
+      basis_size = basis_trade.size
     else:
-      basis_size = basis_trade[TOTAL]
+      basis_size = basis_trade.total
     return basis_size
 
   def handle_wash_before_loss(self, entry: Entry, size: Decimal):
-    trade = self.wash_before_loss_check.popleft()
-    if (entry.proceeds[TIME] - trade[TIME]).days < 30:
-      if trade[ID] == entry.costs[ID]:
-        return size
-      wash_size = trade[SIZE]
-      adj_loss = entry.profit_and_loss.wash_loss(trade)
-      if trade[ID] in self.entries_by_basis_id.keys():
-        self.entries_by_basis_id[trade[ID]]\
-          .profit_and_loss\
-          .taxed_profit_and_loss += adj_loss
-      size -= wash_size
-      if 0 < self.determine_basis_size(trade) - trade[ADJUSTED_SIZE]:
-        # Wash will not be completely absorbed by loss
-        self.wash_before_loss_check.appendleft(trade)
+    # candidates too early to wash the loss were expired for the trade
+    trade = self.wash_before_loss_check.first()
+    if trade.id == entry.costs.id:
+      self.wash_before_loss_check.popleft()
+      return size
+    wash_size = trade.size
+    adj_loss = entry.profit_and_loss.wash_loss(trade)
+    if trade.id in self.entries_by_basis_id.keys():
+      self.entries_by_basis_id[trade.id]\
+        .profit_and_loss\
+        .taxed_profit_and_loss += adj_loss
+    size -= wash_size
+    if 0 >= self.determine_basis_size(trade) - trade.adjusted_size:
+      # Wash is completely absorbed by loss
+      self.wash_before_loss_check.popleft()
     return size
 
-  def handle_wash_trade_after_loss(self, size: Decimal, trade: Series):
-    # using first in first out
-    last_loss_time, profit_and_loss = self.wash_after_loss_check.popleft()
-    if (trade[TIME] - last_loss_time).days < 30:
-      p_l_size = profit_and_loss.unwashed_size
-      profit_and_loss.wash_loss(trade)
-      if p_l_size > size:
-        # loss will not be matched completely
-        self.wash_after_loss_check.appendleft((last_loss_time, profit_and_loss))
-      size -= p_l_size
+  def handle_wash_trade_after_loss(self, size: Decimal, trade: Fill):
+    # using first in first out, losses too early to be washed by the trade
+    # were expired for it
+    profit_and_loss = self.wash_after_loss_check.first()
+    p_l_size = profit_and_loss.unwashed_size
+    profit_and_loss.wash_loss(trade)
+    if p_l_size <= size:
+      # loss is matched completely
+      self.wash_after_loss_check.popleft()
+    size -= p_l_size
     return size
-
-  def spit_trade_to_match(self, trade: Series, factor_size: Decimal,
-                          total_size: Decimal) -> Tuple[Series, Series]:
-
-    trade_portion = Fraction(factor_size) / Fraction(total_size)
-    remainder: Series = trade.copy()
-    trade[VARIABLE_COLUMNS + self.variable_usd_columns] *= trade_portion.numerator
-    trade[VARIABLE_COLUMNS + self.variable_usd_columns] /= trade_portion.denominator
-    trade[VARIABLE_COLUMNS] = trade[VARIABLE_COLUMNS].apply(trade[PAIR].quantize)
-    trade[self.variable_usd_columns] = trade[self.variable_usd_columns].apply(USD_ROUNDER)
-    remainder[VARIABLE_COLUMNS + self.variable_usd_columns] -= trade[
-      VARIABLE_COLUMNS + self.variable_usd_columns]
-    # remainder[VARIABLE_COLUMNS].apply(trade[PAIR].quantize)
-    return trade, remainder
@@ -0,0 +1,80 @@
+from datetime import timedelta
+from typing import Dict, Iterable, Iterator, List
+
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.time_window import TimeWindow, to_micros
+
+# a loss is washed by trades less than 30 days before or after it
+WASH_WINDOW = to_micros(timedelta(days=30))
+
+
+class WashCandidates:
+  """
+  Basis lots that could wash a later loss, in the order they were added, with
+  an index of their trade ids. Lots are the same objects as in the basis queue
+  or entries, not copies. Adding, removing, expiring or replacing a lot, and
+  checking for a trade id, do not depend on the number of lots.
+  """
+
+  def __init__(self, lots: Iterable[Fill] = ()):
+    self.window: TimeWindow[Fill] = TimeWindow(WASH_WINDOW)
+    # key in the window of each lot by object, lots are not hashable by value
+    self.keys: Dict[int, int] = {}
+    # count of lots with each trade id, trade ids of two pairs can be equal
+    self.id_counts: Dict[int, int] = {}
+    for lot in lots:
+      self.append(lot)
+
+  def __len__(self) -> int:
+    return len(self.window)
+
+  def __iter__(self) -> Iterator[Fill]:
+    return iter(self.window)
+
+  def has_id(self, trade_id: int) -> bool:
+    return trade_id in self.id_counts
+
+  def first(self) -> Fill:
+    return self.window.first()
+
+  def append(self, lot: Fill):
+    self.keys[id(lot)] = self.window.append(lot, lot.micros)
+    self.id_counts[lot.id] = self.id_counts.get(lot.id, 0) + 1
+
+  def popleft(self) -> Fill:
+    lot = self.window.popleft()
+    self._removed(lot)
+    return lot
+
+  def expire(self, now: int):
+    """
+    Drops lots too long before now to wash a loss at now.
+    :param now: microseconds since the epoch
+    """
+    for lot in self.window.expire(now):
+      self._removed(lot)
+
+  def replace(self, lot: Fill, portion: Fill):
+    """
+    Replaces lot with portion in the same place, if lot is a candidate.
+    """
+    key = self.keys.pop(id(lot), None)
+    if key is None:
+      return
+    self.window[key] = portion
+    self.keys[id(portion)] = key
+
+  def _removed(self, lot: Fill):
+    del self.keys[id(lot)]
+    count = self.id_counts[lot.id] - 1
+    if count == 0:
+      del self.id_counts[lot.id]
+    else:
+      self.id_counts[lot.id] = count
+
+  def __getstate__(self) -> Dict[str, List[Fill]]:
+    # keys by object are rebuilt, objects differ once loaded
+    return {"lots": list(self.window)}
+
+  def __setstate__(self, state: Dict[str, List[Fill]]):
+    self.__init__(state["lots"])
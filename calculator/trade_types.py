@@ -43,14 +43,21 @@ class Pair(Enum):
   BCH_BTC = {"base": Asset.BCH, "quote": Asset.BTC,
              'base_increment': '0.0000000001'}
 
-  quantize = lambda self, x: x.quantize(Decimal(self.value["base_increment"]),
+  def __init__(self, value):
+    # read for every trade matched, kept as attributes rather than looked up
+    # through value each time
+    self.base: Asset = value["base"]
+    self.quote: Asset = value["quote"]
+    self.increment: Decimal = Decimal(value["base_increment"])
+
+  quantize = lambda self, x: x.quantize(self.increment,
                                         rounding=ROUND_HALF_EVEN)
 
   def get_quote_asset(self) -> Asset:
-    return self.value["quote"]
+    return self.quote
 
   def get_base_asset(self) -> Asset:
-    return self.value["base"]
+    return self.base
 
   def __repr__(self):
     return "<Pair: {}-{}>".format(self.value["base"], self.value["quote"])
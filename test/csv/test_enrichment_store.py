@@ -0,0 +1,43 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.csv.enrichment_store import EnrichmentStore
+from calculator.trade_types import Pair
+
+
+class TestEnrichmentStore(TestCase):
+
+  def setUp(self) -> None:
+    self.dir = tempfile.TemporaryDirectory()
+    self.source = os.path.join(self.dir.name, "fills.csv")
+    with open(self.source, "w") as f:
+      f.write("source")
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def test_path_next_to_source(self):
+    store = EnrichmentStore(self.source)
+    self.assertEqual(
+      store.path, os.path.join(self.dir.name, "fills_usd_per_btc.csv"))
+
+  def test_load_missing_store(self):
+    self.assertEqual(EnrichmentStore(self.source).load(), {})
+
+  def test_append_and_load(self):
+    store = EnrichmentStore(self.source)
+    store.append({(Pair.ETH_BTC, 1): Decimal("1100.01")})
+    store.append({})
+    store.append({(Pair.ETH_BTC, 4): Decimal("1200"),
+                  (Pair.LTC_BTC, 1): Decimal("1300")})
+
+    self.assertEqual(
+      EnrichmentStore(self.source).load(),
+      {(Pair.ETH_BTC, 1): Decimal("1100.01"),
+       (Pair.ETH_BTC, 4): Decimal("1200.00"),
+       (Pair.LTC_BTC, 1): Decimal("1300.00")}
+    )
+    with open(self.source) as f:
+      self.assertEqual(f.read(), "source", "source should not be rewritten")
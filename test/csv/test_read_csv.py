@@ -1,3 +1,5 @@
+import os
+import tempfile
 import time
 from datetime import datetime
 from decimal import Decimal as Dec
@@ -9,10 +11,14 @@ from pandas import DataFrame
 from pandas.testing import assert_frame_equal
 
 from calculator.api.exchange_api import ExchangeApi
-from calculator.converters import CONVERTERS
+from calculator.api.price_cache import PriceCache
+from calculator.converters import CONVERTERS, CSV_CONVERTERS
 from calculator.format import ID, PAIR, SIDE, TIME, SIZE, SIZE_UNIT, PRICE, \
-  FEE, P_F_T_UNIT, USD_PER_BTC, VALUE_IN_USD, TOTAL, TIME_STRING_FORMAT
+  FEE, P_F_T_UNIT, USD_PER_BTC, VALUE_IN_USD, TOTAL, TIME_STRING_FORMAT, \
+  BASIS_ID, BASIS_PAIR
+from calculator.csv.enrichment_store import EnrichmentStore
 from calculator.csv.read_csv import ReadCsv
+from calculator.trade_processor.fill import TRADE_COLUMNS
 from calculator.trade_types import Pair, Side, Asset
 from test.test_helpers import time_incrementer, PASS_IF_CALLED
 
@@ -49,13 +55,14 @@ RAISE_IF_CALLED = lambda *x, **y: exec(
 
 
 def patch_read_csv(path, *args, **kwargs):
-  if "converters" not in kwargs or kwargs["converters"] != CONVERTERS:
+  if "converters" not in kwargs or kwargs["converters"] != CSV_CONVERTERS:
     raise AssertionError(
       "Converters required for proper parsing to object types.")
   if path == "/path/to/basis_and_usd.csv":
     return BASIS_DF_W_USD
   if path == "/path/to/basis.csv":
-    return BASIS_DF
+    # reading enriches in place, copy so each test starts without usd per btc
+    return BASIS_DF.copy()
   if path == "/path/to/negative_basis.csv":
     df = BASIS_DF_W_USD.copy()
     df[VALUE_IN_USD] = df[VALUE_IN_USD].apply(lambda x: -x)
@@ -94,7 +101,67 @@ class TestReadCsv(TestCase):
     right[TIME] = [TIME1, TIME2, TIME3]
     self.assert_frame_equal_with_nans(left, right)
     to_csv.assert_called_once_with(
-      path, index=False, date_format=TIME_STRING_FORMAT)
+      "/path/to/basis_usd_per_btc.csv", mode="a", header=True, index=False)
+
+  @mock.patch.object(pd, "read_csv", new=patch_read_csv)
+  @mock.patch.object(ExchangeApi, "get_close", new=RAISE_IF_CALLED)
+  @mock.patch.object(time, "sleep", new=RAISE_IF_CALLED)
+  @mock.patch.object(DataFrame, "to_csv", new=RAISE_IF_CALLED)
+  @mock.patch.object(EnrichmentStore, "load")
+  def test_read_basis_with_stored_usd_per_btc(self, load: MagicMock):
+    load.return_value = {
+      (Pair.ETH_BTC, 2): Dec(1100), (Pair.ETH_BTC, 3): Dec(1200)}
+    left: DataFrame = ReadCsv.read("/path/to/basis.csv")
+    right: DataFrame = BASIS_DF_W_USD.copy()
+    right[TIME] = [TIME1, TIME2, TIME3]
+    self.assert_frame_equal_with_nans(left, right)
+
+  @mock.patch.object(pd, "read_csv", new=patch_read_csv)
+  @mock.patch.object(ExchangeApi, "get_close", new=patch_get_close)
+  @mock.patch.object(time, "sleep", new=PASS_IF_CALLED)
+  @mock.patch.object(EnrichmentStore, "append")
+  @mock.patch.object(EnrichmentStore, "load")
+  def test_read_basis_only_queries_missing(
+      self, load: MagicMock, append: MagicMock):
+    load.return_value = {(Pair.ETH_BTC, 2): Dec(1100)}
+    left: DataFrame = ReadCsv.read("/path/to/basis.csv")
+    right: DataFrame = BASIS_DF_W_USD.copy()
+    right[TIME] = [TIME1, TIME2, TIME3]
+    self.assert_frame_equal_with_nans(left, right)
+    append.assert_called_once_with({(Pair.ETH_BTC, 3): Dec(1200)})
+
+  @mock.patch.object(pd, "read_csv", new=patch_read_csv)
+  @mock.patch.object(ExchangeApi, "get_close", new=patch_get_close)
+  @mock.patch.object(time, "sleep", new=PASS_IF_CALLED)
+  @mock.patch.object(EnrichmentStore, "append")
+  @mock.patch.object(EnrichmentStore, "load")
+  def test_read_basis_same_id_other_product(
+      self, load: MagicMock, append: MagicMock):
+    load.return_value = {
+      (Pair.ETH_BTC, 2): Dec(1100), (Pair.LTC_BTC, 3): Dec(9999)}
+    left: DataFrame = ReadCsv.read("/path/to/basis.csv")
+    right: DataFrame = BASIS_DF_W_USD.copy()
+    right[TIME] = [TIME1, TIME2, TIME3]
+    self.assert_frame_equal_with_nans(left, right)
+    append.assert_called_once_with({(Pair.ETH_BTC, 3): Dec(1200)})
+
+  @mock.patch.object(pd, "read_csv", new=patch_read_csv)
+  @mock.patch.object(ExchangeApi, "get_close")
+  @mock.patch.object(time, "sleep", new=PASS_IF_CALLED)
+  @mock.patch.object(EnrichmentStore, "append", new=PASS_IF_CALLED)
+  @mock.patch.object(EnrichmentStore, "load", new=lambda self: {})
+  def test_read_basis_with_price_cache(self, get_close: MagicMock):
+    get_close.side_effect = lambda t: patch_get_close(None, t)
+    price_cache = PriceCache()
+    price_cache.set(TIME2, Dec(1100))
+
+    left: DataFrame = ReadCsv.read("/path/to/basis.csv", None, price_cache)
+
+    right: DataFrame = BASIS_DF_W_USD.copy()
+    right[TIME] = [TIME1, TIME2, TIME3]
+    self.assert_frame_equal_with_nans(left, right)
+    get_close.assert_called_once_with(TIME3)
+    self.assertEqual(price_cache.get(TIME3), Dec(1200))
 
   @mock.patch.object(pd, "read_csv", new=patch_read_csv)
   @mock.patch.object(ExchangeApi, "get_close", new=patch_get_close)
@@ -106,6 +173,38 @@ class TestReadCsv(TestCase):
       check_exact=True
     )
 
+  @mock.patch.object(ExchangeApi, "get_close", new=RAISE_IF_CALLED)
+  @mock.patch.object(time, "sleep", new=RAISE_IF_CALLED)
+  @mock.patch.object(DataFrame, "to_csv", new=RAISE_IF_CALLED)
+  def test_from_records_converts_strings(self):
+    records = [
+      {ID: 1, PAIR: "BTC-USD", SIDE: "BUY",
+       TIME: TIME1.strftime(TIME_STRING_FORMAT), SIZE: "0.001",
+       SIZE_UNIT: "BTC", PRICE: "1000", FEE: "0.01", TOTAL: "-1.01",
+       P_F_T_UNIT: "USD"},
+      {ID: "2", PAIR: Pair.ETH_BTC, SIDE: Side.BUY, TIME: TIME2,
+       SIZE: Dec("0.02"), SIZE_UNIT: Asset.ETH, PRICE: Dec(100), FEE: Dec(0),
+       TOTAL: Dec(-2), P_F_T_UNIT: Asset.BTC},
+    ]
+    usd_per_btc = {(Pair.ETH_BTC, 2): Dec(1100)}
+
+    left: DataFrame = ReadCsv.from_records(iter(records), usd_per_btc)
+
+    right: DataFrame = BASIS_DF_W_USD.iloc[:2].copy()
+    right[TIME] = [TIME1, TIME2]
+    for column in (SIZE, PRICE, FEE, TOTAL):
+      right[column] = right[column].apply(CONVERTERS[column])
+    self.assert_frame_equal_with_nans(left, right)
+
+  @mock.patch.object(ExchangeApi, "get_close", new=RAISE_IF_CALLED)
+  def test_from_records_without_trades(self):
+    df: DataFrame = ReadCsv.from_records([])
+
+    self.assertEqual(len(df), 0)
+    self.assertEqual(list(df.columns), TRADE_COLUMNS)
+    self.assertEqual(df[ID].dtype, "int64")
+    self.assertTrue(pd.api.types.is_datetime64_dtype(df[TIME]))
+
   @staticmethod
   def assert_frame_equal_with_nans(left, right):
 
@@ -123,3 +222,22 @@ class TestReadCsv(TestCase):
       left, right,
       check_exact=True
     )
+
+  def test_read_lot_ids(self):
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, "lot_ids.csv")
+      DataFrame({
+        PAIR: ["BTC-USD", "BTC-USD", "BTC-USD", "ETH-BTC"],
+        ID: [4, 7, 4, 4],
+        BASIS_PAIR: ["BTC-USD", "BTC-USD", "LTC-BTC", "ETH-USD"],
+        BASIS_ID: [2, 3, 1, 2],
+        "notes": ["", "", "", ""]
+      }).to_csv(path, index=False)
+
+      lot_ids = ReadCsv.read_lot_ids(path)
+
+    self.assertEqual(lot_ids, {
+      (Pair.BTC_USD, 4): [(Pair.BTC_USD, 2), (Pair.LTC_BTC, 1)],
+      (Pair.BTC_USD, 7): [(Pair.BTC_USD, 3)],
+      (Pair.ETH_BTC, 4): [(Pair.ETH_USD, 2)]
+    })
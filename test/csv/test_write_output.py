@@ -1,3 +1,5 @@
+import os
+import tempfile
 from collections import deque
 from decimal import Decimal
 from unittest import TestCase, mock
@@ -53,7 +55,7 @@ LTC_THREE = get_trade_for_pair(
   Pair.LTC_USD, Side.BUY, TIME_THREE, Decimal("0.3"), Decimal(50), Decimal(0)
 )
 LTC_FOUR = get_trade_for_pair(
-  Pair.LTC_USD, Side.SELL, TRADE_FOUR, Decimal("0.3"), Decimal(40), Decimal(0)
+  Pair.LTC_USD, Side.SELL, TIME_FOUR, Decimal("0.3"), Decimal(40), Decimal(0)
 )
 LTC_BASIS_ONE = get_trade_for_pair(
   Pair.LTC_USD, Side.BUY, TIME_FIVE, Decimal("0.3"), Decimal(20), Decimal(0)
@@ -72,6 +74,10 @@ PATH = "/test/path/"
 MOCK_TO_CSV_PATH = "calculator.csv.write_output.DataFrame.to_csv"
 
 
+def to_df(trades):
+  return DataFrame([t.to_dict() for t in trades])
+
+
 class TestWriteOutput(TestCase):
 
   verify_output = VerifyOutput()
@@ -95,11 +101,11 @@ class TestWriteOutput(TestCase):
     self.entries.append(ENTRY_TWO)
     self.write_output.write(ASSET, self.basis_queue, self.entries)
 
-    self.validate_df_call(write_basis, DataFrame(self.basis_queue))
+    self.validate_df_call(write_basis, to_df(self.basis_queue))
     self.validate_df_call(
-      write_costs, DataFrame(e.costs for e in self.entries))
+      write_costs, to_df(e.costs for e in self.entries))
     self.validate_df_call(
-      write_proceeds, DataFrame(e.proceeds for e in self.entries))
+      write_proceeds, to_df(e.proceeds for e in self.entries))
     self.validate_df_call(
       write_profit_and_loss,
       DataFrame(e.profit_and_loss.get_series() for e in self.entries))
@@ -107,7 +113,7 @@ class TestWriteOutput(TestCase):
   @mock.patch(MOCK_TO_CSV_PATH,
               new=verify_output.get_stub_to_csv())
   def test_write_basis(self):
-    df = DataFrame([TRADE_ONE])
+    df = to_df([TRADE_ONE])
     self.write_output.write_basis(df, asset=Asset.BTC)
 
     self.validate_output(
@@ -116,7 +122,7 @@ class TestWriteOutput(TestCase):
   @mock.patch(MOCK_TO_CSV_PATH,
               new=verify_output.get_stub_to_csv())
   def test_write_basis_multiple(self):
-    df = DataFrame([TRADE_ONE, TRADE_THREE])
+    df = to_df([TRADE_ONE, TRADE_THREE])
     self.write_output.write_basis(df, asset=Asset.BTC)
 
     self.validate_output(
@@ -125,7 +131,7 @@ class TestWriteOutput(TestCase):
   @mock.patch(MOCK_TO_CSV_PATH,
               new=verify_output.get_stub_to_csv())
   def test_write_basis_matched(self):
-    df = DataFrame([ENTRY_ONE.costs])
+    df = to_df([ENTRY_ONE.costs])
     self.write_output.write_costs(df, asset=Asset.BTC)
 
     self.validate_output(
@@ -134,7 +140,7 @@ class TestWriteOutput(TestCase):
   @mock.patch(MOCK_TO_CSV_PATH,
               new=verify_output.get_stub_to_csv())
   def test_write_basis_matched_multiple(self):
-    df = DataFrame([ENTRY_ONE.costs, ENTRY_TWO.costs])
+    df = to_df([ENTRY_ONE.costs, ENTRY_TWO.costs])
     self.write_output.write_costs(df, asset=Asset.BTC)
 
     self.validate_output(
@@ -142,7 +148,7 @@ class TestWriteOutput(TestCase):
 
   @mock.patch(MOCK_TO_CSV_PATH, new=verify_output.get_stub_to_csv())
   def test_write_proceeds_matched(self):
-    df = DataFrame([ENTRY_ONE.proceeds])
+    df = to_df([ENTRY_ONE.proceeds])
     self.write_output.write_proceeds(df, asset=Asset.BTC)
 
     self.validate_output(df, "".join(
@@ -150,7 +156,7 @@ class TestWriteOutput(TestCase):
 
   @mock.patch(MOCK_TO_CSV_PATH, new=verify_output.get_stub_to_csv())
   def test_write_proceeds_matched_multiple(self):
-    df = DataFrame([ENTRY_ONE.proceeds, ENTRY_TWO.proceeds])
+    df = to_df([ENTRY_ONE.proceeds, ENTRY_TWO.proceeds])
     self.write_output.write_proceeds(df, asset=Asset.BTC)
 
     self.validate_output(df, "".join(
@@ -214,8 +220,8 @@ class TestWriteOutput(TestCase):
     summary_index = False
 
     expected_basis_df = pd.concat([
-      DataFrame(self.basis_queue),
-      DataFrame(ltc_basis)
+      to_df(self.basis_queue),
+      to_df(ltc_basis)
     ])
     basis_path = PATH + COMBINED_BASIS
     basis_index = False
@@ -246,7 +252,7 @@ class TestWriteOutput(TestCase):
     })
     summary_path = PATH + SUMMARY
     summary_index = False
-    expected_basis_df = DataFrame(self.basis_queue)
+    expected_basis_df = to_df(self.basis_queue)
     basis_path = PATH + COMBINED_BASIS
     basis_index = False
     self.validate_multiple_outputs(
@@ -287,3 +293,66 @@ class TestWriteOutput(TestCase):
       self.assertEqual(output_kwargs.keys(), {"index", "date_format"})
       self.assertEqual(output_kwargs["index"], add_index)
       self.assertEqual(output_kwargs["date_format"], TIME_STRING_FORMAT)
+
+
+class TestTruncate(TestCase):
+
+  def setUp(self) -> None:
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = self.dir.name + "/"
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def test_truncate_keeps_header_and_first_rows(self):
+    costs_path = self.path + "BTC_" + COSTS_SFX
+    with open(costs_path, "w") as f:
+      f.write(",trade id,wash p and l ids\n0,1,[]\n1,2,\"[0, 1]\"\n2,3,[]\n")
+
+    WriteOutput(self.path).truncate(Asset.BTC, 2)
+
+    with open(costs_path) as f:
+      self.assertEqual(f.read(), ",trade id,wash p and l ids\n0,1,[]\n"
+                                 "1,2,\"[0, 1]\"\n")
+    self.assertFalse(os.path.isfile(self.path + "BTC_" + PROCEEDS_SFX))
+
+
+class TestWriteUnwashed(TestCase):
+
+  def setUp(self) -> None:
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = self.dir.name + "/"
+    time_incrementer.reset()
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def test_write_without_wash_adjustments(self):
+    basis = self.trade(Side.BUY, "7000")
+    proceeds = self.trade(Side.SELL, "6000")
+    wash = self.trade(Side.BUY, "5000")
+    entry = Entry(Asset.BTC, basis, proceeds)
+    entry.profit_and_loss.wash_loss(wash)
+
+    write_output = WriteOutput(self.path, washed=False)
+    write_output.write(Asset.BTC, deque([wash]), deque([entry]))
+    write_output.write_summary()
+
+    summary = pd.read_csv(self.path + SUMMARY)
+    self.assertEqual(list(summary["profit and loss"]), [-1000])
+    self.assertEqual(list(summary["remaining basis"]), [5000])
+    p_l = pd.read_csv(self.path + "BTC_" + PROFIT_AND_LOSS_SFX)
+    self.assertEqual(list(p_l["adjusted for wash loss"]), [-1000])
+    self.assertEqual(list(p_l["ids for adjusted basis"]), ["[]"])
+    basis_df = pd.read_csv(self.path + "BTC_" + BASIS_SFX)
+    self.assertNotIn("adjusted value", basis_df.columns)
+    # the washed summary has the loss added to the basis of the wash trade
+    self.assertEqual(
+      WriteOutput.get_summary(Asset.BTC, [wash], [entry])["remaining basis"],
+      Decimal(6000))
+
+  @staticmethod
+  def trade(side, price):
+    return get_trade_for_pair(
+      Pair.BTC_USD, side, time_incrementer.get_time_and_increment(),
+      Decimal(1), Decimal(price), Decimal(0), wash=True)
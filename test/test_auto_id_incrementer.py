@@ -0,0 +1,69 @@
+import pickle
+import threading
+from unittest import TestCase
+
+from calculator.auto_id_incrementer import AutoIdIncrementer, \
+  AssetIdIncrementer
+
+
+class TestAutoIdIncrementer(TestCase):
+
+  def test_incrementers_are_independent(self):
+    first = AutoIdIncrementer()
+    second = AutoIdIncrementer(5)
+
+    self.assertEqual(first.get_id_and_increment(), 0)
+    self.assertEqual(second.get_id_and_increment(), 5)
+    self.assertEqual(first.get_id_and_increment(), 1)
+
+  def test_threads_get_unique_ids(self):
+    incrementer = AutoIdIncrementer()
+    ids = []
+
+    def allocate():
+      ids.extend(incrementer.get_id_and_increment() for _ in range(1000))
+
+    threads = [threading.Thread(target=allocate) for _ in range(4)]
+    for thread in threads:
+      thread.start()
+    for thread in threads:
+      thread.join()
+
+    self.assertEqual(sorted(ids), list(range(4000)))
+
+  def test_reserve(self):
+    incrementer = AutoIdIncrementer(10)
+    first = incrementer.reserve(2)
+    second = incrementer.reserve(3)
+
+    self.assertEqual(incrementer.get_id_and_increment(), 15)
+    self.assertEqual(
+      [second.get_id_and_increment() for _ in range(3)], [12, 13, 14])
+    self.assertEqual(first.get_id_and_increment(), 10)
+    self.assertEqual(first.get_id_and_increment(), 11)
+    with self.assertRaises(ValueError):
+      first.get_id_and_increment()
+
+  def test_pickle(self):
+    incrementer = AutoIdIncrementer(3, 5)
+    incrementer.get_id_and_increment()
+
+    loaded = pickle.loads(pickle.dumps(incrementer))
+
+    self.assertEqual(loaded.get_id_and_increment(), 4)
+    self.assertEqual(loaded.stop, 5)
+
+
+class TestAssetIdIncrementer(TestCase):
+
+  def test_reused_ids_first(self):
+    incrementer = AutoIdIncrementer(20)
+    asset_ids = AssetIdIncrementer(incrementer, [(3, 5), (8, 9)])
+
+    self.assertEqual(asset_ids.id, 3)
+    self.assertEqual(
+      [asset_ids.get_id_and_increment() for _ in range(5)],
+      [3, 4, 8, 20, 21])
+    self.assertEqual(asset_ids.id, 22)
+    self.assertEqual(incrementer.id, 22)
+    self.assertEqual(asset_ids.allocated, [(3, 5), (8, 9), (20, 22)])
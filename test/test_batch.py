@@ -0,0 +1,66 @@
+import os
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from calculator.batch import read_manifest, run_batch, BATCH_LOG
+from calculator.csv.read_csv import ReadCsv
+
+HEADER = "trade id,product,side,created at,size,size unit,price,fee,total," \
+         "price/fee/total unit\n"
+BASIS = "1,BTC-USD,BUY,2019-01-01T00:00:00.000Z,1.0,BTC,8000,0,-8000,USD\n"
+FILLS = "2,BTC-USD,SELL,2019-02-01T00:00:00.000Z,0.5,BTC,7000,0,3500,USD\n" \
+        "3,BTC-USD,SELL,2019-03-01T00:00:00.000Z,0.5,BTC,9000,0,4500,USD\n"
+
+
+class TestBatch(TestCase):
+
+  def setUp(self) -> None:
+    self.dir = tempfile.TemporaryDirectory()
+    self.root = self.dir.name + "/"
+    for account in ("a", "b"):
+      os.mkdir(self.root + account)
+      self.write(account + "/basis.csv", HEADER + BASIS)
+      self.write(account + "/fills.csv", HEADER + FILLS)
+    self.write("manifest.csv", "account,path,basis,fills,track wash\n"
+                               "first,a,basis.csv,fills.csv,true\n"
+                               "second,b,basis.csv,fills.csv,\n"
+                               "missing,c,basis.csv,fills.csv,\n")
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def write(self, name, text):
+    with open(self.root + name, "w") as f:
+      f.write(text)
+
+  def test_read_manifest(self):
+    accounts = read_manifest(self.root + "manifest.csv")
+
+    self.assertEqual([a.name for a in accounts], ["first", "second", "missing"])
+    self.assertEqual(accounts[0].path, self.root + "a/")
+    self.assertEqual(accounts[0].basis, "basis.csv")
+    self.assertEqual(accounts[0].fills, "fills.csv")
+    self.assertEqual([a.track_wash for a in accounts], [True, False, False])
+
+  def test_run_batch(self):
+    self.check_run_batch(1)
+
+  def test_run_batch_in_processes(self):
+    self.check_run_batch(2)
+
+  def check_run_batch(self, workers):
+    ReadCsv.log_negative = False
+
+    errors = run_batch(read_manifest(self.root + "manifest.csv"), workers)
+
+    self.assertIsNone(errors["first"])
+    self.assertIsNone(errors["second"])
+    self.assertIn("FileNotFoundError", errors["missing"])
+    for account in ("a", "b"):
+      output = self.root + account + "/output/"
+      p_l = pd.read_csv(output + "BTC_profit_and_loss.csv")
+      # each account numbers profit and loss from zero
+      self.assertEqual(list(p_l["id"]), [0, 1])
+      self.assertTrue(os.path.isfile(output + BATCH_LOG))
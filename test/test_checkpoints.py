@@ -0,0 +1,134 @@
+from collections import deque
+from datetime import timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.checkpoints import AssetCheckpoints
+from calculator.format import ID
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer
+
+
+class TestAssetCheckpoints(TestCase):
+
+  def setUp(self) -> None:
+    time_incrementer.reset()
+    self.processor = TradeProcessor(Asset.BTC, deque([
+      get_trade_for_pair(Pair.BTC_USD, Side.BUY,
+                         time_incrementer.get_time_and_increment(1),
+                         Decimal(5), Decimal(8000), Decimal(0))
+    ]))
+
+  def process(self, checkpoints, days=1, hours=0):
+    trade = get_trade_for_pair(
+      Pair.BTC_USD, Side.SELL,
+      time_incrementer.increment_and_get_time(days, hours),
+      Decimal("0.1"), Decimal(9000), Decimal(0))
+    checkpoints.before_trade(self.processor, trade)
+    self.processor.handle_trade(trade)
+    return trade
+
+  def test_checkpoint_every_trades(self):
+    checkpoints = AssetCheckpoints(trades=2)
+    for _ in range(5):
+      self.process(checkpoints)
+
+    self.assertEqual(
+      [c.trade_count for c in checkpoints.checkpoints], [0, 2, 4])
+    self.assertIsNone(checkpoints.checkpoints[0].time)
+    # without wash checks entries are settled once made, only totals are kept
+    checkpoint = checkpoints.checkpoints[1]
+    self.assertEqual(len(checkpoint.get_state()["entries"]), 0)
+    self.assertEqual(checkpoint.written, {
+      "rows": 2, "costs": Decimal(1600), "proceeds": Decimal(1800),
+      "profit and loss": Decimal(200)})
+    self.assertEqual(checkpoints.checkpoints[2].written["rows"], 4)
+    self.assertEqual(
+      [c.next_id for c in checkpoints.checkpoints], [0, 2, 4])
+
+  def test_checkpoint_keeps_entries_washes_can_change(self):
+    self.processor = TradeProcessor(
+      Asset.BTC, self.processor.basis_queue, track_wash=True)
+    for trade in self.processor.basis_queue:
+      trade.track_wash()
+    checkpoints = AssetCheckpoints(trades=2)
+    checkpoints.start({"rows": 3, "costs": Decimal(1), "proceeds": Decimal(2),
+                       "profit and loss": Decimal(1)})
+    trades = [self.process(checkpoints, days=days)
+              for days in (1, 1, 40, 1, 1)]
+
+    first, second, third = checkpoints.checkpoints
+    self.assertEqual(first.written["rows"], 3)
+    # the first two sales are settled by the third, 40 days later
+    self.assertEqual(
+      [e.proceeds[ID] for e in second.get_state()["entries"]],
+      [t[ID] for t in trades[:2]])
+    self.assertEqual(second.written["rows"], 3)
+    self.assertEqual(
+      [e.proceeds[ID] for e in third.get_state()["entries"]],
+      [t[ID] for t in trades[2:4]])
+    self.assertEqual(third.written, {
+      "rows": 5, "costs": Decimal(1601), "proceeds": Decimal(1802),
+      "profit and loss": Decimal(201)})
+
+  def test_checkpoint_interval(self):
+    checkpoints = AssetCheckpoints(trades=100, interval=timedelta(days=3))
+    trades = [self.process(checkpoints) for _ in range(5)]
+
+    self.assertEqual(
+      [c.trade_count for c in checkpoints.checkpoints], [0, 3])
+    self.assertEqual(checkpoints.checkpoints[1].time, trades[2]["created at"])
+
+  def test_no_checkpoint_between_trades_at_same_time(self):
+    checkpoints = AssetCheckpoints(trades=1)
+    self.process(checkpoints)
+    self.process(checkpoints, days=0)
+    self.process(checkpoints)
+
+    self.assertEqual(
+      [c.trade_count for c in checkpoints.checkpoints], [0, 2])
+
+  def test_rollback(self):
+    checkpoints = AssetCheckpoints(trades=2)
+    trades = [self.process(checkpoints) for _ in range(5)]
+
+    self.assertTrue(checkpoints.is_late(trades[2]["created at"]))
+    self.assertFalse(
+      checkpoints.is_late(trades[4]["created at"] + timedelta(seconds=1)))
+    checkpoint = checkpoints.rollback(trades[2]["created at"])
+
+    self.assertEqual(checkpoint.trade_count, 2)
+    self.assertEqual(checkpoint.time, trades[1]["created at"])
+    self.assertEqual(len(checkpoints.checkpoints), 2)
+    self.assertEqual(checkpoints.trade_count, 2)
+    self.assertEqual(checkpoints.last_time, trades[1]["created at"])
+    self.assertEqual(checkpoint.written["rows"], 2)
+    self.assertEqual(len(checkpoint.get_state()["entries"]), 0)
+
+  def test_drop_settled(self):
+    checkpoints = AssetCheckpoints(trades=1)
+    trades = [self.process(checkpoints, days=10) for _ in range(6)]
+
+    checkpoints.drop_settled(trades[-1]["created at"])
+
+    # checkpoints are after trades, the latest before the wash window is kept
+    self.assertEqual(
+      [c.time for c in checkpoints.checkpoints],
+      [t["created at"] for t in trades[2:5]])
+    self.assertFalse(checkpoints.is_late(trades[-1]["created at"]
+                                         + timedelta(seconds=1)))
+    with self.assertRaises(ValueError):
+      checkpoints.rollback(trades[2]["created at"])
+    self.assertEqual(len(checkpoints.checkpoints), 3)
+    checkpoint = checkpoints.rollback(trades[3]["created at"])
+    self.assertEqual(checkpoint.time, trades[2]["created at"])
+
+  def test_ids_taken_from_checkpoint(self):
+    checkpoints = AssetCheckpoints()
+    checkpoints.add_ids([(0, 4), (4, 6)])
+    checkpoints.add_ids([(10, 12)])
+
+    self.assertEqual(checkpoints.id_ranges, [(0, 6), (10, 12)])
+    self.assertEqual(checkpoints.take_ids(5), [(5, 6), (10, 12)])
+    self.assertEqual(checkpoints.id_ranges, [(0, 5)])
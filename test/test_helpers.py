@@ -5,12 +5,11 @@ from typing import Union, List, Tuple, Dict, Any
 
 import pytz
 from pandas import Series, DataFrame
+from pandas.testing import assert_series_equal
 
 from calculator.auto_id_incrementer import AutoIdIncrementer
 from calculator.converters import USD_ROUNDER
-from calculator.format import ID, PAIR, SIDE, TIME, SIZE, \
-  SIZE_UNIT, PRICE, FEE, P_F_T_UNIT, TOTAL, USD_PER_BTC, VALUE_IN_USD, \
-  ADJUSTED_VALUE, WASH_P_L_IDS, ADJUSTED_SIZE
+from calculator.trade_processor.fill import Fill
 from calculator.trade_types import Pair, Asset, Side
 
 
@@ -38,7 +37,7 @@ def get_trade(
     fee: Decimal = Decimal("0"),
     usd_per_btc: Decimal = Decimal("13815.04"),
     wash: bool = False
-) -> Series:
+) -> Fill:
   """
   Default values added for both example and ease to create a trade
   :param trade_id: int trade id
@@ -56,7 +55,7 @@ def get_trade(
   price/fee/total unit: BTC
   total in usd: 6.10
 
-  :return Series representing the trade
+  :return Fill representing the trade
 
   """
   # Values are assumed to be passed in as positive, this is a sanity check
@@ -74,25 +73,21 @@ def get_trade(
   else:
     raise ValueError("Pair not supported: " + str(product))
 
-  trade_series = Series({
-    ID: trade_id,
-    PAIR: product,
-    SIDE: side,
-    TIME: created_at,
-    SIZE: size,
-    SIZE_UNIT: product.get_base_asset(),
-    PRICE: price,
-    FEE: fee,
-    P_F_T_UNIT: quote,
-    TOTAL: total,
-    USD_PER_BTC: usd_per_btc,
-    VALUE_IN_USD: value
-  })
+  trade = Fill(
+    trade_id, product, side, created_at, size, product.get_base_asset(),
+    price, fee, total, quote, usd_per_btc, value
+  )
   if wash:
-    trade_series[ADJUSTED_VALUE] = value
-    trade_series[ADJUSTED_SIZE] = Decimal(0)
-    trade_series[WASH_P_L_IDS] = []
-  return trade_series
+    trade.track_wash()
+  return trade
+
+
+def assert_fill_equal(left: Fill, right: Fill, *args, **kwargs):
+  """
+  assert_series_equal of the values of each fill by column.
+  """
+  assert_series_equal(
+    Series(left.to_dict()), Series(right.to_dict()), *args, **kwargs)
 
 
 class AutoTimeIncrementer:
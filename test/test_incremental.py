@@ -0,0 +1,166 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import pandas as pd
+
+from calculator.incremental import calculate_incremental
+from calculator.progress import ProgressReporter
+from calculator.tax_calculator import calculate_all
+
+HEADER = "trade id,product,side,created at,size,size unit,price,fee,total," \
+         "price/fee/total unit\n"
+BASIS = [
+  "1,BTC-USD,BUY,2019-01-01T00:00:00.000Z,1.0,BTC,8000,0,-8000,USD\n",
+  "2,BTC-USD,BUY,2019-01-02T00:00:00.000Z,1.0,BTC,9000,0,-9000,USD\n"
+]
+FILLS = [
+  "3,BTC-USD,SELL,2019-02-01T00:00:00.000Z,0.5,BTC,7000,0,3500,USD\n",
+  "4,BTC-USD,SELL,2019-04-01T00:00:00.000Z,0.75,BTC,10000,0,7500,USD\n",
+  "5,BTC-USD,BUY,2019-04-10T00:00:00.000Z,0.5,BTC,7500,0,-3750,USD\n",
+  "6,BTC-USD,SELL,2019-06-01T00:00:00.000Z,0.5,BTC,9500,0,4750,USD\n"
+]
+
+
+class TestIncremental(TestCase):
+
+  def setUp(self) -> None:
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = self.dir.name + "/"
+    self.write_csv("basis.csv", BASIS)
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def write_csv(self, name, rows):
+    with open(self.path + name, "w") as f:
+      f.write(HEADER + "".join(rows))
+
+  def run_incremental(self, fills, track_wash=False):
+    self.write_csv("fills.csv", fills)
+    calculate_incremental(self.path, "basis.csv", "fills.csv", track_wash,
+                          ProgressReporter(silent=True))
+
+  def read_output(self, name):
+    return pd.read_csv(self.path + "output/" + name)
+
+  def test_appends_only_new_fills(self):
+    self.run_incremental(FILLS[:1])
+    self.assertEqual(len(self.read_output("BTC_profit_and_loss.csv")), 1)
+
+    self.run_incremental(FILLS)
+    incremental_p_l = self.read_output("BTC_profit_and_loss.csv")
+    incremental_summary = self.read_output("summary.csv")
+    incremental_basis = self.read_output("BTC_basis.csv")
+    costs = self.read_output("BTC_costs.csv")
+    self.assertEqual(list(costs["Unnamed: 0"]), [0, 1, 2, 3])
+
+    calculate_all(self.path, "basis.csv", "fills.csv", False)
+    full_p_l = self.read_output("BTC_profit_and_loss.csv")
+    pd.testing.assert_frame_equal(
+      incremental_p_l.drop(columns="id"), full_p_l.drop(columns="id"))
+    pd.testing.assert_frame_equal(
+      incremental_summary, self.read_output("summary.csv"))
+    pd.testing.assert_frame_equal(
+      incremental_basis, self.read_output("BTC_basis.csv"))
+
+  def test_no_new_fills(self):
+    self.run_incremental(FILLS)
+    summary = self.read_output("summary.csv")
+
+    self.run_incremental(FILLS)
+
+    self.assertEqual(len(self.read_output("BTC_profit_and_loss.csv")), 4)
+    pd.testing.assert_frame_equal(summary, self.read_output("summary.csv"))
+
+  def test_wash_entries_held_until_settled(self):
+    self.run_incremental(FILLS[:2], track_wash=True)
+    # the loss on 02-01 is settled, the sale on 04-01 could still be washed
+    self.assertEqual(len(self.read_output("BTC_profit_and_loss.csv")), 1)
+
+    self.run_incremental(FILLS[:3], track_wash=True)
+    self.assertEqual(len(self.read_output("BTC_profit_and_loss.csv")), 1)
+
+    self.run_incremental(FILLS, track_wash=True)
+    incremental_p_l = self.read_output("BTC_profit_and_loss.csv")
+    self.assertEqual(len(incremental_p_l), 3)
+
+    calculate_all(self.path, "basis.csv", "fills.csv", True)
+    full_p_l = self.read_output("BTC_profit_and_loss.csv")
+    pd.testing.assert_frame_equal(
+      incremental_p_l.drop(columns=["id", "ids for adjusted basis"]),
+      full_p_l.iloc[:3].drop(columns=["id", "ids for adjusted basis"]))
+
+  def test_summary_includes_held_entries(self):
+    with tempfile.TemporaryDirectory() as full_dir:
+      full_path = full_dir + "/"
+      shutil.copy(self.path + "basis.csv", full_path)
+      for fills in (FILLS[:2], FILLS[:3], FILLS):
+        self.run_incremental(fills, track_wash=True)
+        shutil.copy(self.path + "fills.csv", full_path)
+        calculate_all(full_path, "basis.csv", "fills.csv", True,
+                      progress=ProgressReporter(silent=True))
+
+        # the rows written leave out sales that could still be washed
+        self.assertLess(
+          len(self.read_output("BTC_profit_and_loss.csv")),
+          len(pd.read_csv(full_path + "output/BTC_profit_and_loss.csv")))
+        pd.testing.assert_frame_equal(
+          self.read_output("summary.csv"),
+          pd.read_csv(full_path + "output/summary.csv"))
+
+  def test_late_fill_replays_from_checkpoint(self):
+    late = "7,BTC-USD,SELL,2019-05-15T00:00:00.000Z,0.25,BTC,9000,0,2250,USD\n"
+    self.write_csv("fills.csv", FILLS)
+    calculate_incremental(self.path, "basis.csv", "fills.csv", False,
+                          ProgressReporter(silent=True), checkpoint_trades=1)
+
+    self.write_csv("fills.csv", FILLS[:3] + [late] + FILLS[3:])
+    calculate_incremental(self.path, "basis.csv", "fills.csv", False,
+                          ProgressReporter(silent=True), checkpoint_trades=1)
+    incremental_p_l = self.read_output("BTC_profit_and_loss.csv")
+    incremental_summary = self.read_output("summary.csv")
+    costs = self.read_output("BTC_costs.csv")
+
+    calculate_all(self.path, "basis.csv", "fills.csv", False)
+    # entries made again from the checkpoint are given the ids they had, so
+    # ids are the same as processing all fills at once
+    pd.testing.assert_frame_equal(
+      incremental_p_l, self.read_output("BTC_profit_and_loss.csv"))
+    pd.testing.assert_frame_equal(
+      incremental_summary, self.read_output("summary.csv"))
+    self.assertEqual(list(costs["Unnamed: 0"]), [0, 1, 2, 3, 4])
+
+  def test_late_fill_before_kept_checkpoints(self):
+    late = "7,BTC-USD,SELL,2019-03-01T00:00:00.000Z,0.25,BTC,9000,0,2250,USD\n"
+    self.write_csv("fills.csv", FILLS)
+    calculate_incremental(self.path, "basis.csv", "fills.csv", False,
+                          ProgressReporter(silent=True), checkpoint_trades=1)
+
+    # checkpoints more than 30 days before the last fill are dropped
+    self.write_csv("fills.csv", FILLS[:1] + [late] + FILLS[1:])
+    with self.assertRaises(ValueError):
+      calculate_incremental(self.path, "basis.csv", "fills.csv", False,
+                            ProgressReporter(silent=True),
+                            checkpoint_trades=1)
+
+  def test_same_trade_id_other_product(self):
+    self.run_incremental(FILLS[:1])
+
+    self.run_incremental(FILLS[:1] + [
+      "3,ETH-USD,BUY,2019-02-02T00:00:00.000Z,1.0,ETH,100,0,-100,USD\n"])
+
+    self.assertEqual(len(self.read_output("ETH_basis.csv")), 1)
+    self.assertEqual(len(self.read_output("BTC_profit_and_loss.csv")), 1)
+
+  def test_late_fill_needs_processed_fills(self):
+    late = "7,BTC-USD,SELL,2019-03-01T00:00:00.000Z,0.25,BTC,9000,0,2250,USD\n"
+    self.run_incremental(FILLS)
+    with self.assertRaises(ValueError):
+      self.run_incremental([late])
+
+  def test_track_wash_must_match(self):
+    self.run_incremental(FILLS[:1])
+    with self.assertRaises(ValueError):
+      self.run_incremental(FILLS, track_wash=True)
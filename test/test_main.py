@@ -1,7 +1,10 @@
+from datetime import timedelta
 from unittest import TestCase, mock
 from unittest.mock import MagicMock, call
 
 import calculator
+from calculator.trade_processor.lots import LotMethod
+from calculator.trade_types import Pair
 
 
 class TestMain(TestCase):
@@ -18,7 +21,10 @@ class TestMain(TestCase):
     calculator.__main__.main()
 
     self.assertEqual(mock_calc_all.call_args_list, [
-      call(path, basis, fills, False)
+      call(path, basis, fills, False, workers=1,
+           load_state=False, save_state=None,
+           method=LotMethod.FIFO, lot_ids=None, write_unwashed=False,
+           single_pass=False)
     ])
 
   @mock.patch("calculator.__main__.calculate_all")
@@ -34,5 +40,188 @@ class TestMain(TestCase):
     calculator.__main__.main()
 
     self.assertEqual(mock_calc_all.call_args_list, [
-      call(path, basis, fills, True)
+      call(path, basis, fills, True, workers=1,
+           load_state=False, save_state=None,
+           method=LotMethod.FIFO, lot_ids=None, write_unwashed=False,
+           single_pass=False)
+    ])
+
+  @mock.patch("calculator.__main__.ReadCsv.read_lot_ids")
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_with_method(self, mock_sys: MagicMock,
+                            mock_calc_all: MagicMock,
+                            mock_read_lot_ids: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, basis, fills, "--method", "specific-id",
+                     "--lot-ids", "lot_ids.csv"]
+    lot_ids = {(Pair.BTC_USD, 4): [(Pair.BTC_USD, 1)]}
+    mock_read_lot_ids.return_value = lot_ids
+
+    calculator.__main__.main()
+
+    mock_read_lot_ids.assert_called_once_with(path + "lot_ids.csv")
+    self.assertEqual(mock_calc_all.call_args_list, [
+      call(path, basis, fills, False, workers=1,
+           load_state=False, save_state=None,
+           method=LotMethod.SPECIFIC_ID, lot_ids=lot_ids,
+           write_unwashed=False, single_pass=False)
+    ])
+
+  @mock.patch("calculator.__main__.compare_methods")
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_compare(self, mock_sys: MagicMock, mock_calc_all: MagicMock,
+                        mock_compare: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, basis, fills, "--compare", "fifo", "lifo",
+                     "hifo", "--workers", "3"]
+
+    calculator.__main__.main()
+
+    mock_calc_all.assert_not_called()
+    self.assertEqual(mock_compare.call_args_list, [
+      call(path, basis, fills, False,
+           [LotMethod.FIFO, LotMethod.LIFO, LotMethod.HIFO], workers=3,
+           load_state=False, lot_ids=None)
+    ])
+
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_with_workers(self, mock_sys: MagicMock,
+                             mock_calc_all: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, basis, fills, "--workers", "4"]
+
+    calculator.__main__.main()
+
+    self.assertEqual(mock_calc_all.call_args_list, [
+      call(path, basis, fills, False, workers=4,
+           load_state=False, save_state=None,
+           method=LotMethod.FIFO, lot_ids=None, write_unwashed=False,
+           single_pass=False)
+    ])
+
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_with_state(self, mock_sys: MagicMock,
+                           mock_calc_all: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    state = "2019.state"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, state, fills, "--load-state",
+                     "--save-state", "2020.state"]
+
+    calculator.__main__.main()
+
+    self.assertEqual(mock_calc_all.call_args_list, [
+      call(path, state, fills, False, workers=1,
+           load_state=True, save_state="2020.state",
+           method=LotMethod.FIFO, lot_ids=None,
+           write_unwashed=False, single_pass=False)
+    ])
+
+  @mock.patch("calculator.__main__.calculate_incremental")
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_incremental(self, mock_sys: MagicMock,
+                            mock_calc_all: MagicMock,
+                            mock_incremental: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, basis, fills, "--incremental",
+                     "--track-wash", "--checkpoint-days", "30"]
+
+    calculator.__main__.main()
+
+    mock_calc_all.assert_not_called()
+    self.assertEqual(mock_incremental.call_args_list, [
+      call(path, basis, fills, True, checkpoint_trades=1000,
+           checkpoint_interval=timedelta(days=30))
+    ])
+
+  @mock.patch("calculator.__main__.calculate_incremental")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_incremental_unsupported(self, mock_sys: MagicMock,
+                                        mock_incremental: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.exit.side_effect = SystemExit
+    for flags in (["--workers", "2"], ["--load-state"],
+                  ["--save-state", "2020.state"], ["--method", "lifo"],
+                  ["--single-pass"]):
+      mock_sys.argv = [script, path, basis, fills, "--incremental"] + flags
+
+      with self.assertRaises(SystemExit):
+        calculator.__main__.main()
+
+    mock_incremental.assert_not_called()
+    self.assertEqual(mock_sys.exit.call_args_list, [call(2)] * 5)
+
+  @mock.patch("calculator.__main__.serve")
+  @mock.patch("calculator.__main__.compare_methods")
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_unsupported_flags(self, mock_sys: MagicMock,
+                                  mock_calc_all: MagicMock,
+                                  mock_compare: MagicMock,
+                                  mock_serve: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.exit.side_effect = SystemExit
+    flag_sets = (
+      ["--single-pass", "--workers", "2"],
+      ["--serve", "8080", "--method", "lifo"],
+      ["--serve", "8080", "--workers", "2"],
+      ["--compare", "fifo", "lifo", "--save-state", "2020.state"],
+      ["--compare", "fifo", "lifo", "--track-wash", "--unwashed"],
+      ["--compare", "fifo", "lifo", "--single-pass"],
+      ["--lot-ids", "lot_ids.csv"],
+      ["--method", "lifo", "--lot-ids", "lot_ids.csv"],
+      ["--compare", "fifo", "lifo", "--lot-ids", "lot_ids.csv"]
+    )
+    for flags in flag_sets:
+      mock_sys.argv = [script, path, basis, fills] + flags
+
+      with self.assertRaises(SystemExit):
+        calculator.__main__.main()
+
+    mock_calc_all.assert_not_called()
+    mock_compare.assert_not_called()
+    mock_serve.assert_not_called()
+    self.assertEqual(
+      mock_sys.exit.call_args_list, [call(2)] * len(flag_sets))
+
+  @mock.patch("calculator.__main__.serve")
+  @mock.patch("calculator.__main__.calculate_all")
+  @mock.patch("calculator.__main__.argparse._sys")
+  def test_main_serve(self, mock_sys: MagicMock, mock_calc_all: MagicMock,
+                      mock_serve: MagicMock):
+    script = "/path/of/running/script/discarded/by/argparse"
+    path = "/path/to/files/"
+    basis = "basis_file"
+    fills = "fills_file"
+    mock_sys.argv = [script, path, basis, fills, "--serve", "8080"]
+
+    calculator.__main__.main()
+
+    mock_calc_all.assert_not_called()
+    self.assertEqual(mock_serve.call_args_list, [
+      call(path, basis, fills, False, 8080, load_state=False)
     ])
@@ -0,0 +1,40 @@
+from datetime import datetime
+from unittest import TestCase
+
+from pandas import DataFrame
+
+from calculator.format import ID, PAIR, SIDE, TIME
+from calculator.partition import AssetPartition
+from calculator.trade_types import Pair, Side, Asset
+
+DF = DataFrame({
+  ID: [1, 2, 3, 4, 5],
+  PAIR: [Pair.ETH_BTC, Pair.BTC_USD, Pair.ETH_USD, Pair.ETH_BTC, Pair.BTC_USD],
+  SIDE: [Side.SELL, Side.BUY, Side.BUY, Side.BUY, Side.SELL],
+  TIME: [datetime(2019, 1, 5), datetime(2019, 1, 1), datetime(2019, 1, 3),
+         datetime(2019, 1, 3), datetime(2019, 1, 2)]
+})
+
+
+class TestAssetPartition(TestCase):
+
+  def test_sorted_once_by_time(self):
+    partition = AssetPartition(DF)
+    self.assertEqual(list(partition.df[ID]), [2, 5, 3, 4, 1],
+                     "ties should keep file order")
+
+  def test_trades_for_both_assets(self):
+    partition = AssetPartition(DF)
+    self.assertEqual(list(partition.for_asset(Asset.ETH)[ID]), [3, 4, 1])
+    self.assertEqual(list(partition.for_asset(Asset.BTC)[ID]), [2, 5, 4, 1])
+
+  def test_basis_only_for_asset_added(self):
+    partition = AssetPartition(DF, basis=True)
+    self.assertEqual(list(partition.for_asset(Asset.ETH)[ID]), [3, 4])
+    self.assertEqual(list(partition.for_asset(Asset.BTC)[ID]), [2, 1])
+
+  def test_missing_asset_is_empty(self):
+    partition = AssetPartition(DF)
+    df = partition.for_asset(Asset.LTC)
+    self.assertEqual(len(df), 0)
+    self.assertEqual(list(df.columns), list(DF.columns))
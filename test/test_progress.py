@@ -0,0 +1,80 @@
+import io
+from unittest import TestCase
+
+from calculator.progress import ProgressReporter
+
+
+class FakeClock:
+
+  def __init__(self):
+    self.now = 100.0
+
+  def __call__(self):
+    return self.now
+
+
+class TtyStream(io.StringIO):
+
+  def isatty(self):
+    return True
+
+
+class TestProgressReporter(TestCase):
+
+  def setUp(self) -> None:
+    self.clock = FakeClock()
+    self.calls = []
+    self.callback = lambda *args: self.calls.append(args)
+
+  def test_log(self):
+    stream = io.StringIO()
+    ProgressReporter(stream=stream).log("Starting to process BTC")
+    ProgressReporter(stream=stream, silent=True).log("Not written")
+
+    self.assertEqual(stream.getvalue(), "Starting to process BTC\n")
+
+  def test_silent_when_not_a_terminal(self):
+    stream = io.StringIO()
+    reporter = ProgressReporter(stream=stream, callback=self.callback,
+                                clock=self.clock)
+    reporter.start(2)
+    reporter.update()
+    reporter.update()
+    reporter.finish()
+
+    self.assertTrue(reporter.silent)
+    self.assertEqual(stream.getvalue(), "")
+    self.assertEqual(self.calls, [(1, 2, 0.0), (2, 2, 0.0)])
+
+  def test_throttled_by_interval(self):
+    reporter = ProgressReporter(interval=1, stream=io.StringIO(),
+                                callback=self.callback, clock=self.clock)
+    reporter.start(5)
+    for seconds in (0.1, 0.5, 1.2, 0.3):
+      self.clock.now += seconds
+      reporter.update()
+    self.clock.now += 0.1
+    reporter.update()
+    self.assertEqual([c[0] for c in self.calls], [1, 3, 5],
+                     "first, once interval passed and last should report")
+
+  def test_bar_with_throughput_and_eta(self):
+    stream = TtyStream()
+    reporter = ProgressReporter(interval=0, stream=stream, bar_len=4,
+                                clock=self.clock)
+    reporter.start(4)
+    self.clock.now += 2
+    reporter.update()
+    self.clock.now += 2
+    elapsed = reporter.finish()
+
+    self.assertFalse(reporter.silent)
+    self.assertEqual(elapsed, 4)
+    self.assertEqual(stream.getvalue(), "[*   ] 1/4 0.5/s ETA 6s\r\n")
+
+  def test_finish_without_updates_writes_nothing(self):
+    stream = TtyStream()
+    reporter = ProgressReporter(stream=stream, clock=self.clock)
+    reporter.start(0)
+    reporter.finish()
+    self.assertEqual(stream.getvalue(), "")
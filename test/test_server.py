@@ -0,0 +1,160 @@
+import json
+import threading
+from collections import deque
+from decimal import Decimal
+from unittest import TestCase
+from urllib.error import HTTPError
+from urllib.request import urlopen, Request
+
+from calculator.csv.read_csv import ReadCsv
+from calculator.format import ID, PAIR, SIDE, TIME, SIZE, SIZE_UNIT, PRICE, \
+  FEE, TOTAL, P_F_T_UNIT
+from calculator.server import CalculationServer
+from calculator.tax_calculator import Calculation
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Asset
+
+
+def get_fill(trade_id, side, time, size, price):
+  total = size * price if side == "SELL" else -size * price
+  return {
+    ID: trade_id, PAIR: "BTC-USD", SIDE: side, TIME: time, SIZE: str(size),
+    SIZE_UNIT: "BTC", PRICE: str(price), FEE: "0", TOTAL: str(total),
+    P_F_T_UNIT: "USD"
+  }
+
+
+class TestCalculationServer(TestCase):
+
+  def setUp(self):
+    basis_df = ReadCsv.from_records([get_fill(
+      1, "BUY", "2019-01-01T00:00:00.000000Z", Decimal(1), Decimal(100))])
+    calculation = Calculation({Asset.BTC: TradeProcessor(
+      Asset.BTC, deque(Fill.from_df(basis_df)))}, False)
+    self.server = CalculationServer(("127.0.0.1", 0), calculation)
+    self.thread = threading.Thread(target=self.server.serve_forever)
+    self.thread.start()
+    self.url = "http://127.0.0.1:{}/".format(self.server.server_address[1])
+
+  def tearDown(self):
+    self.server.shutdown()
+    self.server.server_close()
+    self.thread.join()
+
+  def get(self, path):
+    with urlopen(self.url + path) as response:
+      return json.loads(response.read())
+
+  def post(self, path, value):
+    request = Request(self.url + path, data=json.dumps(value).encode(),
+                      method="POST")
+    with urlopen(request) as response:
+      return json.loads(response.read())
+
+  def test_summary_and_basis(self):
+    self.assertEqual(self.get("summary"), [{
+      "asset": "BTC", "costs": "0", "proceeds": "0", "profit and loss": "0",
+      "remaining basis": "100.00"
+    }])
+    basis = self.get("basis/btc")
+    self.assertEqual(len(basis), 1)
+    self.assertEqual(basis[0][SIZE], "1.0000000000")
+    self.assertEqual(basis[0][TIME], "2019-01-01T00:00:00.000000Z")
+
+  def test_add_fills(self):
+    response = self.post("fills", [
+      get_fill(10, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.25"),
+               Decimal(120)),
+      get_fill(11, "SELL", "2020-01-02T00:00:00.000000Z", Decimal("0.25"),
+               Decimal(80))
+    ])
+    self.assertEqual(response, {"fills": 2, "assets": ["BTC"]})
+
+    summary = self.get("summary")[0]
+    self.assertEqual(summary["profit and loss"], "0.00")
+    self.assertEqual(summary["remaining basis"], "50.00")
+    entries = self.get("entries/BTC?start=1")
+    self.assertEqual(len(entries), 1)
+    self.assertEqual(entries[0]["proceeds id"], 11)
+    self.assertEqual(entries[0]["profit and loss"], "-5.00")
+
+  def test_fill_before_last_trade(self):
+    self.post("fills", [get_fill(
+      10, "SELL", "2020-01-02T00:00:00.000000Z", Decimal("0.25"),
+      Decimal(120))])
+    with self.assertRaises(HTTPError) as context:
+      self.post("fills", [get_fill(
+        11, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.25"),
+        Decimal(120))])
+    self.assertEqual(context.exception.code, 400)
+    self.assertEqual(len(self.get("entries/BTC")), 1)
+
+  def test_unknown_asset(self):
+    with self.assertRaises(HTTPError) as context:
+      self.get("entries/ETH")
+    self.assertEqual(context.exception.code, 404)
+
+  def test_sale_cost(self):
+    self.post("fills", [get_fill(
+      10, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.25"),
+      Decimal(120))])
+
+    self.assertEqual(self.get("sale/btc?size=0.5"), {
+      "asset": "BTC", "size": "0.5", "cost": "50.00"})
+    self.assertEqual(len(self.get("basis/BTC")), 1)
+    for size in ("1", "x"):
+      with self.assertRaises(HTTPError) as context:
+        self.get("sale/BTC?size=" + size)
+      self.assertEqual(context.exception.code, 400)
+
+  def test_oversell_leaves_calculation_unchanged(self):
+    summary = self.get("summary")
+    with self.assertRaises(HTTPError) as context:
+      self.post("fills", [
+        get_fill(10, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.5"),
+                 Decimal(120)),
+        get_fill(11, "SELL", "2020-01-02T00:00:00.000000Z", Decimal("0.75"),
+                 Decimal(120))
+      ])
+    self.assertEqual(context.exception.code, 400)
+
+    self.assertEqual(self.get("summary"), summary)
+    self.assertEqual(len(self.get("entries/BTC")), 0)
+    self.assertEqual(self.get("basis/BTC")[0][SIZE], "1.0000000000")
+    response = self.post("fills", [get_fill(
+      12, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.5"),
+      Decimal(120))])
+    self.assertEqual(response, {"fills": 1, "assets": ["BTC"]})
+    self.assertEqual(self.get("entries/BTC")[0]["id"], 0)
+
+  def test_fills_not_a_list(self):
+    with self.assertRaises(HTTPError) as context:
+      self.post("fills", {"trade id": 10})
+    self.assertEqual(context.exception.code, 400)
+
+  def test_fills_already_processed(self):
+    fill = get_fill(10, "SELL", "2020-01-01T00:00:00.000000Z", Decimal("0.25"),
+                    Decimal(120))
+    self.post("fills", [fill])
+    summary = self.get("summary")
+
+    for fills in ([fill], [get_fill(
+        1, "SELL", "2020-01-02T00:00:00.000000Z", Decimal("0.25"),
+        Decimal(120))]):
+      with self.assertRaises(HTTPError) as context:
+        self.post("fills", fills)
+      self.assertEqual(context.exception.code, 400)
+    self.assertEqual(self.get("summary"), summary)
+
+    other = dict(fill, **{ID: 11})
+    with self.assertRaises(HTTPError) as context:
+      self.post("fills", [other, other])
+    self.assertEqual(context.exception.code, 400)
+    self.assertEqual(len(self.get("entries/BTC")), 1)
+
+  def test_entries_bad_start(self):
+    for start in ("abc", "-1"):
+      with self.assertRaises(HTTPError) as context:
+        self.get("entries/BTC?start=" + start)
+      self.assertEqual(context.exception.code, 400)
@@ -0,0 +1,89 @@
+import gzip
+import os
+import pickle
+import tempfile
+from collections import deque
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.format import ADJUSTED_VALUE, WASH_P_L_IDS, ID
+from calculator.state_store import StateStore
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer
+
+
+class TestStateStore(TestCase):
+
+  def setUp(self) -> None:
+    time_incrementer.reset()
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = os.path.join(self.dir.name, "2019.state")
+
+  def tearDown(self) -> None:
+    self.dir.cleanup()
+
+  def test_continue_from_state(self):
+    buy = self.get_trade(Side.BUY, "8000")
+    sell = self.get_trade(Side.SELL, "7000")
+    processor = TradeProcessor(Asset.BTC, deque([buy]))
+    processor.handle_trade(self.get_trade(Side.BUY, "9000"))
+    StateStore(self.path).save({Asset.BTC: processor}, False, 7)
+
+    saved = StateStore(self.path).load()
+    self.assertEqual(saved.next_id, 7)
+    self.assertFalse(saved.track_wash)
+    loaded = TradeProcessor.from_state(Asset.BTC, saved.assets[Asset.BTC])
+    loaded.handle_trade(sell)
+
+    self.assertEqual(len(loaded.entries), 1)
+    self.assertEqual(loaded.entries[0].costs[ID], buy[ID])
+    self.assertEqual(len(loaded.basis_queue), 1)
+
+  def test_wash_checks_share_trades_with_basis(self):
+    buy = self.get_trade(Side.BUY, "8000", wash=True)
+    processor = TradeProcessor(Asset.BTC, deque([buy]), track_wash=True)
+    processor.handle_trade(self.get_trade(Side.SELL, "7000", wash=True))
+    processor.handle_trade(self.get_trade(Side.BUY, "6900", days=1,
+                                          wash=True))
+    processor.handle_trade(self.get_trade(Side.BUY, "7100", days=1,
+                                          wash=True))
+    StateStore(self.path).save({Asset.BTC: processor}, True, 1)
+
+    saved = StateStore(self.path).load()
+    loaded = TradeProcessor.from_state(
+      Asset.BTC, saved.assets[Asset.BTC], track_wash=True)
+
+    basis = loaded.basis_queue[0]
+    self.assertEqual(basis[ADJUSTED_VALUE], Decimal("8119"))
+    self.assertEqual(
+      basis[WASH_P_L_IDS], [processor.entries[0].profit_and_loss.id])
+    self.assertEqual(len(loaded.wash_after_loss_check), 0)
+    self.assertIs(list(loaded.wash_before_loss_check)[0], loaded.basis_queue[1])
+
+  def test_wash_fields_added_to_state_without_wash(self):
+    buy = self.get_trade(Side.BUY, "8000")
+    processor = TradeProcessor(Asset.BTC, deque([buy]))
+    StateStore(self.path).save({Asset.BTC: processor}, False, 0)
+
+    saved = StateStore(self.path).load()
+    loaded = TradeProcessor.from_state(
+      Asset.BTC, saved.assets[Asset.BTC], track_wash=True)
+
+    basis = loaded.basis_queue[0]
+    self.assertEqual(basis[ADJUSTED_VALUE], Decimal("8080"))
+    self.assertEqual(basis[WASH_P_L_IDS], [])
+    self.assertEqual(
+      [t[ID] for t in loaded.wash_before_loss_check], [buy[ID]])
+
+  def test_unsupported_version(self):
+    with gzip.open(self.path, "wb") as f:
+      pickle.dump({"version": -1}, f)
+    with self.assertRaises(ValueError):
+      StateStore(self.path).load()
+
+  @staticmethod
+  def get_trade(side, price, days=3, wash=False):
+    return get_trade_for_pair(
+      Pair.BTC_USD, side, time_incrementer.increment_and_get_time(days),
+      Decimal(1), Decimal(price), Decimal(price) / 100, wash)
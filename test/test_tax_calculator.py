@@ -1,11 +1,26 @@
-from unittest import TestCase
+import io
+import os
+import tempfile
+from decimal import Decimal
+from unittest import TestCase, mock
 
+import pandas as pd
 from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 
 from calculator import tax_calculator
-from calculator.format import ID, PAIR, SIZE_UNIT, P_F_T_UNIT
-from calculator.trade_types import Pair, Asset
-from test.test_helpers import id_incrementer
+from calculator.auto_id_incrementer import AutoIdIncrementer
+from calculator.format import ID, PAIR, SIZE_UNIT, P_F_T_UNIT, WASH_P_L_IDS, \
+  SIZE
+from calculator.progress import ProgressReporter
+from calculator.state_store import StateStore
+from calculator.trade_processor.lots import LotMethod
+from calculator.trade_types import Pair, Asset, Side
+from test.test_helpers import id_incrementer, get_trade_for_pair, \
+  time_incrementer
+
+RAISE_IF_CALLED = lambda *x, **y: exec(
+  "raise(AssertionError('Method should not be called'))")
 
 
 class TestTaxCalculator(TestCase):
@@ -78,3 +93,255 @@ class TestTaxCalculator(TestCase):
       trade_dict[P_F_T_UNIT].append(pair.get_quote_asset())
 
     return DataFrame(trade_dict)
+
+
+class TestCalculateInProcesses(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+
+  def test_ids_match_serial_processing(self):
+    asset_dfs = [
+      self.get_asset_dfs(Asset.BTC, Pair.BTC_USD, 2),
+      self.get_asset_dfs(Asset.ETH, Pair.ETH_USD, 3),
+      self.get_asset_dfs(Asset.LTC, Pair.LTC_USD, 1)
+    ]
+    id_incrementer = AutoIdIncrementer(10)
+
+    processors = tax_calculator.calculate_in_processes(
+      asset_dfs, track_wash=True, workers=2, id_incrementer=id_incrementer)
+
+    ids = [[e.profit_and_loss.id for e in p.entries] for p in processors]
+    self.assertEqual(ids, [[10, 11], [12, 13, 14], [15]])
+    wash_ids = [p.entries[-1].costs[WASH_P_L_IDS] for p in processors]
+    self.assertEqual(wash_ids, [[10], [13], []])
+    self.assertEqual(id_incrementer.id, 16)
+    for processor in processors:
+      self.assertIs(processor.id_incrementer, id_incrementer)
+
+  def test_ids_match_serial_processing_in_one_pass(self):
+    asset_dfs = [
+      self.get_asset_dfs(Asset.BTC, Pair.BTC_USD, 2),
+      self.get_asset_dfs(Asset.ETH, Pair.ETH_USD, 3),
+      self.get_asset_dfs(Asset.LTC, Pair.LTC_USD, 1)
+    ]
+    trades_df = pd.concat([df for _, _, df, _ in asset_dfs])
+    id_incrementer = AutoIdIncrementer(10)
+
+    processors = tax_calculator.calculate_in_one_pass(
+      asset_dfs, trades_df, track_wash=True,
+      progress=ProgressReporter(silent=True), id_incrementer=id_incrementer)
+
+    ids = [[e.profit_and_loss.id for e in p.entries] for p in processors]
+    self.assertEqual(ids, [[10, 11], [12, 13, 14], [15]])
+    wash_ids = [p.entries[-1].costs[WASH_P_L_IDS] for p in processors]
+    self.assertEqual(wash_ids, [[10], [13], []])
+    self.assertEqual(id_incrementer.id, 16)
+
+  @staticmethod
+  def get_asset_dfs(asset, pair, sells):
+    """
+    A buy at 100 followed by sells at 90 and buys at 100, each buy after the
+    first washes the loss of the sell before it.
+    """
+    basis = [get_trade_for_pair(
+      pair, Side.BUY, time_incrementer.get_time_and_increment(), Decimal(1),
+      Decimal(100), Decimal(0))]
+    trades = []
+    for i in range(sells):
+      trades.append(get_trade_for_pair(
+        pair, Side.SELL, time_incrementer.get_time_and_increment(),
+        Decimal(1), Decimal(90), Decimal(0)))
+      if i < sells - 1:
+        trades.append(get_trade_for_pair(
+          pair, Side.BUY, time_incrementer.get_time_and_increment(),
+          Decimal(1), Decimal(100), Decimal(0)))
+    return asset, DataFrame([t.to_dict() for t in basis]), \
+      DataFrame([t.to_dict() for t in trades]), None
+
+
+class TestCalculate(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+
+  @mock.patch.object(DataFrame, "to_csv", new=RAISE_IF_CALLED)
+  def test_calculate_in_memory(self):
+    basis = [get_trade_for_pair(
+      Pair.BTC_USD, Side.BUY, time_incrementer.get_time_and_increment(),
+      Decimal(1), Decimal(100), Decimal(0)).to_dict()]
+    trades = [
+      get_trade_for_pair(
+        Pair.BTC_USD, Side.SELL, time_incrementer.get_time_and_increment(),
+        Decimal("0.5"), Decimal(120), Decimal(0)),
+      get_trade_for_pair(
+        Pair.ETH_USD, Side.BUY, time_incrementer.get_time_and_increment(),
+        Decimal(2), Decimal(10), Decimal(0))
+    ]
+    trades = DataFrame([t.to_dict() for t in trades])
+
+    with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+      calculation = tax_calculator.calculate(iter(basis), trades)
+
+    self.assertEqual(stdout.getvalue(), "")
+    self.assertEqual(calculation.assets, [Asset.BTC, Asset.ETH])
+    entries = calculation.entries(Asset.BTC)
+    self.assertEqual(len(entries), 1)
+    self.assertEqual(entries[0].profit_and_loss.profit_and_loss, Decimal(10))
+    self.assertEqual(len(calculation.entries(Asset.ETH)), 0)
+    self.assertEqual(calculation.basis(Asset.BTC)[0][SIZE], Decimal("0.5"))
+    self.assertEqual(calculation.basis(Asset.ETH)[0][SIZE], Decimal(2))
+    assert_frame_equal(calculation.summary(), DataFrame({
+      "asset": [Asset.BTC, Asset.ETH],
+      "costs": [Decimal(50), Decimal(0)],
+      "proceeds": [Decimal(60), Decimal(0)],
+      "profit and loss": [Decimal(10), Decimal(0)],
+      "remaining basis": [Decimal(50), Decimal(20)]
+    }))
+
+  @mock.patch.object(DataFrame, "to_csv", new=RAISE_IF_CALLED)
+  def test_calculate_highest_cost_first(self):
+    basis = [
+      get_trade_for_pair(
+        Pair.BTC_USD, Side.BUY, time_incrementer.get_time_and_increment(),
+        Decimal(1), Decimal(price), Decimal(0)).to_dict()
+      for price in (100, 300, 200)
+    ]
+    trades = [get_trade_for_pair(
+      Pair.BTC_USD, Side.SELL, time_incrementer.get_time_and_increment(),
+      Decimal("1.5"), Decimal(250), Decimal(0)).to_dict()]
+
+    calculation = tax_calculator.calculate(
+      basis, trades, workers=2, progress=ProgressReporter(silent=True),
+      method=LotMethod.HIFO)
+
+    entries = calculation.entries(Asset.BTC)
+    self.assertEqual(
+      [e.profit_and_loss.basis for e in entries], [Decimal(300), Decimal(100)])
+    self.assertEqual(
+      [t[SIZE] for t in calculation.basis(Asset.BTC)],
+      [Decimal(1), Decimal("0.5")])
+
+  def test_calculate_without_trades(self):
+    buy = [get_trade_for_pair(
+      Pair.BTC_USD, Side.BUY, time_incrementer.get_time_and_increment(),
+      Decimal(1), Decimal(100), Decimal(0)).to_dict()]
+
+    calculation = tax_calculator.calculate([], [])
+    self.assertEqual(calculation.assets, [])
+    self.assertEqual(len(calculation.summary()), 0)
+
+    for basis, trades in ((buy, []), ([], buy)):
+      calculation = tax_calculator.calculate(basis, trades)
+      self.assertEqual(calculation.assets, [Asset.BTC])
+      self.assertEqual(len(calculation.entries(Asset.BTC)), 0)
+      self.assertEqual(
+        calculation.summary()["remaining basis"].tolist(), [Decimal(100)])
+
+  def test_calculate_unused_options(self):
+    lot_ids = {(Pair.BTC_USD, 2): [(Pair.BTC_USD, 1)]}
+    with self.assertRaises(ValueError):
+      tax_calculator.calculate([], [], lot_ids=lot_ids)
+    with self.assertRaises(ValueError):
+      tax_calculator.calculate(
+        [], [], method=LotMethod.LIFO, lot_ids=lot_ids)
+    with self.assertRaises(ValueError):
+      tax_calculator.calculate_processors(
+        None, DataFrame(), False, 2, ProgressReporter(silent=True), {},
+        AutoIdIncrementer(), single_pass=True)
+
+
+class TestCompareMethods(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = self.dir.name + "/"
+    header = "trade id,product,side,created at,size,size unit,price,fee," \
+             "total,price/fee/total unit\n"
+    with open(self.path + "basis.csv", "w") as f:
+      f.write(header + "".join(
+        "{},BTC-USD,BUY,2019-01-0{}T00:00:00.000Z,1,BTC,{},0,-{},USD\n".format(
+          i, i, price, price)
+        for i, price in enumerate((100, 300, 200), 1)))
+    with open(self.path + "fills.csv", "w") as f:
+      f.write(header + "4,BTC-USD,SELL,2019-02-01T00:00:00.000Z,1.5,BTC,250,"
+                       "0,375,USD\n")
+
+  def tearDown(self):
+    self.dir.cleanup()
+
+  def test_compare_methods(self):
+    methods = [LotMethod.FIFO, LotMethod.LIFO, LotMethod.HIFO]
+
+    comparison = tax_calculator.compare_methods(
+      self.path, "basis.csv", "fills.csv", False, methods,
+      progress=ProgressReporter(silent=True))
+
+    self.assertEqual(list(comparison.columns), [
+      "asset", "proceeds",
+      "fifo costs", "fifo profit and loss", "fifo remaining basis",
+      "lifo costs", "lifo profit and loss", "lifo remaining basis",
+      "hifo costs", "hifo profit and loss", "hifo remaining basis"
+    ])
+    row = comparison.iloc[0]
+    self.assertEqual(row["asset"], Asset.BTC)
+    self.assertEqual(row["proceeds"], Decimal(375))
+    self.assertEqual(
+      [row["{} profit and loss".format(m)] for m in methods],
+      [Decimal(125), Decimal(25), Decimal(-25)])
+    self.assertEqual(
+      [row["{} remaining basis".format(m)] for m in methods],
+      [Decimal(350), Decimal(250), Decimal(200)])
+    self.assertTrue(os.path.isfile(self.path + "output/comparison.csv"))
+    self.assertFalse(os.path.isfile(self.path + "output/summary.csv"))
+
+    in_processes = tax_calculator.compare_methods(
+      self.path, "basis.csv", "fills.csv", False, methods, workers=2,
+      progress=ProgressReporter(silent=True))
+
+    assert_frame_equal(in_processes, comparison)
+
+  def test_compare_methods_lot_ids(self):
+    lot_ids = {(Pair.BTC_USD, 4): [(Pair.BTC_USD, 2), (Pair.BTC_USD, 1)]}
+
+    with self.assertRaises(ValueError):
+      tax_calculator.compare_methods(
+        self.path, "basis.csv", "fills.csv", False, [LotMethod.FIFO],
+        progress=ProgressReporter(silent=True), lot_ids=lot_ids)
+    comparison = tax_calculator.compare_methods(
+      self.path, "basis.csv", "fills.csv", False,
+      [LotMethod.FIFO, LotMethod.SPECIFIC_ID],
+      progress=ProgressReporter(silent=True), lot_ids=lot_ids)
+
+    self.assertEqual(
+      comparison.iloc[0][["fifo profit and loss",
+                          "specific-id profit and loss"]].tolist(),
+      [Decimal(125), Decimal(25)])
+
+
+class TestReadInputs(TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.TemporaryDirectory()
+    self.path = self.dir.name + "/"
+    StateStore(self.path + "2019.state").save({}, False, 3)
+
+  def tearDown(self):
+    self.dir.cleanup()
+
+  @mock.patch.object(tax_calculator.ReadCsv, "read")
+  def test_load_state(self, read: mock.MagicMock):
+    basis_df, trades_df, states, next_id = tax_calculator.read_inputs(
+      self.path, "2019.state", "fills.csv", False,
+      ProgressReporter(silent=True), load_state=True)
+
+    self.assertIsNone(basis_df)
+    self.assertIs(trades_df, read.return_value)
+    self.assertEqual((states, next_id), ({}, 3))
+
+  @mock.patch.object(tax_calculator.ReadCsv, "read", new=RAISE_IF_CALLED)
+  def test_load_state_saved_with_other_wash_tracking(self):
+    with self.assertRaises(ValueError):
+      tax_calculator.read_inputs(
+        self.path, "2019.state", "fills.csv", True,
+        ProgressReporter(silent=True), load_state=True)
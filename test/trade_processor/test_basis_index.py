@@ -0,0 +1,98 @@
+from collections import deque
+from copy import deepcopy
+from decimal import Decimal
+from unittest import TestCase, mock
+
+from calculator.trade_processor.basis_index import BasisIndex
+from calculator.trade_processor.lots import LifoLots
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer, \
+  exchange
+
+
+class TestBasisIndex(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    exchange.set_btc_per_usd("5000")
+    self.processor = TradeProcessor(Asset.BTC, deque([
+      self.trade(Pair.BTC_USD, Side.BUY, "1", "4000"),
+      self.trade(Pair.BTC_USD, Side.BUY, "0.5", "6000"),
+      # LTC-BTC sell is BTC basis of 0.1 BTC
+      self.trade(Pair.LTC_BTC, Side.SELL, "10", "0.01"),
+      self.trade(Pair.BTC_USD, Side.BUY, "2", "5100"),
+    ]))
+
+  def test_cost_matches_sale(self):
+    sizes = ["0.3", "1", "1.2", "1.5", "1.55", "1.6", "3", "3.6"]
+    for size in sizes:
+      self.assertEqual(
+        self.processor.sale_cost(Decimal(size)), self.sold_cost(size), size)
+
+  def test_cost_follows_sales_and_buys(self):
+    self.processor.sale_cost(Decimal(1))
+    self.processor.handle_trades([
+      self.trade(Pair.BTC_USD, Side.SELL, "0.7", "7000"),
+      self.trade(Pair.BTC_USD, Side.BUY, "0.4", "3000"),
+      self.trade(Pair.BTC_USD, Side.SELL, "0.45", "7000"),
+    ])
+    self.processor.sale_cost(Decimal(1))
+    self.processor.handle_trades([
+      self.trade(Pair.BTC_USD, Side.BUY, "1", "6500"),
+    ])
+
+    for size in ["0.05", "0.1", "0.2", "2.4", "3.4", "3.45"]:
+      self.assertEqual(
+        self.processor.sale_cost(Decimal(size)), self.sold_cost(size), size)
+
+  def test_sale_does_not_change_basis(self):
+    basis = [(lot.id, lot.size) for lot in self.processor.basis_queue]
+
+    self.processor.sale_cost(Decimal("2"))
+
+    self.assertEqual(
+      [(lot.id, lot.size) for lot in self.processor.basis_queue], basis)
+    self.assertEqual(len(self.processor.entries), 0)
+
+  def test_sale_more_than_basis(self):
+    with self.assertRaises(ValueError):
+      self.processor.sale_cost(Decimal("3.61"))
+    self.processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.SELL, "3.6", "7000"))
+    self.assertEqual(self.processor.sale_cost(Decimal(0)), Decimal(0))
+    with self.assertRaises(ValueError):
+      self.processor.sale_cost(Decimal("0.1"))
+
+  def test_only_first_in_first_out(self):
+    processor = TradeProcessor(Asset.BTC, LifoLots())
+
+    with self.assertRaises(ValueError):
+      processor.sale_cost(Decimal(1))
+
+  @mock.patch("calculator.trade_processor.basis_index.COMPACT_AFTER", 2)
+  def test_compacts_sold_lots(self):
+    self.processor.sale_cost(Decimal(1))
+    self.processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.SELL, "1.6", "7000"))
+
+    self.assertEqual(
+      self.processor.sale_cost(Decimal(1)), self.sold_cost("1"))
+    index: BasisIndex = self.processor.basis_index
+    self.assertEqual(index.head, 0)
+    self.assertEqual(index.lots, list(self.processor.basis_queue))
+    self.assertEqual(index.sizes, [Decimal(0), Decimal(2)])
+
+  def sold_cost(self, size: str) -> Decimal:
+    processor = deepcopy(self.processor)
+    count = len(processor.entries)
+    processor.handle_trade(self.trade(Pair.BTC_USD, Side.SELL, size, "7000"))
+    return sum(
+      (e.costs.value_in_usd for e in list(processor.entries)[count:]),
+      Decimal(0))
+
+  @staticmethod
+  def trade(pair, side, size, price):
+    return get_trade_for_pair(
+      pair, side, time_incrementer.get_time_and_increment(), Decimal(size),
+      Decimal(price), Decimal(0))
@@ -0,0 +1,167 @@
+import pickle
+from collections import deque
+from decimal import Decimal
+from unittest import TestCase
+
+from pandas.testing import assert_frame_equal
+
+from calculator.trade_processor.entry_store import EntryStore, Decimals
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.profit_and_loss import Entry, ProfitAndLoss
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer, \
+  exchange
+
+
+class TestEntryStore(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    exchange.set_btc_per_usd("5000")
+
+  def test_entries_read_back_the_same(self):
+    processor = self.processor(
+      False, (Pair.BTC_USD, Side.BUY, "2", "4000"),
+      (Pair.ETH_BTC, Side.SELL, "10", "0.03"))
+    processor.handle_trades([
+      self.trade(Pair.BTC_USD, Side.SELL, "0.7", "4100"),
+      self.trade(Pair.BTC_USD, Side.SELL, "1.6", "3900")
+    ])
+    entries = processor.entries
+
+    self.assertEqual(len(entries.pending), 0)
+    self.assertEqual(len(entries), 3)
+    self.assertEqual(len(entries.trades), 4)
+    for entry in entries:
+      self.assert_entry_equal(entry, self.same_entry(entry))
+    self.assert_entry_equal(entries[-1], list(entries)[2])
+
+  def test_settled_when_wash_checks_can_not_change(self):
+    processor = self.processor(True, (Pair.BTC_USD, Side.BUY, "1", "5000"))
+    processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.SELL, "1", "4000", 29, True))
+    entries = processor.entries
+
+    self.assertEqual(len(entries.pending), 1)
+    self.assertEqual(len(processor.entries_by_basis_id), 1)
+    # the loss is washed by a buy less than 30 days after it
+    processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.BUY, "1", "4000", 1, True))
+    self.assertEqual(len(entries.pending), 1)
+    pending = entries.pending[0]
+    processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.BUY, "1", "4000", wash=True))
+
+    self.assertEqual(len(entries.pending), 0)
+    self.assertEqual(len(processor.entries_by_basis_id), 0)
+    self.assert_entry_equal(entries[0], pending)
+    self.assertEqual(
+      entries[0].profit_and_loss.taxed_profit_and_loss, Decimal(0))
+
+  def test_frames_same_as_of_entries(self):
+    processor = self.processor(
+      True, (Pair.BTC_USD, Side.BUY, "1", "5000"),
+      (Pair.BTC_USD, Side.BUY, "1", "5500"))
+    processor.handle_trades([
+      self.trade(Pair.BTC_USD, Side.SELL, "1.5", "4000", wash=True),
+      self.trade(Pair.BTC_USD, Side.BUY, "0.5", "4200", 40, True),
+      self.trade(Pair.BTC_USD, Side.SELL, "0.5", "4500", wash=True)
+    ])
+    entries = processor.entries
+    self.assertEqual(len(entries.pending), 1)
+
+    for washed in (True, False):
+      for part in ("costs", "proceeds"):
+        assert_frame_equal(
+          entries.fills_df(part, washed),
+          Fill.to_df((getattr(e, part) for e in entries), washed))
+      assert_frame_equal(
+        entries.profit_and_loss_df(washed),
+        ProfitAndLoss.to_df((e.profit_and_loss for e in entries), washed))
+
+  def test_decimals_kept_exactly(self):
+    values = [
+      Decimal("1.50"), Decimal("1.5"), Decimal("-0.00"), Decimal("NaN"),
+      Decimal("1E+5"), Decimal(2 ** 70), Decimal("-0.0000000001")]
+    column = Decimals()
+    for row, value in enumerate(values):
+      column.put(row * 2, value)
+
+    read = column.values(len(values) * 2 + 1)
+
+    self.assertEqual(read[1::2], [None] * len(values))
+    self.assertIsNone(read[-1])
+    for value, other in zip(values, read[::2]):
+      self.assertEqual(str(value), str(other))
+    self.assertEqual(str(column.get(2)), "1.5")
+    self.assertIsNone(column.get(100))
+
+  def test_take_and_pickle(self):
+    processor = self.processor(
+      False, (Pair.BTC_USD, Side.BUY, "1", "4000"),
+      (Pair.BTC_USD, Side.BUY, "1", "4500"))
+    processor.handle_trades([
+      self.trade(Pair.BTC_USD, Side.SELL, "0.5", "5000"),
+      self.trade(Pair.BTC_USD, Side.SELL, "1", "5000")
+    ])
+    entries = processor.entries
+    expected = list(entries)
+
+    taken = entries.take(2)
+    loaded = pickle.loads(pickle.dumps(entries))
+    loaded.offset_ids(10)
+
+    self.assertEqual([e.costs.id for e in taken],
+                     [e.costs.id for e in expected[:2]])
+    self.assertEqual(len(entries), 1)
+    self.assertEqual(len(entries.trades), 2)
+    self.assert_entry_equal(entries[0], expected[2])
+    self.assertEqual(loaded[0].profit_and_loss.id,
+                     expected[2].profit_and_loss.id + 10)
+    self.assertEqual(
+      loaded.trade_row(loaded[0].costs), entries.trade_row(entries[0].costs))
+
+  def test_pending_entries_of_state(self):
+    processor = self.processor(True, (Pair.BTC_USD, Side.BUY, "1", "4000"))
+    processor.handle_trade(
+      self.trade(Pair.BTC_USD, Side.SELL, "1", "5000", wash=True))
+
+    loaded = TradeProcessor.from_state(
+      Asset.BTC, {"basis_queue": deque(),
+                  "entries": deque(processor.entries)}, track_wash=True)
+
+    self.assertIsInstance(loaded.entries, EntryStore)
+    self.assertIs(loaded.entries[0], processor.entries[0])
+
+  def processor(self, track_wash, *lots) -> TradeProcessor:
+    """
+    :param lots: pair, side, size and price of each basis lot of BTC
+    """
+    basis = deque(
+      self.trade(pair, side, size, price, wash=track_wash)
+      for pair, side, size, price in lots)
+    return TradeProcessor(Asset.BTC, basis, track_wash=track_wash)
+
+  @staticmethod
+  def trade(pair, side, size, price, days=3, wash=False) -> Fill:
+    return get_trade_for_pair(
+      pair, side, time_incrementer.get_time_and_increment(days),
+      Decimal(size), Decimal(price), Decimal(0), wash)
+
+  @staticmethod
+  def same_entry(entry: Entry) -> Entry:
+    """
+    An entry with the values of entry made again from its fills.
+    """
+    return Entry(Asset.BTC, entry.costs, entry.proceeds)
+
+  def assert_entry_equal(self, entry: Entry, other: Entry):
+    for part in ("costs", "proceeds"):
+      self.assertEqual(
+        repr(getattr(entry, part)), repr(getattr(other, part)))
+    self.assertEqual(
+      {f: repr(getattr(entry.profit_and_loss, f))
+       for f in ProfitAndLoss.__slots__ if f != "id"},
+      {f: repr(getattr(other.profit_and_loss, f))
+       for f in ProfitAndLoss.__slots__ if f != "id"})
@@ -0,0 +1,126 @@
+import pickle
+from decimal import Decimal
+from unittest import TestCase
+
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
+
+from calculator.format import ID, SIZE, ADJUSTED_VALUE, WASH_P_L_IDS, \
+  VALUE_IN_USD
+from calculator.trade_processor.fill import Fill
+from calculator.trade_processor.time_window import epoch_micros
+from calculator.trade_types import Pair, Side
+from test.test_helpers import get_trade_for_pair, time_incrementer, \
+  assert_fill_equal
+
+
+class TestFill(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    self.trade = get_trade_for_pair(
+      Pair.BTC_USD, Side.BUY, time_incrementer.get_time_and_increment(),
+      Decimal("0.5"), Decimal(100), Decimal(1))
+
+  def test_from_df_round_trip(self):
+    df = DataFrame([self.trade.to_dict()])
+
+    fills = Fill.from_df(df)
+
+    self.assertEqual(len(fills), 1)
+    assert_fill_equal(fills[0], self.trade, check_exact=True)
+    self.assertEqual(list(fills[0].to_dict().keys()), list(df.columns))
+
+  def test_from_df_with_wash(self):
+    df = DataFrame([self.trade.to_dict(), self.trade.to_dict()])
+
+    one, two = Fill.from_df(df, wash=True)
+
+    self.assertEqual(one.adjusted_value, one.value_in_usd)
+    self.assertEqual(one.adjusted_size, Decimal(0))
+    self.assertIsNot(one.wash_p_l_ids, two.wash_p_l_ids)
+    self.assertIn(WASH_P_L_IDS, one.to_dict())
+
+  def test_to_df_same_as_rows(self):
+    other = self.trade.copy()
+    other.size = Decimal("0.25")
+    assert_frame_equal(
+      Fill.to_df([self.trade, other]),
+      DataFrame([self.trade.to_dict(), other.to_dict()]), check_exact=True)
+    self.trade.track_wash()
+    other.track_wash()
+    other.wash_p_l_ids.append(3)
+
+    assert_frame_equal(
+      Fill.to_df([self.trade, other]),
+      DataFrame([self.trade.to_dict(), other.to_dict()]), check_exact=True)
+    assert_frame_equal(
+      Fill.to_df([self.trade, other], washed=False),
+      DataFrame([self.trade.to_dict(False), other.to_dict(False)]),
+      check_exact=True)
+    self.assertTrue(Fill.to_df([]).empty)
+
+  def test_micros_of_time(self):
+    df = DataFrame([self.trade.to_dict()])
+
+    fill, = Fill.from_df(df)
+
+    self.assertEqual(self.trade.micros, epoch_micros(self.trade.time))
+    self.assertEqual(fill.micros, self.trade.micros)
+    self.assertEqual(self.trade.split(Decimal(1), Decimal(2)).micros,
+                     self.trade.micros)
+
+  def test_pickle_keeps_micros(self):
+    loaded = pickle.loads(pickle.dumps(self.trade))
+
+    self.assertEqual(loaded.micros, self.trade.micros)
+    assert_fill_equal(loaded, self.trade, check_exact=True)
+
+  def test_wash_columns_only_when_tracked(self):
+    self.assertNotIn(ADJUSTED_VALUE, self.trade)
+    self.assertNotIn(ADJUSTED_VALUE, self.trade.to_dict())
+    self.trade.track_wash()
+    self.assertIn(ADJUSTED_VALUE, self.trade)
+
+  def test_indexed_by_column(self):
+    self.assertEqual(self.trade[ID], self.trade.id)
+    self.trade[SIZE] = Decimal("0.25")
+    self.assertEqual(self.trade.size, Decimal("0.25"))
+    with self.assertRaises(KeyError):
+      self.trade["unknown"]
+
+  def test_copy_shares_wash_ids(self):
+    self.trade.track_wash()
+
+    copy = self.trade.copy()
+    copy.size = Decimal(0)
+    copy.wash_p_l_ids.append(1)
+
+    self.assertEqual(self.trade.size, Decimal("0.5"))
+    self.assertEqual(self.trade.wash_p_l_ids, [1])
+
+  def test_pickle_keeps_shared_wash_ids(self):
+    self.trade.track_wash()
+    copy = self.trade.copy()
+
+    trade, copy = pickle.loads(pickle.dumps((self.trade, copy)))
+
+    self.assertIs(trade.wash_p_l_ids, copy.wash_p_l_ids)
+    self.assertEqual(trade[VALUE_IN_USD], self.trade.value_in_usd)
+
+  def test_split_keeps_remainder_in_place(self):
+    self.trade.track_wash()
+
+    portion = self.trade.split(Decimal("0.2"), Decimal("0.5"))
+
+    # total -(0.5 * 100 + 1) = -51, value 51
+    self.assertEqual(portion.size, Decimal("0.2"))
+    self.assertEqual(portion.total, Decimal("-20.4"))
+    self.assertEqual(portion.fee, Decimal("0.4"))
+    self.assertEqual(portion.value_in_usd, Decimal("20.40"))
+    self.assertEqual(portion.adjusted_value, Decimal("20.40"))
+    self.assertEqual(self.trade.size, Decimal("0.3"))
+    self.assertEqual(self.trade.total, Decimal("-30.6"))
+    self.assertEqual(self.trade.value_in_usd, Decimal("30.60"))
+    self.assertEqual(portion.id, self.trade.id)
+    self.assertIs(portion.wash_p_l_ids, self.trade.wash_p_l_ids)
@@ -0,0 +1,160 @@
+import pickle
+from collections import deque
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.trade_processor.lots import LifoLots, HifoLots, \
+  SpecificIdLots, LotMethod, Lots, to_lots
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer, \
+  exchange
+
+
+class TestLots(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    exchange.set_btc_per_usd("5000")
+    self.cheap = self.trade(Pair.BTC_USD, Side.BUY, "1", "4000")
+    self.dear = self.trade(Pair.BTC_USD, Side.BUY, "1", "6000")
+    self.middle = self.trade(Pair.BTC_USD, Side.BUY, "1", "5000")
+
+  def test_lifo_sells_last_added_first(self):
+    lots = LifoLots([self.cheap, self.dear])
+    lots.append(self.middle)
+
+    self.assertIs(lots[0], self.middle)
+    self.assertIs(lots.popleft(), self.middle)
+    self.assertIs(lots.popleft(), self.dear)
+    self.assertEqual(list(lots), [self.cheap])
+
+  def test_hifo_sells_highest_cost_first(self):
+    # LTC-BTC sell is BTC basis of 0.1 BTC for 5500 * 0.1 USD
+    ltc_btc = self.trade(Pair.LTC_BTC, Side.SELL, "10", "0.01",
+                         usd_per_btc="5500")
+    lots = HifoLots(Asset.BTC, [self.cheap, self.dear, ltc_btc])
+    lots.append(self.middle)
+
+    self.assertEqual(
+      [lots.popleft() for _ in range(len(lots))],
+      [self.dear, ltc_btc, self.middle, self.cheap])
+
+  def test_hifo_same_cost_sold_in_order_added(self):
+    same = self.trade(Pair.BTC_USD, Side.BUY, "2", "6000")
+    lots = HifoLots(Asset.BTC, [self.dear, same])
+
+    self.assertIs(lots.popleft(), self.dear)
+    self.assertIs(lots[-1], same)
+
+  def test_specific_id_sells_selected_then_first_in(self):
+    sale = self.trade(Pair.BTC_USD, Side.SELL, "2.5", "5000")
+    lots = SpecificIdLots(
+      [self.cheap, self.dear, self.middle],
+      {self.key(sale): [self.key(self.middle), self.key(self.dear)]})
+
+    lots.select(sale)
+
+    self.assertIs(lots.popleft(), self.middle)
+    self.assertIs(lots.popleft(), self.dear)
+    self.assertIs(lots[0], self.cheap)
+    self.assertEqual(list(lots), [self.cheap])
+
+  def test_specific_id_unselected_sale_first_in(self):
+    sale = self.trade(Pair.BTC_USD, Side.SELL, "1", "5000")
+    lots = SpecificIdLots(
+      [self.cheap, self.dear], {(Pair.BTC_USD, -1): [self.key(self.dear)]})
+
+    lots.select(sale)
+
+    self.assertIs(lots.popleft(), self.cheap)
+    self.assertIs(lots.popleft(), self.dear)
+    with self.assertRaises(IndexError):
+      lots.popleft()
+
+  def test_processor_splits_lot_in_place(self):
+    sale = self.trade(Pair.BTC_USD, Side.SELL, "1.5", "7000")
+    small_sale = self.trade(Pair.BTC_USD, Side.SELL, "0.25", "7000")
+    lots = HifoLots(Asset.BTC, [self.cheap, self.dear, self.middle])
+    processor = TradeProcessor(Asset.BTC, lots)
+
+    processor.handle_trades([sale, small_sale])
+
+    costs = [e.costs for e in processor.entries]
+    self.assertEqual(costs[0].id, self.dear.id)
+    self.assertEqual(costs[0].size, self.dear.size)
+    self.assertEqual(costs[1].id, self.middle.id)
+    self.assertEqual(costs[1].size, Decimal("0.5"))
+    self.assertEqual(costs[2].size, Decimal("0.25"))
+    self.assertEqual(self.middle.size, Decimal("0.25"))
+    self.assertEqual(list(lots), [self.cheap, self.middle])
+
+  def test_processor_selects_lots_for_each_sale(self):
+    sale = self.trade(Pair.BTC_USD, Side.SELL, "1.5", "7000")
+    lots = SpecificIdLots(
+      [self.cheap, self.dear, self.middle],
+      {self.key(sale): [self.key(self.middle)]})
+    processor = TradeProcessor(Asset.BTC, lots)
+
+    processor.handle_trade(sale)
+
+    self.assertEqual(
+      [e.costs.id for e in processor.entries], [self.middle.id, self.cheap.id])
+    self.assertEqual(list(lots), [self.cheap, self.dear])
+    self.assertEqual(self.cheap.size, Decimal("0.5"))
+
+  def test_to_lots(self):
+    lifo = LifoLots([self.cheap])
+
+    self.assertIs(to_lots(LotMethod.LIFO, Asset.BTC, lifo), lifo)
+    fifo = to_lots(LotMethod.FIFO, Asset.BTC, lifo)
+    self.assertIsInstance(fifo, deque)
+    self.assertEqual(list(fifo), [self.cheap])
+    self.assertIsInstance(
+      to_lots(LotMethod.HIFO, Asset.BTC, fifo), HifoLots)
+    self.assertEqual(
+      to_lots(LotMethod.SPECIFIC_ID, Asset.BTC, fifo,
+              {(Pair.BTC_USD, 1): [(Pair.BTC_USD, 2)]}).selections,
+      {(Pair.BTC_USD, 1): [(Pair.BTC_USD, 2)]})
+
+  def test_pickle_keeps_shared_lots(self):
+    lots = HifoLots(Asset.BTC, [self.cheap, self.dear])
+
+    loaded_lots, loaded = pickle.loads(pickle.dumps((list(lots), lots)))
+
+    self.assertIs(loaded[0], loaded_lots[1])
+    loaded.append(self.middle)
+    self.assertEqual(loaded.popleft().id, self.dear.id)
+    self.assertIs(loaded.popleft(), self.middle)
+
+  def test_specific_id_same_id_other_product(self):
+    # LTC-BTC sell is BTC basis with the same trade id as the cheap lot
+    ltc_btc = self.trade(Pair.LTC_BTC, Side.SELL, "10", "0.01")
+    ltc_btc.id = self.cheap.id
+    sale = self.trade(Pair.BTC_USD, Side.SELL, "1", "5000")
+    lots = SpecificIdLots(
+      [self.cheap, self.dear, ltc_btc], {self.key(sale): [self.key(ltc_btc)]})
+
+    lots.select(sale)
+
+    self.assertIs(lots.popleft(), ltc_btc)
+    self.assertIs(lots.popleft(), self.cheap)
+    self.assertEqual(list(lots), [self.dear])
+
+  def test_lots_is_abstract(self):
+    with self.assertRaises(TypeError):
+      Lots()
+
+  @staticmethod
+  def key(trade):
+    return trade.pair, trade.id
+
+  @staticmethod
+  def trade(pair, side, size, price, usd_per_btc=None):
+    if usd_per_btc is not None:
+      exchange.set_btc_per_usd(usd_per_btc)
+    trade = get_trade_for_pair(
+      pair, side, time_incrementer.get_time_and_increment(), Decimal(size),
+      Decimal(price), Decimal(0))
+    exchange.set_btc_per_usd("5000")
+    return trade
@@ -0,0 +1,77 @@
+from collections import deque
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.trade_processor.multi_asset import MultiAssetProcessor
+from calculator.trade_processor.trade_processor import TradeProcessor
+from calculator.trade_types import Pair, Side, Asset
+from test.test_helpers import get_trade_for_pair, time_incrementer, \
+  exchange, assert_fill_equal
+
+
+class TestMultiAssetProcessor(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    exchange.set_btc_per_usd("5000")
+
+  def test_matches_processing_each_asset(self):
+    btc_basis = [self.trade(Pair.BTC_USD, Side.BUY, "1", "6000")]
+    eth_basis = [self.trade(Pair.ETH_USD, Side.BUY, "10", "200")]
+    trades = [
+      self.trade(Pair.ETH_BTC, Side.BUY, "20", "0.03", "0.01"),
+      self.trade(Pair.BTC_USD, Side.SELL, "0.2", "4500"),
+      # ETH loss washed by the ETH-BTC buy before it
+      self.trade(Pair.ETH_USD, Side.SELL, "15", "140"),
+      self.trade(Pair.ETH_BTC, Side.SELL, "10", "0.032", "0.001"),
+      self.trade(Pair.BTC_USD, Side.BUY, "0.5", "4000")
+    ]
+    expected = {}
+    for asset, basis in ((Asset.BTC, btc_basis), (Asset.ETH, eth_basis)):
+      expected[asset] = TradeProcessor(
+        asset, deque(b.copy() for b in basis), track_wash=True)
+      expected[asset].handle_trades(
+        [MultiAssetProcessor.copy(t) for t in trades
+         if asset in (t.pair.base, t.pair.quote)])
+
+    processor = MultiAssetProcessor({
+      Asset.BTC: TradeProcessor(Asset.BTC, deque(btc_basis), track_wash=True),
+      Asset.ETH: TradeProcessor(Asset.ETH, deque(eth_basis), track_wash=True)
+    })
+    processor.handle_trades(trades)
+
+    for asset, expected_processor in expected.items():
+      asset_processor = processor.processors[asset]
+      self.assertEqual(
+        len(asset_processor.basis_queue), len(expected_processor.basis_queue))
+      for fill, expected_fill in zip(asset_processor.basis_queue,
+                                     expected_processor.basis_queue):
+        assert_fill_equal(fill, expected_fill, check_exact=True)
+      self.assertEqual(
+        len(asset_processor.entries), len(expected_processor.entries))
+      for entry, expected_entry in zip(asset_processor.entries,
+                                       expected_processor.entries):
+        assert_fill_equal(entry.costs, expected_entry.costs, check_exact=True)
+        assert_fill_equal(
+          entry.proceeds, expected_entry.proceeds, check_exact=True)
+        self.assertEqual(
+          entry.profit_and_loss.taxed_profit_and_loss,
+          expected_entry.profit_and_loss.taxed_profit_and_loss)
+    self.assertTrue(any(
+      e.profit_and_loss.taxed_profit_and_loss !=
+      e.profit_and_loss.profit_and_loss
+      for e in processor.processors[Asset.ETH].entries))
+
+  def test_copy_has_own_wash_ids(self):
+    trade = self.trade(Pair.ETH_BTC, Side.BUY, "1", "0.03")
+
+    copy = MultiAssetProcessor.copy(trade)
+    copy.wash_p_l_ids.append(1)
+
+    self.assertEqual(trade.wash_p_l_ids, [])
+
+  @staticmethod
+  def trade(pair, side, size, price, fee="0"):
+    return get_trade_for_pair(
+      pair, side, time_incrementer.get_time_and_increment(days=2),
+      Decimal(size), Decimal(price), Decimal(fee), wash=True)
@@ -1,7 +1,10 @@
+import pickle
 from decimal import Decimal
 from unittest import TestCase
 
 import pytz
+from pandas import DataFrame
+from pandas.testing import assert_frame_equal
 from datetime import datetime
 
 from calculator.format import SIZE, PRICE, FEE, ADJUSTED_VALUE, ID, \
@@ -375,6 +378,36 @@ class TestProfitAndLoss(TestCase):
     # adj 2500 + (0.25 * 1130) = 2782.5
     self.assertEqual(wash_two[ADJUSTED_VALUE], Decimal("2782.5"))
 
+  def test_to_df_same_as_series(self):
+    basis = get_mock_trade(
+      Pair.BTC_USD, Side.BUY, Decimal("1"), Decimal("7000"), Decimal("70"))
+    proceeds = get_mock_trade(
+      Pair.BTC_USD, Side.SELL, Decimal("1"), Decimal("6000"), Decimal("60"))
+    wash = get_mock_trade(
+      Pair.BTC_USD, Side.BUY, Decimal("1"), Decimal("5000"), Decimal("50"))
+    washed = ProfitAndLoss(Asset.BTC, basis, proceeds)
+    washed.wash_loss(wash)
+    p_ls = [ProfitAndLoss(Asset.BTC, basis, proceeds), washed]
+
+    for is_washed in (True, False):
+      assert_frame_equal(
+        ProfitAndLoss.to_df(p_ls, is_washed),
+        DataFrame(p_l.get_series(is_washed) for p_l in p_ls),
+        check_exact=True)
+    self.assertEqual(
+      list(ProfitAndLoss.to_df(p_ls, False)["ids for adjusted basis"]),
+      [[], []])
+
+  def test_pickle(self):
+    basis = get_mock_trade(
+      Pair.BTC_USD, Side.BUY, Decimal("1"), Decimal("7000"), Decimal("70"))
+    proceeds = get_mock_trade(
+      Pair.BTC_USD, Side.SELL, Decimal("1"), Decimal("6000"), Decimal("60"))
+    p_l = ProfitAndLoss(Asset.BTC, basis, proceeds)
+
+    self.assertEqual(
+      pickle.loads(pickle.dumps(p_l)).__getstate__(), p_l.__getstate__())
+
   def assert_basis_raises_exception(self, asset, basis, proceeds):
     with self.assertRaises(ValueError) as context:
       ProfitAndLoss(asset, basis, proceeds)
@@ -0,0 +1,76 @@
+import pickle
+from datetime import datetime, timedelta
+from unittest import TestCase
+
+import pytz
+from pandas import Series, Timestamp
+
+from calculator.trade_processor import time_window
+from calculator.trade_processor.time_window import TimeWindow, epoch_micros, \
+  epoch_micros_list
+
+
+class TestTimeWindow(TestCase):
+
+  def test_epoch_micros(self):
+    naive = datetime(2018, 1, 2, 1, 18, 26, 406)
+
+    self.assertEqual(epoch_micros(naive), 1514855906000406)
+    self.assertEqual(epoch_micros(naive.replace(tzinfo=pytz.UTC)),
+                     1514855906000406)
+    self.assertEqual(epoch_micros(Timestamp(naive)), 1514855906000406)
+    self.assertEqual(epoch_micros(Timestamp(naive, tz=pytz.UTC)),
+                     1514855906000406)
+
+  def test_epoch_micros_list(self):
+    times = [datetime(2018, 1, 2, 1, 18, 26, 406), datetime(2019, 6, 1)]
+    expected = [epoch_micros(t) for t in times]
+
+    self.assertEqual(epoch_micros_list(Series(times)), expected)
+    self.assertEqual(epoch_micros_list(Series(times).dt.tz_localize(
+      pytz.UTC).dt.tz_convert("US/Eastern")), expected)
+    self.assertEqual(epoch_micros_list(Series(times, dtype=object)), expected)
+
+  def test_expire_drops_all_too_old(self):
+    window = TimeWindow(10, ((t, str(t)) for t in [0, 5, 5, 9, 20]))
+
+    self.assertEqual(window.expire(9), [])
+    self.assertEqual(window.expire(15), ["0", "5", "5"])
+    self.assertEqual(list(window), ["9", "20"])
+    self.assertEqual(window.expire(100), ["9", "20"])
+    self.assertEqual(len(window), 0)
+
+  def test_earlier_item_kept_as_long_as_last(self):
+    window = TimeWindow(10, [(5, "a"), (3, "b")])
+
+    self.assertEqual(window.expire(14), [])
+    self.assertEqual(window.expire(15), ["a", "b"])
+
+  def test_keys_kept_when_compacted(self):
+    window = TimeWindow(10)
+    keys = [window.append(i, i) for i in range(3000)]
+
+    window.expire(2010)
+    window[keys[2500]] = "replaced"
+
+    self.assertLess(len(window.items), 3000 - time_window.COMPACT_AFTER)
+    self.assertEqual(window.first(), 2001)
+    self.assertEqual(window[keys[2500]], "replaced")
+
+  def test_popleft(self):
+    window = TimeWindow(10, [(1, "a"), (2, "b")])
+
+    self.assertEqual(window.popleft(), "a")
+    self.assertEqual(window.popleft(), "b")
+    with self.assertRaises(IndexError):
+      window.first()
+    self.assertEqual(window.append("c", 3), 2)
+
+  def test_pickle(self):
+    window = TimeWindow(10, [(1, "a"), (2, "b")])
+    window.popleft()
+
+    loaded = pickle.loads(pickle.dumps(window))
+
+    self.assertEqual(list(loaded), ["b"])
+    self.assertEqual(loaded.expire(12), ["b"])
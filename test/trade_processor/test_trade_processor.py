@@ -13,10 +13,12 @@ from calculator.format import (
   TOTAL, P_F_T_UNIT, FEE, SIZE_UNIT,
   SIZE, TIME, SIDE, PAIR, ADJUSTED_VALUE)
 from calculator.trade_types import Pair, Asset, Side
+from calculator.trade_processor.fill import Fill
 from calculator.trade_processor.profit_and_loss import ProfitAndLoss, Entry
 from calculator.trade_processor.trade_processor import TradeProcessor
 from test import test_helpers
-from test.test_helpers import get_trade_for_pair, time_incrementer, exchange
+from test.test_helpers import get_trade_for_pair, time_incrementer, exchange, \
+  assert_fill_equal
 
 FIXED_COL = [
   ID,
@@ -57,10 +59,10 @@ class TestTradeProcessor(TestCase):
 
     self.assertEqual(len(b_q), 2, "basis queue should have two trades")
     self.assertEqual(len(p_l), 0, "p & l should have no trades")
-    assert_series_equal(
+    assert_fill_equal(
       b_q.popleft(), basis_buy,
       "no sell to pull existing buy off of queue.", check_exact=True)
-    assert_series_equal(
+    assert_fill_equal(
       b_q.popleft(), trade,
       "trade should have been added to basis_queue", check_exact=True)
 
@@ -73,18 +75,18 @@ class TestTradeProcessor(TestCase):
 
     self.assertEqual(1, len(b_q),
                      "basis queue should have self.basis_buy_two remaining.")
-    assert_series_equal(
+    assert_fill_equal(
       self.basis_buy_two, b_q.popleft(),
       "second basis buy should still be in queue", check_exact=True)
 
     self.assertEqual(1, len(p_l), "profit and loss should have one entry")
 
     entry = p_l.popleft()
-    assert_series_equal(
+    assert_fill_equal(
       self.basis_buy_one, entry.costs, "first item should be the buy.",
       check_exact=True
     )
-    assert_series_equal(
+    assert_fill_equal(
       trade, entry.proceeds, "second item should be the trade.",
       check_exact=True
     )
@@ -109,7 +111,7 @@ class TestTradeProcessor(TestCase):
     self.verify_fixed_columns(actual_basis_one, self.basis_buy_one)
 
     actual_basis_two = b_q.popleft()
-    assert_series_equal(
+    assert_fill_equal(
       actual_basis_two, self.basis_buy_two,
       "the second trade should be unchanged", check_exact=True)
 
@@ -118,7 +120,7 @@ class TestTradeProcessor(TestCase):
     # Total: (15000 * 0.04 + 6) * 1/4 = 151.5 fee: 6/4 - 1.5
     self.verify_variable_columns(p_l_basis, "0.01", "-151.5", "1.5")
     self.verify_fixed_columns(self.basis_buy_one, p_l_basis)
-    assert_series_equal(
+    assert_fill_equal(
       trade, entry.proceeds, "second item should be the trade.",
       check_exact=True)
     # p_l 0.01 * 16000 - (606/4) = 8.5
@@ -137,11 +139,10 @@ class TestTradeProcessor(TestCase):
 
     remaining_basis = b_q.popleft()
     self.verify_variable_columns(remaining_basis, "0.01", "-152.005", "1.505")
-    assert_series_equal(remaining_basis[FIXED_COL],
-                        self.basis_buy_two[FIXED_COL], check_exact=True)
+    self.verify_fixed_columns(self.basis_buy_two, remaining_basis)
 
     entry_one = p_l.popleft()
-    assert_series_equal(
+    assert_fill_equal(
       entry_one.costs, self.basis_buy_one,
       "first item in entry should be the first basis.", check_exact=True)
     trade_part_one = entry_one.proceeds
@@ -166,6 +167,22 @@ class TestTradeProcessor(TestCase):
       entry_two.profit_and_loss, Decimal("0.01"), Decimal("6.39")
     )
 
+  def test_check_basis(self):
+    processor = TradeProcessor(
+      Asset.BTC, deque([self.basis_buy_one, self.basis_buy_two]))
+    sell = self.get_btc_usd_trade(
+      Side.SELL, Decimal("0.05"), Decimal("16000"), Decimal("0"))
+    buy = self.get_btc_usd_trade(
+      Side.BUY, Decimal("0.01"), Decimal("16000"), Decimal("0"))
+    last_sell = self.get_btc_usd_trade(
+      Side.SELL, Decimal("0.02"), Decimal("16000"), Decimal("0"))
+
+    processor.check_basis([sell, buy, last_sell])
+    with self.assertRaises(ValueError):
+      processor.check_basis([sell, last_sell, buy])
+    self.assertEqual(len(processor.basis_queue), 2)
+    self.assertEqual(len(processor.entries), 0)
+
   def test_mismatched_basis_trade(self):
     ltc_btc_sell = self.get_trade(
       Pair.LTC_BTC, Side.SELL, Decimal("100"),
@@ -182,8 +199,8 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 1, "p_l should have.")
 
     entry = p_l.popleft()
-    assert_series_equal(entry.costs, ltc_btc_sell, check_exact=True)
-    assert_series_equal(entry.proceeds, btc_usd_sell, check_exact=True)
+    assert_fill_equal(entry.costs, ltc_btc_sell, check_exact=True)
+    assert_fill_equal(entry.proceeds, btc_usd_sell, check_exact=True)
 
     # default test usd_per_btc is 5000, total in usd = 0.99 * 5000 = 4950
     # p_l 3920.4 - 4950 = −1029.6
@@ -217,7 +234,7 @@ class TestTradeProcessor(TestCase):
     self.verify_variable_columns(basis, "15.75", "0.75", "0.0375")
 
     entry_one = p_l.popleft()
-    assert_series_equal(entry_one.costs, ltc_btc_sell, check_exact=True)
+    assert_fill_equal(entry_one.costs, ltc_btc_sell, check_exact=True)
     split_btc_usd_one = entry_one.proceeds
     # fee 100 * 4/5 = 80, total 1 * 10000 - 80 = 9920
     self.verify_variable_columns(split_btc_usd_one, "1", "9920", "80")
@@ -257,11 +274,14 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 1, "p_l should have.")
 
     basis = b_q.popleft()
+    # the lot is kept in the queue with its remaining size
+    self.assertIs(basis, ltc_btc_sell)
     self.verify_variable_columns(basis, "25", ".25", "0")
 
     entry = p_l.popleft()
-    assert_series_equal(entry.costs, ltc_btc_sell, check_exact=True)
-    assert_series_equal(entry.proceeds, btc_usd_sell, check_exact=True)
+    self.verify_variable_columns(entry.costs, "75", ".75", "0")
+    self.verify_fixed_columns(ltc_btc_sell, entry.costs)
+    assert_fill_equal(entry.proceeds, btc_usd_sell, check_exact=True)
     # p_l 7400 - 11000 * 3/4 = -850
     self.verify_p_and_l(
       entry.profit_and_loss, Decimal("0.75"), Decimal("-850"))
@@ -283,8 +303,8 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 1, "p_l should have.")
 
     entry = p_l.popleft()
-    assert_series_equal(entry.costs, btc_usd_buy, check_exact=True)
-    assert_series_equal(entry.proceeds, eth_btc_buy, check_exact=True)
+    assert_fill_equal(entry.costs, btc_usd_buy, check_exact=True)
+    assert_fill_equal(entry.proceeds, eth_btc_buy, check_exact=True)
     # p_l (11000 * 0.5) - (0.5 * 10000 + 50) = 450
     self.verify_p_and_l(entry.profit_and_loss, Decimal("0.5"), Decimal("450"))
 
@@ -309,7 +329,7 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 2, "p_l should have.")
 
     entry_one = p_l.popleft()
-    assert_series_equal(entry_one.costs, btc_usd_buy_one, check_exact=True)
+    assert_fill_equal(entry_one.costs, btc_usd_buy_one, check_exact=True)
     split_eth_btc_one = entry_one.proceeds
     # 7.92 *3/4 = 5.94, 0.8 * 3/4 = 0.6, 0.008 * 3/4 = 0.006
     # context switch from ETH to BTC swaps the sign for total.
@@ -320,7 +340,7 @@ class TestTradeProcessor(TestCase):
       entry_one.profit_and_loss, Decimal("0.6"), Decimal("240"))
 
     entry_two = p_l.popleft()
-    assert_series_equal(entry_two.costs, btc_usd_buy_two, check_exact=True)
+    assert_fill_equal(entry_two.costs, btc_usd_buy_two, check_exact=True)
     split_eth_btc_two = entry_two.proceeds
     # 7.92 / 4 = 1.98, 0.8 / 4 = 0.2, 0.008 / 0.002
     # context switch from ETH to BTC swaps the sign for total.
@@ -357,7 +377,7 @@ class TestTradeProcessor(TestCase):
     # basis should have negative total
     self.verify_variable_columns(split_btc_usd_two, "0.4", "-4040", "40")
     self.verify_fixed_columns(split_btc_usd_one, btc_usd_buy)
-    assert_series_equal(entry.proceeds, eth_btc_buy, check_exact=True)
+    assert_fill_equal(entry.proceeds, eth_btc_buy, check_exact=True)
     # p_l (9000 * 0.4) - (10000 * 0.4 + 40) = -440
     self.verify_p_and_l(
       entry.profit_and_loss, Decimal("0.4"), Decimal("-440"))
@@ -377,8 +397,8 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(b_q), 0, "basis queue should be empty")
     self.assertEqual(len(p_l), 1, "p and l should have one entry")
     entry = p_l.popleft()
-    assert_series_equal(entry.costs, eth_usd_buy, check_exact=True)
-    assert_series_equal(entry.proceeds, eth_usd_sell, check_exact=True)
+    assert_fill_equal(entry.costs, eth_usd_buy, check_exact=True)
+    assert_fill_equal(entry.proceeds, eth_usd_sell, check_exact=True)
     # p_l (161.1 - 1.1) - (151 + 1) = 8
     self.verify_p_and_l(entry.profit_and_loss, Decimal("1"), Decimal("8"))
 
@@ -409,7 +429,7 @@ class TestTradeProcessor(TestCase):
     # context switch from ETH to BTC swaps the sign for total.
     self.verify_variable_columns(split_eth_btc_two, "0.5", "-0.00505", "0.00005")
     self.verify_fixed_columns(split_eth_btc_two, eth_btc_buy)
-    assert_series_equal(entry.proceeds, eth_usd_sell, check_exact=True)
+    assert_fill_equal(entry.proceeds, eth_usd_sell, check_exact=True)
     # p_l (161.1 * .5 - 0.55) - (5000 * 0.00505) = 54.75
     self.verify_p_and_l(
       entry.profit_and_loss, Decimal("0.5"), Decimal("54.75"))
@@ -435,7 +455,7 @@ class TestTradeProcessor(TestCase):
     self.verify_fixed_columns(first_spilt_eth_usd, eth_usd_buy_two)
 
     entry_one = p_l.popleft()
-    assert_series_equal(entry_one.costs, eth_usd_buy_one, check_exact=True)
+    assert_fill_equal(entry_one.costs, eth_usd_buy_one, check_exact=True)
     first_split_eth_btc = entry_one.proceeds
     # 1 * 3/5 = 0.6, (1 * 0.008 - 0.00008) * 3/5 = 0.004752‬,
     # 0.00008 * 3/5 = 0.000048‬
@@ -480,11 +500,11 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 1, "basis and sell are matched in the p_l")
 
     basis = b_q.popleft()
-    assert_series_equal(basis, non_wash, check_exact=True)
+    assert_fill_equal(basis, non_wash, check_exact=True)
 
     entry_one = p_l.popleft()
-    assert_series_equal(entry_one.costs, buy, check_exact=True)
-    assert_series_equal(entry_one.proceeds, sell, check_exact=True)
+    assert_fill_equal(entry_one.costs, buy, check_exact=True)
+    assert_fill_equal(entry_one.proceeds, sell, check_exact=True)
     # Loss would be 8080 - 6930 = 1150
     self.verify_p_and_l(entry_one.profit_and_loss, Decimal("1"), Decimal("-1150"))
     # basis should be adjusted to -6969
@@ -508,11 +528,11 @@ class TestTradeProcessor(TestCase):
     self.assertEqual(len(p_l), 1, "basis and sell are matched in the p_l")
 
     basis = b_q.popleft()
-    assert_series_equal(basis, non_wash, check_exact=True)
+    assert_fill_equal(basis, non_wash, check_exact=True)
 
     entry_one = p_l.popleft()
-    assert_series_equal(entry_one.costs, buy, check_exact=True)
-    assert_series_equal(entry_one.proceeds, sell, check_exact=True)
+    assert_fill_equal(entry_one.costs, buy, check_exact=True)
+    assert_fill_equal(entry_one.proceeds, sell, check_exact=True)
     # Loss would be 8080 - 6930 = 1150
     self.verify_p_and_l(entry_one.profit_and_loss, Decimal("1"),
                         Decimal("-1150"))
@@ -822,7 +842,7 @@ class TestTradeProcessor(TestCase):
   @staticmethod
   def verify_variable_columns(trade, size_str, total_str, fee_str):
     assert_series_equal(
-      trade[VARIABLE_COL], Series({
+      Series(trade.to_dict())[VARIABLE_COL], Series({
         SIZE: Decimal(size_str), TOTAL: Decimal(total_str),
         FEE: Decimal(fee_str)
       }), check_exact=True
@@ -831,7 +851,8 @@ class TestTradeProcessor(TestCase):
   @staticmethod
   def verify_fixed_columns(trade_one, trade_two):
     assert_series_equal(
-      trade_two[FIXED_COL], trade_one[FIXED_COL],
+      Series(trade_two.to_dict())[FIXED_COL],
+      Series(trade_one.to_dict())[FIXED_COL],
       "Other columns should be equal.", check_exact=True)
 
   def verify_p_and_l(
@@ -872,11 +893,11 @@ class TestTradeProcessor(TestCase):
 
 class ProcessorBuilder:
 
-  def __init__(self, *basis_trades: Series):
+  def __init__(self, *basis_trades: Fill):
     self.track_wash_enabled = False
     self.asset: Asset = Asset.BTC
-    self.basis_trades: Tuple[Series] = basis_trades
-    self.trades_to_process: Tuple[Series] = tuple()
+    self.basis_trades: Tuple[Fill] = basis_trades
+    self.trades_to_process: Tuple[Fill] = tuple()
     self.processor = None
 
   def track_wash(self):
@@ -891,7 +912,7 @@ class ProcessorBuilder:
     self.trades_to_process = trades
     return self
 
-  def build(self) -> Tuple[Deque[Series], Deque[Entry]]:
+  def build(self) -> Tuple[Deque[Fill], Deque[Entry]]:
     processor = self.build_processor()
     return processor.basis_queue, processor.entries
 
@@ -905,7 +926,7 @@ class ProcessorBuilder:
 
   @staticmethod
   def get_processor(
-      asset: Asset, track_wash: bool, *buys: Series) -> TradeProcessor:
+      asset: Asset, track_wash: bool, *buys: Fill) -> TradeProcessor:
     basis_queue = deque()
     for buy in buys:
       basis_queue.append(buy)
@@ -0,0 +1,85 @@
+import pickle
+from datetime import timedelta
+from decimal import Decimal
+from unittest import TestCase
+
+from calculator.trade_processor.time_window import epoch_micros
+from calculator.trade_processor.wash_candidates import WashCandidates
+from calculator.trade_types import Pair, Side
+from test.test_helpers import get_trade, time_incrementer
+
+
+class TestWashCandidates(TestCase):
+
+  def setUp(self):
+    time_incrementer.reset()
+    self.one = self.get_lot(1)
+    self.two = self.get_lot(2)
+    self.three = self.get_lot(3)
+
+  def test_order_kept(self):
+    candidates = WashCandidates([self.one, self.two])
+    candidates.append(self.three)
+
+    self.assertIs(candidates.first(), self.one)
+    self.assertIs(candidates.popleft(), self.one)
+
+    self.assertEqual(list(candidates), [self.two, self.three])
+    self.assertEqual(len(candidates), 2)
+
+  def test_expire(self):
+    # lots are 3 days apart, the third expires 30 days after it
+    candidates = WashCandidates([self.one, self.two, self.three])
+    now = self.three.time + timedelta(days=30)
+
+    candidates.expire(epoch_micros(now - timedelta(microseconds=1)))
+    self.assertEqual(list(candidates), [self.three])
+    self.assertFalse(candidates.has_id(2))
+
+    candidates.expire(epoch_micros(now))
+    self.assertEqual(len(candidates), 0)
+    self.assertFalse(candidates.has_id(3))
+
+  def test_has_id(self):
+    candidates = WashCandidates([self.one, self.two])
+    self.assertTrue(candidates.has_id(1))
+
+    candidates.popleft()
+
+    self.assertFalse(candidates.has_id(1))
+    self.assertTrue(candidates.has_id(2))
+
+  def test_has_id_counts_equal_ids(self):
+    # trade ids of two pairs can be equal
+    other = self.get_lot(1, Pair.ETH_BTC)
+    candidates = WashCandidates([self.one, other])
+
+    candidates.popleft()
+
+    self.assertTrue(candidates.has_id(1))
+
+  def test_replace_in_place(self):
+    candidates = WashCandidates([self.one, self.two, self.three])
+    portion = self.two.split(Decimal("0.5"), self.two.size)
+
+    candidates.replace(self.two, portion)
+    candidates.replace(self.two, self.one)
+
+    self.assertEqual(list(candidates), [self.one, portion, self.three])
+    self.assertTrue(candidates.has_id(2))
+
+  def test_pickle_shares_lots(self):
+    candidates = WashCandidates([self.one])
+
+    lots, loaded = pickle.loads(pickle.dumps(([self.one], candidates)))
+    empty = pickle.loads(pickle.dumps(WashCandidates()))
+
+    self.assertIs(list(loaded)[0], lots[0])
+    self.assertIs(loaded.popleft(), lots[0])
+    self.assertEqual(len(empty), 0)
+
+  @staticmethod
+  def get_lot(trade_id, pair=Pair.BTC_USD):
+    return get_trade(
+      trade_id, pair, Side.BUY, time_incrementer.get_time_and_increment(),
+      Decimal(1), Decimal(100), wash=True)